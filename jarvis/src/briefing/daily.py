@@ -5,7 +5,7 @@ from datetime import datetime
 import pytz
 
 from src.config import settings
-from src.context import get_paris_time
+from src.context import get_paris_date
 
 logger = logging.getLogger(__name__)
 
@@ -66,8 +66,9 @@ async def _fetch_email_summary() -> str:
 async def _fetch_calendar_summary() -> str:
     """Récupère le résumé des événements du jour."""
     try:
-        from src.calendar.google_cal import fetch_today_events, format_event_time
-        events = await fetch_today_events()
+        from src.calendar.google_cal import format_event_time
+        from src.snapshots import get_snapshot
+        events = await get_snapshot("calendar")
         if not events:
             return "Aucun événement aujourd'hui."
 
@@ -130,12 +131,18 @@ async def _fetch_github_summary() -> str:
         return ""
 
 
-async def generate_briefing() -> str:
-    """Génère le contenu du briefing quotidien via Groq."""
-    from src.llm.groq_client import groq_client
+async def generate_briefing(bypass_cache: bool = False, on_partial=None) -> str:
+    """
+    Génère le contenu du briefing quotidien via Groq.
+    Le prompt ne contient que la date (pas l'heure) : un briefing rejoué le même
+    matin sur des données inchangées est servi depuis le cache LLM.
+    on_partial : reçoit le texte au fil du streaming (affichage progressif /briefing).
+    Lève RuntimeError si aucun fournisseur LLM ne répond.
+    """
+    from src.llm.gateway import complete
 
     day_context = _get_day_context()
-    heure = get_paris_time()
+    date_du_jour = get_paris_date()
 
     # Enrichissement avec données réelles (Sprint 2 + Sprint 3 + Sprint 4)
     email_summary, calendar_summary, wellness_summary, github_summary = await asyncio.gather(
@@ -179,7 +186,7 @@ async def generate_briefing() -> str:
             "role": "user",
             "content": f"""Génère le briefing quotidien de Nassim.
 
-Contexte : {day_context} — {heure}{data_section}
+Contexte : {day_context} — {date_du_jour}{data_section}
 
 Format attendu (Markdown, soyez concis) :
 
@@ -207,7 +214,9 @@ Règles : factuel, direct, orienté action. Maximum 350 mots. Pas de fioritures.
         }
     ]
 
-    briefing_text = await groq_client.chat(prompt)
+    briefing_text = await complete(
+        prompt, site="briefing", bypass_cache=bypass_cache, on_partial=on_partial,
+    )
 
     try:
         from src.memory.database import save_briefing
@@ -17,6 +17,13 @@ class Settings(BaseSettings):
 
     # Claude (usage ponctuel — tâches complexes)
     claude_api_key: str = ""
+    claude_model: str = "claude-sonnet-4-5"
+
+    # Limites de débit LLM (selon le palier du compte)
+    groq_tokens_per_minute: int = 12000
+    groq_requests_per_minute: int = 30
+    claude_tokens_per_minute: int = 30000
+    claude_requests_per_minute: int = 50
 
     # PostgreSQL
     database_url: str
@@ -24,6 +31,10 @@ class Settings(BaseSettings):
     # Redis
     redis_url: str = "redis://localhost:6379"
 
+    # Scheduler — multi-réplicas
+    leader_lease_ttl_seconds: int = 15
+    scheduler_jobstore_url: str = ""  # défaut : database_url en driver synchrone
+
     # Audio
     whisper_model: str = "base"
     tts_voice: str = "fr-FR-HenriNeural"
@@ -46,9 +57,13 @@ class Settings(BaseSettings):
     # Sprint 4 — GitHub
     github_token: str = ""
     github_repos: str = ""  # comma-separated: "nassimboughazi/job-verdict,nassimboughazi/arabai"
+    github_sync_interval_minutes: int = 15  # synchro incrémentale du store GitHub local
 
     # Sprint 4 — Stripe
     stripe_secret_key: str = ""
+    stripe_sync_interval_minutes: int = 15  # synchro incrémentale du ledger Stripe local
+    stripe_webhook_secret: str = ""  # whsec_… — active le ledger temps réel par webhooks
+    stripe_reconcile_interval_minutes: int = 360  # synchro de rattrapage quand les webhooks sont actifs
 
     model_config = {"env_file": ".env", "env_file_encoding": "utf-8"}
 
@@ -58,6 +73,15 @@ class Settings(BaseSettings):
             return []
         return [r.strip() for r in self.github_repos.split(",") if r.strip()]
 
+    @property
+    def scheduler_jobstore_sync_url(self) -> str:
+        """URL synchrone pour le job store APScheduler (SQLAlchemy sync)."""
+        if self.scheduler_jobstore_url:
+            return self.scheduler_jobstore_url
+        from sqlalchemy.engine import make_url
+        url = make_url(self.database_url)
+        return url.set(drivername=url.drivername.split("+")[0]).render_as_string(hide_password=False)
+
     @property
     def github_configured(self) -> bool:
         return bool(self.github_token)
@@ -66,6 +90,10 @@ class Settings(BaseSettings):
     def stripe_configured(self) -> bool:
         return bool(self.stripe_secret_key)
 
+    @property
+    def stripe_webhook_configured(self) -> bool:
+        return bool(self.stripe_webhook_secret)
+
     @property
     def google_redirect_uri(self) -> str:
         base = self.api_base_url.rstrip("/")
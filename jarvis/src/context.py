@@ -1,13 +1,15 @@
 from pathlib import Path
 import pytz
 from datetime import datetime
+from typing import Any, Dict, List
 
 from src.config import settings
 
 _PARIS_TZ = pytz.timezone("Europe/Paris")
 
 
-def get_paris_time() -> str:
+def get_paris_date() -> str:
+    """Date du jour seule (ex: « Lundi 3 mars 2025 ») — stable sur la journée."""
     now = datetime.now(_PARIS_TZ)
     jours = {
         "Monday": "Lundi", "Tuesday": "Mardi", "Wednesday": "Mercredi",
@@ -20,7 +22,12 @@ def get_paris_time() -> str:
     }
     jour = jours[now.strftime("%A")]
     mois_fr = mois[now.strftime("%B")]
-    return f"{jour} {now.day} {mois_fr} {now.year} à {now.strftime('%H:%M')}"
+    return f"{jour} {now.day} {mois_fr} {now.year}"
+
+
+def get_paris_time() -> str:
+    now = datetime.now(_PARIS_TZ)
+    return f"{get_paris_date()} à {now.strftime('%H:%M')}"
 
 
 def load_jarvis_md() -> str:
@@ -32,41 +39,66 @@ def load_jarvis_md() -> str:
     return md_path.read_text(encoding="utf-8")
 
 
-def build_system_prompt() -> str:
-    """Construit le prompt système complet avec contexte temporel."""
-    context = load_jarvis_md()
-    return f"""Tu es Jarvis, l'assistant personnel de Nassim Boughazi.
-
-Voici ta configuration et tes instructions maîtresses — respecte-les intégralement :
-
-{context}
-
----
-
-RÈGLES ABSOLUES DE COMPORTEMENT :
+_RULES = """RÈGLES ABSOLUES DE COMPORTEMENT :
 1. Vouvoiement systématique en toutes circonstances, sans exception
 2. Factuel, direct, orienté action — zéro fioriture
 3. Pas de questions inutiles — si tu dois agir, tu agis
 4. Toujours en français sauf si le contexte est explicitement anglophone
 5. Recommandations avec conviction et justification claire — tu ne présentes pas des options, tu recommandes
 6. Tu ne contactes Nassim que si une action de sa part est requise
-7. Ton niveau de confiance par domaine est défini dans la section 6 de ta configuration
+7. Ton niveau de confiance par domaine est défini dans la section 6 de ta configuration"""
 
-Heure actuelle (Paris) : {get_paris_time()}
-"""
 
+def build_system_blocks(learned_context: str = "") -> List[Dict[str, Any]]:
+    """
+    Prompt système découpé du plus stable au plus volatil, pour le cache de
+    prompts des fournisseurs : configuration jarvis.md + règles, puis contexte
+    appris, puis l'heure en dernier. Chaque bloc est {"text", "cache"} ;
+    cache=True pose un point de cache (Claude) à la fin du bloc.
+    """
+    static = f"""Tu es Jarvis, l'assistant personnel de Nassim Boughazi.
 
-async def build_enriched_system_prompt() -> str:
+Voici ta configuration et tes instructions maîtresses — respecte-les intégralement :
+
+{load_jarvis_md()}
+
+---
+
+{_RULES}"""
+    blocks = [{"text": static, "cache": True}]
+    if learned_context:
+        blocks.append({"text": f"---\n\n{learned_context}", "cache": True})
+    blocks.append({"text": f"Heure actuelle (Paris) : {get_paris_time()}", "cache": False})
+    return blocks
+
+
+def join_system_blocks(blocks: List[Dict[str, Any]]) -> str:
+    """Version texte d'un prompt système en blocs (fournisseurs sans cache explicite)."""
+    return "\n\n".join(b["text"] for b in blocks) + "\n"
+
+
+def build_system_prompt() -> str:
+    """Construit le prompt système complet avec contexte temporel."""
+    return join_system_blocks(build_system_blocks())
+
+
+async def build_enriched_system_blocks() -> List[Dict[str, Any]]:
     """
-    Version enrichie du system prompt avec le contexte appris injecté.
-    Utiliser à la place de build_system_prompt() dans les conversations actives.
+    Prompt système en blocs avec le contexte appris injecté, avant l'heure.
+    Utiliser dans les conversations actives (passé tel quel à la passerelle LLM).
     """
-    base = build_system_prompt()
+    learned = ""
     try:
         from src.memory.learning import get_learned_context_summary
-        learned = await get_learned_context_summary()
-        if learned:
-            return base + f"\n---\n\n{learned}\n"
+        learned = await get_learned_context_summary() or ""
     except Exception:
         pass
-    return base
+    return build_system_blocks(learned)
+
+
+async def build_enriched_system_prompt() -> str:
+    """
+    Version enrichie du system prompt avec le contexte appris injecté.
+    Version texte de build_enriched_system_blocks().
+    """
+    return join_system_blocks(await build_enriched_system_blocks())
@@ -0,0 +1,140 @@
+"""
+Pools de threads dédiés aux appels SDK bloquants — un pool borné par intégration.
+
+Chaque fournisseur (GitHub, Stripe, audio…) a son propre ThreadPoolExecutor :
+une lenteur Stripe (auto_paging_iter) ne peut plus occuper les threads dont
+GitHub ou la transcription ont besoin. Profondeur de file, threads actifs et
+temps d'attente avant exécution sont mesurés par pool et exposés via /perf.
+"""
+import asyncio
+import logging
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List
+
+logger = logging.getLogger(__name__)
+
+# nom → nombre maximal de threads
+EXECUTOR_SIZES: Dict[str, int] = {
+    "github": 8,   # un appel par repo en parallèle (repli REST)
+    "stripe": 2,   # pagination longue, peu d'appels concurrents utiles
+    "audio": 2,    # STT / TTS
+}
+DEFAULT_EXECUTOR_SIZE = 4
+
+# Échantillons de temps d'attente conservés par pool (fenêtre glissante)
+_WAIT_SAMPLES = 256
+
+_executors: Dict[str, ThreadPoolExecutor] = {}
+_stats: Dict[str, Dict[str, Any]] = {}
+_lock = threading.Lock()
+
+
+def _get_executor(name: str) -> ThreadPoolExecutor:
+    with _lock:
+        executor = _executors.get(name)
+        if executor is None:
+            executor = ThreadPoolExecutor(
+                max_workers=EXECUTOR_SIZES.get(name, DEFAULT_EXECUTOR_SIZE),
+                thread_name_prefix=f"jarvis-{name}",
+            )
+            _executors[name] = executor
+            _stats[name] = {
+                "queued": 0,
+                "running": 0,
+                "completed": 0,
+                "errors": 0,
+                "waits_ms": deque(maxlen=_WAIT_SAMPLES),
+            }
+        return executor
+
+
+async def run_blocking(name: str, func: Callable[..., Any], *args: Any) -> Any:
+    """
+    Exécute `func(*args)` dans le pool dédié `name` et attend son résultat.
+    Remplace loop.run_in_executor(None, …) pour les appels SDK bloquants.
+    """
+    executor = _get_executor(name)
+    stats = _stats[name]
+    enqueued = time.monotonic()
+    with _lock:
+        stats["queued"] += 1
+
+    def _call() -> Any:
+        wait_ms = (time.monotonic() - enqueued) * 1000
+        with _lock:
+            stats["queued"] -= 1
+            stats["running"] += 1
+            stats["waits_ms"].append(wait_ms)
+        try:
+            return func(*args)
+        except Exception:
+            with _lock:
+                stats["errors"] += 1
+            raise
+        finally:
+            with _lock:
+                stats["running"] -= 1
+                stats["completed"] += 1
+
+    return await asyncio.get_running_loop().run_in_executor(executor, _call)
+
+
+def _percentile(values: List[float], q: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+def get_executor_stats() -> List[Dict[str, Any]]:
+    """Instantané des métriques de chaque pool créé."""
+    with _lock:
+        snapshot = [
+            (name, _executors[name]._max_workers, dict(stats), list(stats["waits_ms"]))
+            for name, stats in _stats.items()
+        ]
+    return [
+        {
+            "name": name,
+            "max_workers": max_workers,
+            "queued": stats["queued"],
+            "running": stats["running"],
+            "completed": stats["completed"],
+            "errors": stats["errors"],
+            "wait_p50_ms": _percentile(waits, 0.5) if waits else None,
+            "wait_p95_ms": _percentile(waits, 0.95) if waits else None,
+            "wait_max_ms": max(waits) if waits else None,
+        }
+        for name, max_workers, stats, waits in sorted(snapshot)
+    ]
+
+
+def format_executor_stats_telegram(stats: List[Dict[str, Any]]) -> str:
+    """Formate les métriques des pools pour Telegram (section de /perf)."""
+    from src.job_metrics import _format_ms
+
+    if not stats:
+        return "🧵 *Pools d'exécution* — aucun appel bloquant depuis le démarrage."
+
+    lines = ["🧵 *Pools d'exécution (depuis le démarrage)*\n"]
+    for s in stats:
+        lines.append(
+            f"• `{s['name']}` — {s['running']}/{s['max_workers']} actifs | "
+            f"file {s['queued']} | {s['completed']} appel(s)\n"
+            f"  attente p50 {_format_ms(s['wait_p50_ms'])} | "
+            f"p95 {_format_ms(s['wait_p95_ms'])} | max {_format_ms(s['wait_max_ms'])}"
+            + (f" | ⚠️ {s['errors']} erreur(s)" if s["errors"] else "")
+        )
+    return "\n".join(lines)
+
+
+def shutdown_executors() -> None:
+    """Arrête les pools sans attendre les appels en cours (arrêt du process)."""
+    with _lock:
+        executors = list(_executors.values())
+        _executors.clear()
+        _stats.clear()
+    for executor in executors:
+        executor.shutdown(wait=False, cancel_futures=True)
+    logger.info("Pools d'exécution arrêtés")
@@ -1,72 +1,142 @@
 """
 GitHub connector — activité repos, PRs, issues, commits.
-Utilise l'API REST GitHub v3 via PyGithub.
+Utilise l'API REST GitHub v3 avec requêtes conditionnelles (ETag / Last-Modified) :
+une réponse 304 ne consomme pas de quota et réutilise le payload déjà parsé.
 """
 import asyncio
 import logging
+import threading
+from collections import OrderedDict
 from datetime import datetime, timedelta, timezone
 from typing import Any, Dict, List, Optional
+from urllib.parse import urlencode
 
 from src.config import settings
 
 logger = logging.getLogger(__name__)
 
-
-def _get_client():
-    from github import Github
-    return Github(settings.github_token)
+GITHUB_API_URL = "https://api.github.com"
+
+# Cache conditionnel par URL : {"etag", "last_modified", "data"} — LRU borné
+_CONDITIONAL_CACHE_MAX = 512
+_conditional_cache: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+_conditional_lock = threading.Lock()
+_session = None
+
+
+def _get_session():
+    global _session
+    if _session is None:
+        import requests
+        _session = requests.Session()
+        _session.headers.update({
+            "Authorization": f"Bearer {settings.github_token}",
+            "Accept": "application/vnd.github+json",
+            "X-GitHub-Api-Version": "2022-11-28",
+        })
+    return _session
+
+
+def _github_get(path: str, params: Optional[Dict[str, Any]] = None) -> Any:
+    """
+    GET REST conditionnel — exécuté en thread executor.
+    Renvoie le payload en cache sur 304, lève requests.HTTPError sinon.
+    """
+    url = f"{GITHUB_API_URL}{path}"
+    if params:
+        url += "?" + urlencode(sorted(params.items()))
+
+    with _conditional_lock:
+        cached = _conditional_cache.get(url)
+
+    headers = {}
+    if cached:
+        if cached.get("etag"):
+            headers["If-None-Match"] = cached["etag"]
+        if cached.get("last_modified"):
+            headers["If-Modified-Since"] = cached["last_modified"]
+
+    resp = _get_session().get(url, headers=headers, timeout=15)
+    if resp.status_code == 304 and cached:
+        with _conditional_lock:
+            if url in _conditional_cache:
+                _conditional_cache.move_to_end(url)
+        return cached["data"]
+
+    resp.raise_for_status()
+    data = resp.json()
+
+    etag = resp.headers.get("ETag")
+    last_modified = resp.headers.get("Last-Modified")
+    if etag or last_modified:
+        with _conditional_lock:
+            _conditional_cache[url] = {"etag": etag, "last_modified": last_modified, "data": data}
+            _conditional_cache.move_to_end(url)
+            while len(_conditional_cache) > _CONDITIONAL_CACHE_MAX:
+                _conditional_cache.popitem(last=False)
+    return data
+
+
+def _iso(timestamp: str) -> str:
+    """Normalise un horodatage GitHub ("…Z") au format datetime.isoformat()."""
+    return datetime.fromisoformat(timestamp.replace("Z", "+00:00")).isoformat()
 
 
 def _fetch_repo_activity_sync(repo_full_name: str, hours_back: int = 24) -> Dict[str, Any]:
     """Récupère l'activité récente d'un repo — exécuté en thread executor."""
-    from github import GithubException
+    import requests
     cutoff = datetime.now(timezone.utc) - timedelta(hours=hours_back)
 
     try:
-        g = _get_client()
-        repo = g.get_repo(repo_full_name)
+        repo = _github_get(f"/repos/{repo_full_name}")
 
-        # Commits récents
+        # Commits récents — URL stable (sans `since`) pour profiter de l'ETag,
+        # fenêtre appliquée localement sur les 5 plus récents
         commits = []
         try:
-            for commit in repo.get_commits(since=cutoff):
+            for commit in _github_get(f"/repos/{repo_full_name}/commits", {"per_page": 5}):
+                date = _iso(commit["commit"]["author"]["date"])
+                if datetime.fromisoformat(date) < cutoff:
+                    break
                 commits.append({
-                    "sha": commit.sha[:7],
-                    "message": commit.commit.message.split("\n")[0][:80],
-                    "author": commit.commit.author.name,
-                    "date": commit.commit.author.date.isoformat(),
+                    "sha": commit["sha"][:7],
+                    "message": commit["commit"]["message"].split("\n")[0][:80],
+                    "author": commit["commit"]["author"]["name"],
+                    "date": date,
                 })
-                if len(commits) >= 5:
-                    break
         except Exception:
             pass
 
         # PRs ouvertes
         open_prs = []
         try:
-            for pr in repo.get_pulls(state="open", sort="updated", direction="desc"):
+            for pr in _github_get(
+                f"/repos/{repo_full_name}/pulls",
+                {"state": "open", "sort": "updated", "direction": "desc", "per_page": 5},
+            ):
                 open_prs.append({
-                    "number": pr.number,
-                    "title": pr.title[:80],
-                    "author": pr.user.login,
-                    "updated_at": pr.updated_at.isoformat(),
+                    "number": pr["number"],
+                    "title": pr["title"][:80],
+                    "author": (pr.get("user") or {}).get("login", ""),
+                    "updated_at": _iso(pr["updated_at"]),
                 })
-                if len(open_prs) >= 5:
-                    break
         except Exception:
             pass
 
         # Issues ouvertes récentes
         open_issues = []
         try:
-            for issue in repo.get_issues(state="open", sort="updated", direction="desc"):
-                if issue.pull_request:
+            for issue in _github_get(
+                f"/repos/{repo_full_name}/issues",
+                {"state": "open", "sort": "updated", "direction": "desc", "per_page": 30},
+            ):
+                if issue.get("pull_request"):
                     continue  # Exclure les PRs listées comme issues
                 open_issues.append({
-                    "number": issue.number,
-                    "title": issue.title[:80],
-                    "author": issue.user.login,
-                    "updated_at": issue.updated_at.isoformat(),
+                    "number": issue["number"],
+                    "title": issue["title"][:80],
+                    "author": (issue.get("user") or {}).get("login", ""),
+                    "updated_at": _iso(issue["updated_at"]),
                 })
                 if len(open_issues) >= 5:
                     break
@@ -75,15 +145,15 @@ def _fetch_repo_activity_sync(repo_full_name: str, hours_back: int = 24) -> Dict
 
         return {
             "repo": repo_full_name,
-            "description": repo.description or "",
-            "stars": repo.stargazers_count,
+            "description": repo.get("description") or "",
+            "stars": repo.get("stargazers_count", 0),
             "commits": commits,
             "open_prs": open_prs,
             "open_issues": open_issues,
             "error": None,
         }
 
-    except GithubException as e:
+    except requests.HTTPError as e:
         logger.error(f"GitHub API error pour {repo_full_name}: {e}")
         return {"repo": repo_full_name, "error": str(e), "commits": [], "open_prs": [], "open_issues": []}
     except Exception as e:
@@ -92,18 +162,36 @@ def _fetch_repo_activity_sync(repo_full_name: str, hours_back: int = 24) -> Dict
 
 
 async def fetch_repo_activity(repo_full_name: str, hours_back: int = 24) -> Dict[str, Any]:
-    loop = asyncio.get_event_loop()
-    return await loop.run_in_executor(None, _fetch_repo_activity_sync, repo_full_name, hours_back)
+    from src.executors import run_blocking
+    return await run_blocking("github", _fetch_repo_activity_sync, repo_full_name, hours_back)
 
 
 async def fetch_all_repos_activity(hours_back: int = 24) -> List[Dict[str, Any]]:
-    """Récupère l'activité de tous les repos configurés en parallèle."""
+    """
+    Récupère l'activité de tous les repos configurés sur une fenêtre arbitraire.
+    Lecture du store local synchronisé ; repli GraphQL direct puis REST par repo.
+    """
     if not settings.github_configured:
         return []
     repos = settings.github_repo_list
     if not repos:
         return []
 
+    from src.integrations.github_store import load_activity
+    try:
+        activity = await load_activity(hours_back)
+        if any(not a.get("error") for a in activity):
+            return activity
+        logger.warning("Store GitHub vide, appel direct à l'API")
+    except Exception as e:
+        logger.warning(f"Store GitHub indisponible, appel direct à l'API : {e}")
+
+    from src.integrations.github_graphql import fetch_repos_activity
+    try:
+        return await fetch_repos_activity(repos, hours_back)
+    except Exception as e:
+        logger.warning(f"GitHub GraphQL indisponible, repli REST : {e}")
+
     results = await asyncio.gather(
         *[fetch_repo_activity(r, hours_back) for r in repos],
         return_exceptions=True,
@@ -117,7 +205,13 @@ async def fetch_all_repos_activity(hours_back: int = 24) -> List[Dict[str, Any]]
     return activity
 
 
-def format_activity_telegram(activity: List[Dict[str, Any]]) -> str:
+def _window_label(hours_back: int) -> str:
+    if hours_back % 24 == 0 and hours_back >= 48:
+        return f"{hours_back // 24}j"
+    return f"{hours_back}h"
+
+
+def format_activity_telegram(activity: List[Dict[str, Any]], hours_back: int = 24) -> str:
     """Formate l'activité GitHub pour un message Telegram."""
     if not activity:
         return "Aucun repo GitHub configuré."
@@ -135,11 +229,11 @@ def format_activity_telegram(activity: List[Dict[str, Any]]) -> str:
 
         commits = repo_data.get("commits", [])
         if commits:
-            lines.append(f"  Commits (24h) :")
+            lines.append(f"  Commits ({_window_label(hours_back)}) :")
             for c in commits[:3]:
                 lines.append(f"  • `{c['sha']}` {c['message'][:60]}")
         else:
-            lines.append("  Aucun commit dans les 24h")
+            lines.append(f"  Aucun commit dans les {_window_label(hours_back)}")
 
         open_prs = repo_data.get("open_prs", [])
         if open_prs:
@@ -199,6 +293,7 @@ APP_CONTEXTS = {
         "monetized": True,
         "priority_level": "Haute",
         "objective": "Atteindre un CA stable et récurrent",
+        "aliases": ["jv", "verdict", "job"],
     },
     "kalen": {
         "name": "Kalen",
@@ -207,6 +302,7 @@ APP_CONTEXTS = {
         "monetized": False,
         "priority_level": "Moyenne",
         "objective": "Déploiement progressif pub + modèle premium",
+        "aliases": ["hormones", "sport"],
     },
     "Mindy_IOS": {
         "name": "Mindy",
@@ -215,6 +311,7 @@ APP_CONTEXTS = {
         "monetized": False,
         "priority_level": "Moyenne",
         "objective": "Activation pub progressive + modèle premium",
+        "aliases": ["mindy_ios", "bien-etre", "bien-être"],
     },
 }
 
@@ -231,32 +328,146 @@ def _get_app_context(repo_full_name: str) -> dict:
     })
 
 
-def _fetch_repo_readme_sync(repo_full_name: str) -> str:
-    """Récupère le README d'un repo — exécuté en thread executor."""
-    from github import GithubException
+def _decode_content(payload: Dict[str, Any]) -> str:
+    import base64
+    content = base64.b64decode(payload.get("content", "")).decode("utf-8", errors="replace")
+    return content[:3000]
+
+
+# ─────────────────────────────────────────────────────────────
+# Résolution nom d'app → repo, sans appel réseau (/analyse <app>)
+# ─────────────────────────────────────────────────────────────
+
+# (repos configurés, index {terme normalisé: repo}) — reconstruit si la config change
+_resolver_cache: Optional[tuple] = None
+
+
+def _normalize(term: str) -> str:
+    return "".join(ch for ch in term.lower() if ch.isalnum())
+
+
+def _resolver_index() -> Dict[str, str]:
+    """Index en mémoire : nom d'app, nom de repo, owner/repo et alias → repo complet."""
+    global _resolver_cache
+    repos = tuple(settings.github_repo_list)
+    if _resolver_cache is not None and _resolver_cache[0] == repos:
+        return _resolver_cache[1]
+
+    index: Dict[str, str] = {}
+    for repo in repos:
+        app_context = _get_app_context(repo)
+        terms = [repo, repo.split("/")[-1], app_context["name"], *app_context.get("aliases", [])]
+        for term in terms:
+            # Le premier repo déclaré l'emporte en cas d'alias partagé
+            index.setdefault(_normalize(term), repo)
+    _resolver_cache = (repos, index)
+    return index
+
+
+def resolve_repo(query: str) -> Optional[str]:
+    """
+    Résout un filtre libre (« job », « Job Verdict », « kalen »…) vers un repo configuré.
+    Correspondance exacte d'abord, puis préfixe, puis sous-chaîne ; None si aucune.
+    """
+    key = _normalize(query)
+    if not key:
+        return None
+    index = _resolver_index()
+    if key in index:
+        return index[key]
+    for match in (lambda term: term.startswith(key), lambda term: key in term):
+        for term, repo in index.items():
+            if match(term):
+                return repo
+    return None
+
+
+def configured_app_names() -> List[str]:
+    """Noms des apps configurées — pour les messages d'aide, sans appel réseau."""
+    return [_get_app_context(repo)["name"] for repo in settings.github_repo_list]
+
+
+def _fetch_repo_readme_sync(repo_full_name: str) -> Dict[str, str]:
+    """
+    Récupère le README d'un repo, son SHA de blob et son chemin — exécuté en thread executor.
+    L'API résout elle-même le nom du fichier (README.rst, docs/README.md…).
+    """
     try:
-        g = _get_client()
-        repo = g.get_repo(repo_full_name)
-        readme = repo.get_readme()
-        content = readme.decoded_content.decode("utf-8", errors="replace")
-        return content[:3000]
+        readme = _github_get(f"/repos/{repo_full_name}/readme")
+        return {"sha": readme.get("sha", ""), "path": readme.get("path", ""), "content": _decode_content(readme)}
     except Exception as e:
         logger.debug(f"README non disponible pour {repo_full_name}: {e}")
-        return ""
+        return {"sha": "", "path": "", "content": ""}
+
+
+async def fetch_readme_rest(repo_full_name: str) -> Dict[str, str]:
+    """README via REST {sha, path, content} — repli quand GraphQL ne trouve pas README.md."""
+    from src.executors import run_blocking
+    return await run_blocking("github", _fetch_repo_readme_sync, repo_full_name)
+
+
+def _fetch_readme_blob_sync(repo_full_name: str, sha: str) -> str:
+    """Contenu d'un blob README par SHA (immuable) — exécuté en thread executor."""
+    return _decode_content(_github_get(f"/repos/{repo_full_name}/git/blobs/{sha}"))
+
+
+async def fetch_readme_blob(repo_full_name: str, sha: str) -> str:
+    from src.executors import run_blocking
+    return await run_blocking("github", _fetch_readme_blob_sync, repo_full_name, sha)
 
 
 async def fetch_repo_readme(repo_full_name: str) -> str:
-    loop = asyncio.get_event_loop()
-    return await loop.run_in_executor(None, _fetch_repo_readme_sync, repo_full_name)
+    """
+    README d'un repo — lu dans le cache SHA en base (tenu à jour par la synchro
+    GitHub) ; téléchargé et mis en cache uniquement s'il n'y est pas encore.
+    """
+    from src.integrations.github_store import get_cached_readme, save_readme
 
+    try:
+        cached = await get_cached_readme(repo_full_name)
+        if cached is not None:
+            return cached
+    except Exception as e:
+        logger.warning(f"Cache README indisponible pour {repo_full_name}: {e}")
 
-async def fetch_repo_full_context(repo_full_name: str) -> dict:
-    """Contexte complet d'un repo : activité 7j + README + contexte business."""
-    activity, readme = await asyncio.gather(
-        fetch_repo_activity(repo_full_name, hours_back=168),
-        fetch_repo_readme(repo_full_name),
-        return_exceptions=True,
-    )
+    readme = await fetch_readme_rest(repo_full_name)
+    if readme["sha"]:
+        try:
+            await save_readme(repo_full_name, readme["sha"], readme["content"], path=readme["path"])
+        except Exception as e:
+            logger.warning(f"Erreur mise en cache README {repo_full_name}: {e}")
+    return readme["content"]
+
+
+async def _fetch_repo_week_activity(repo_full_name: str) -> Dict[str, Any]:
+    """Activité 7j d'un seul repo : store local, repli REST."""
+    from src.integrations.github_store import load_activity
+    try:
+        activity = (await load_activity(hours_back=168, repos=[repo_full_name]))[0]
+        if not activity.get("error"):
+            return activity
+    except Exception as e:
+        logger.warning(f"Store GitHub indisponible pour {repo_full_name} : {e}")
+    return await fetch_repo_activity(repo_full_name, hours_back=168)
+
+
+async def fetch_repo_full_context(
+    repo_full_name: str,
+    activity: Optional[Dict[str, Any]] = None,
+) -> dict:
+    """
+    Contexte complet d'un repo : activité 7j + README + contexte business.
+    `activity` permet de réutiliser une activité 7j déjà récupérée (snapshot).
+    """
+    if activity is None:
+        activity, readme = await asyncio.gather(
+            _fetch_repo_week_activity(repo_full_name),
+            fetch_repo_readme(repo_full_name),
+            return_exceptions=True,
+        )
+    else:
+        readme = await asyncio.gather(fetch_repo_readme(repo_full_name), return_exceptions=True)
+        readme = readme[0]
     if isinstance(activity, Exception):
         activity = {"repo": repo_full_name, "error": str(activity), "commits": [], "open_prs": [], "open_issues": []}
     if isinstance(readme, Exception):
@@ -271,10 +482,44 @@ async def fetch_repo_full_context(repo_full_name: str) -> dict:
 
 
 async def fetch_all_repos_full_context() -> List[Dict[str, Any]]:
-    """Contexte complet de tous les repos configurés en parallèle."""
+    """
+    Contexte complet de tous les repos configurés.
+    Activité 7j lue dans le store local + README ; sinon une seule requête
+    GraphQL (activité + README), puis repli REST si elle échoue.
+    """
     if not settings.github_configured:
         return []
     repos = settings.github_repo_list
+    if not repos:
+        return []
+
+    from src.integrations.github_store import load_activity
+    try:
+        activity = await load_activity(hours_back=168)
+        if any(not a.get("error") for a in activity):
+            results = await asyncio.gather(
+                *[fetch_repo_full_context(a["repo"], activity=a) for a in activity],
+                return_exceptions=True,
+            )
+            return [r for r in results if not isinstance(r, Exception)]
+    except Exception as e:
+        logger.warning(f"Store GitHub indisponible, appel direct à l'API : {e}")
+
+    from src.integrations.github_graphql import fetch_repos_full_context
+    try:
+        contexts = await fetch_repos_full_context(repos, hours_back=168)
+        # README hors README.md / readme.md : cache SHA puis REST
+        missing = [c for c in contexts if not c["readme"]]
+        readmes = await asyncio.gather(
+            *[fetch_repo_readme(c["repo"]) for c in missing],
+            return_exceptions=True,
+        )
+        for c, readme in zip(missing, readmes):
+            c["readme"] = "" if isinstance(readme, Exception) else readme
+        return [{**c, "app_context": _get_app_context(c["repo"])} for c in contexts]
+    except Exception as e:
+        logger.warning(f"GitHub GraphQL indisponible, repli REST : {e}")
+
     results = await asyncio.gather(
         *[fetch_repo_full_context(r) for r in repos],
         return_exceptions=True,
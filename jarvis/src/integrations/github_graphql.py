@@ -0,0 +1,433 @@
+"""
+Client GitHub GraphQL asynchrone — activité de tous les repos en une requête.
+
+Une seule requête (un alias par repo) récupère commits depuis la fenêtre,
+PRs ouvertes, issues ouvertes et, au besoin, le README. Les résultats ont
+exactement la forme des dicts produits par le connecteur REST (github.py),
+consommés tels quels par les formatters et l'analyse produit.
+"""
+import logging
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional, Tuple
+
+from src.config import settings
+
+logger = logging.getLogger(__name__)
+
+GITHUB_GRAPHQL_URL = "https://api.github.com/graphql"
+
+_REPO_FRAGMENT = """
+fragment RepoActivity on Repository {
+  description
+  stargazerCount
+  defaultBranchRef {
+    target {
+      ... on Commit {
+        history(first: 5, since: $since) {
+          nodes { oid messageHeadline author { name date } }
+        }
+      }
+    }
+  }
+  pullRequests(states: OPEN, first: 5, orderBy: {field: UPDATED_AT, direction: DESC}) {
+    nodes { number title updatedAt author { login } }
+  }
+  issues(states: OPEN, first: 5, orderBy: {field: UPDATED_AT, direction: DESC}) {
+    nodes { number title updatedAt author { login } }
+  }
+  readme: object(expression: "HEAD:README.md") @include(if: $withReadme) {
+    ... on Blob { text }
+  }
+  readmeLower: object(expression: "HEAD:readme.md") @include(if: $withReadme) {
+    ... on Blob { text }
+  }
+}
+"""
+
+_client = None
+
+
+def _get_client():
+    global _client
+    if _client is None:
+        import httpx
+        _client = httpx.AsyncClient(
+            headers={"Authorization": f"Bearer {settings.github_token}"},
+            timeout=httpx.Timeout(20.0),
+        )
+    return _client
+
+
+def _build_query(repos: List[str]) -> tuple:
+    """Construit la requête aliasée (r0, r1, …) et ses variables owner/name."""
+    var_defs = ["$since: GitTimestamp!", "$withReadme: Boolean!"]
+    fields = []
+    variables: Dict[str, Any] = {}
+    for i, full_name in enumerate(repos):
+        owner, name = full_name.split("/", 1)
+        var_defs += [f"$o{i}: String!", f"$n{i}: String!"]
+        fields.append(f"  r{i}: repository(owner: $o{i}, name: $n{i}) {{ ...RepoActivity }}")
+        variables[f"o{i}"] = owner
+        variables[f"n{i}"] = name
+    query = f"query({', '.join(var_defs)}) {{\n" + "\n".join(fields) + "\n}\n" + _REPO_FRAGMENT
+    return query, variables
+
+
+def _iso(timestamp: str) -> str:
+    return datetime.fromisoformat(timestamp.replace("Z", "+00:00")).isoformat()
+
+
+def _login(node: Dict[str, Any]) -> str:
+    return (node.get("author") or {}).get("login", "")
+
+
+def _to_activity(repo_full_name: str, node: Dict[str, Any]) -> Dict[str, Any]:
+    target = ((node.get("defaultBranchRef") or {}).get("target") or {})
+    history = (target.get("history") or {}).get("nodes", [])
+    return {
+        "repo": repo_full_name,
+        "description": node.get("description") or "",
+        "stars": node.get("stargazerCount", 0),
+        "commits": [
+            {
+                "sha": c["oid"][:7],
+                "message": (c.get("messageHeadline") or "")[:80],
+                "author": (c.get("author") or {}).get("name", ""),
+                "date": _iso(c["author"]["date"]),
+            }
+            for c in history
+        ],
+        "open_prs": [
+            {"number": p["number"], "title": p["title"][:80], "author": _login(p), "updated_at": _iso(p["updatedAt"])}
+            for p in (node.get("pullRequests") or {}).get("nodes", [])
+        ],
+        "open_issues": [
+            {"number": i["number"], "title": i["title"][:80], "author": _login(i), "updated_at": _iso(i["updatedAt"])}
+            for i in (node.get("issues") or {}).get("nodes", [])
+        ],
+        "error": None,
+    }
+
+
+def _readme_text(node: Dict[str, Any]) -> str:
+    blob = node.get("readme") or node.get("readmeLower") or {}
+    return (blob.get("text") or "")[:3000]
+
+
+async def _query_repos(repos: List[str], hours_back: int, with_readme: bool) -> Dict[str, Any]:
+    cutoff = datetime.now(timezone.utc) - timedelta(hours=hours_back)
+    query, variables = _build_query(repos)
+    variables["since"] = cutoff.strftime("%Y-%m-%dT%H:%M:%SZ")
+    variables["withReadme"] = with_readme
+
+    resp = await _get_client().post(GITHUB_GRAPHQL_URL, json={"query": query, "variables": variables})
+    resp.raise_for_status()
+    payload = resp.json()
+    if not payload.get("data"):
+        raise RuntimeError(f"GitHub GraphQL : {payload.get('errors')}")
+    return payload
+
+
+def _repo_errors(payload: Dict[str, Any]) -> Dict[str, str]:
+    errors: Dict[str, str] = {}
+    for err in payload.get("errors") or []:
+        path = err.get("path") or []
+        if path:
+            errors[path[0]] = err.get("message", "erreur GraphQL")
+    return errors
+
+
+async def fetch_repos_activity(repos: List[str], hours_back: int = 24) -> List[Dict[str, Any]]:
+    """Activité de tous les repos en une requête GraphQL — même forme que le REST."""
+    payload = await _query_repos(repos, hours_back, with_readme=False)
+    errors = _repo_errors(payload)
+    activity = []
+    for i, full_name in enumerate(repos):
+        node = payload["data"].get(f"r{i}")
+        if node is None:
+            error = errors.get(f"r{i}", "repo introuvable")
+            logger.error(f"GitHub GraphQL error pour {full_name}: {error}")
+            activity.append({"repo": full_name, "error": error, "commits": [], "open_prs": [], "open_issues": []})
+        else:
+            activity.append(_to_activity(full_name, node))
+    return activity
+
+
+async def fetch_repos_full_context(
+    repos: List[str],
+    hours_back: int = 168,
+) -> List[Dict[str, Any]]:
+    """
+    Activité + README de tous les repos en une requête GraphQL.
+    Retourne des dicts {repo, readme, activity} (sans contexte business).
+    """
+    payload = await _query_repos(repos, hours_back, with_readme=True)
+    errors = _repo_errors(payload)
+    contexts = []
+    for i, full_name in enumerate(repos):
+        node = payload["data"].get(f"r{i}")
+        if node is None:
+            error = errors.get(f"r{i}", "repo introuvable")
+            activity = {"repo": full_name, "error": error, "commits": [], "open_prs": [], "open_issues": []}
+            readme = ""
+        else:
+            activity = _to_activity(full_name, node)
+            readme = _readme_text(node)
+        contexts.append({"repo": full_name, "readme": readme, "activity": activity})
+    return contexts
+
+
+# ─────────────────────────────────────────────────────────────
+# Synchronisation incrémentale — changements depuis un curseur par repo
+# ─────────────────────────────────────────────────────────────
+
+_COMMIT_NODES = "nodes {{ oid messageHeadline author {{ name date }} }} pageInfo {{ hasNextPage endCursor }}"
+_ITEM_NODES = "nodes {{ number title state updatedAt author {{ login }} }} pageInfo {{ hasNextPage endCursor }}"
+_UPDATED_DESC = "orderBy: {{field: UPDATED_AT, direction: DESC}}"
+
+# Connexions paginées de la synchro : nom → (sélection, chemin des nœuds, variables du repo utilisées).
+# {after} vaut "" à la première page, puis ", after: $a{i}" pour les pages suivantes.
+_CHANGES_CONNECTIONS: Dict[str, Tuple[str, Tuple[str, ...], Tuple[str, ...]]] = {
+    "history": (
+        "defaultBranchRef {{ target {{ ... on Commit {{ history(first: 100, since: $s{i}{after}) {{ "
+        + _COMMIT_NODES + " }} }} }} }}",
+        ("defaultBranchRef", "target", "history"),
+        ("s",),
+    ),
+    "pullRequests": (
+        "pullRequests(first: 50{after}, " + _UPDATED_DESC + ") {{ " + _ITEM_NODES + " }}",
+        ("pullRequests",),
+        (),
+    ),
+    "issues": (
+        "issues(first: 50{after}, filterBy: {{since: $d{i}}}, " + _UPDATED_DESC + ") {{ " + _ITEM_NODES + " }}",
+        ("issues",),
+        ("d",),
+    ),
+}
+
+# Premier passage d'un repo : toutes les PRs / issues encore ouvertes, quel que soit leur âge
+_OPEN_BACKFILL_CONNECTIONS: Dict[str, Tuple[str, Tuple[str, ...], Tuple[str, ...]]] = {
+    "openPullRequests": (
+        "openPullRequests: pullRequests(states: OPEN, first: 100{after}, " + _UPDATED_DESC + ") {{ "
+        + _ITEM_NODES + " }}",
+        ("openPullRequests",),
+        (),
+    ),
+    "openIssues": (
+        "openIssues: issues(states: OPEN, first: 100{after}, " + _UPDATED_DESC + ") {{ " + _ITEM_NODES + " }}",
+        ("openIssues",),
+        (),
+    ),
+}
+
+_REPO_VAR_TYPES = {"s": "GitTimestamp!", "d": "DateTime!"}
+
+# SHA du README : chemin connu (résolu par REST) ou, à défaut, les deux noms usuels
+_README_BY_PATH = """    readme: object(expression: $p{i}) {{ ... on Blob {{ oid }} }}
+"""
+_README_DEFAULT = """    readme: object(expression: "HEAD:README.md") {{ ... on Blob {{ oid }} }}
+    readmeLower: object(expression: "HEAD:readme.md") {{ ... on Blob {{ oid }} }}
+"""
+
+
+def _to_item(node: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        "number": node["number"],
+        "title": node["title"],
+        "author": _login(node),
+        "state": node["state"].lower(),
+        "updated_at": datetime.fromisoformat(_iso(node["updatedAt"])),
+    }
+
+
+def _merge_items(items: List[Dict[str, Any]], open_nodes: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Ajoute les éléments ouverts du backfill absents de la fenêtre du curseur."""
+    seen = {item["number"] for item in items}
+    return items + [_to_item(n) for n in open_nodes if n["number"] not in seen]
+
+
+def _dig(node: Dict[str, Any], path: Tuple[str, ...]) -> Dict[str, Any]:
+    for key in path:
+        node = node.get(key) or {}
+    return node
+
+
+async def _post_graphql(query: str, variables: Dict[str, Any]) -> Dict[str, Any]:
+    resp = await _get_client().post(GITHUB_GRAPHQL_URL, json={"query": query, "variables": variables})
+    resp.raise_for_status()
+    payload = resp.json()
+    if not payload.get("data"):
+        raise RuntimeError(f"GitHub GraphQL : {payload.get('errors')}")
+    return payload
+
+
+async def _fetch_next_pages(
+    full_name: str,
+    connection: Tuple[str, Tuple[str, ...], Tuple[str, ...]],
+    repo_vars: Dict[str, str],
+    after: str,
+    stop_before: Optional[datetime] = None,
+) -> List[Dict[str, Any]]:
+    """
+    Pages suivantes d'une connexion d'un repo, jusqu'à la dernière.
+    stop_before : arrêt dès qu'une page atteint des éléments plus anciens (PRs,
+    sans filtre `since` côté API mais triées par mise à jour décroissante).
+    """
+    selection, path, var_names = connection
+    owner, name = full_name.split("/", 1)
+    var_defs = ["$o0: String!", "$n0: String!", "$a0: String!"]
+    var_defs += [f"${v}0: {_REPO_VAR_TYPES[v]}" for v in var_names]
+    query = (
+        f"query({', '.join(var_defs)}) {{\n"
+        f"  r0: repository(owner: $o0, name: $n0) {{ "
+        + selection.format(i=0, after=", after: $a0")
+        + " }\n}"
+    )
+    variables = {"o0": owner, "n0": name, **{f"{v}0": repo_vars[v] for v in var_names}}
+
+    nodes: List[Dict[str, Any]] = []
+    while after:
+        variables["a0"] = after
+        payload = await _post_graphql(query, variables)
+        page = _dig(payload["data"].get("r0") or {}, path)
+        if not page:
+            raise RuntimeError(f"page GraphQL introuvable : {'.'.join(path)}")
+        nodes += page.get("nodes", [])
+        info = page.get("pageInfo") or {}
+        after = info.get("endCursor") if info.get("hasNextPage") else None
+        if stop_before and nodes and _to_item(nodes[-1])["updated_at"] < stop_before:
+            break
+    return nodes
+
+
+async def _all_nodes(
+    full_name: str,
+    node: Dict[str, Any],
+    name: str,
+    connection: Tuple[str, Tuple[str, ...], Tuple[str, ...]],
+    repo_vars: Dict[str, str],
+    stop_before: Optional[datetime] = None,
+) -> List[Dict[str, Any]]:
+    """Nœuds de la première page (requête groupée) complétés des pages suivantes."""
+    page = _dig(node, connection[1])
+    nodes = list(page.get("nodes", []))
+    info = page.get("pageInfo") or {}
+    if info.get("hasNextPage") and not (
+        stop_before and nodes and _to_item(nodes[-1])["updated_at"] < stop_before
+    ):
+        logger.info(f"Synchro GitHub {full_name} : {name} sur plusieurs pages")
+        nodes += await _fetch_next_pages(full_name, connection, repo_vars, info["endCursor"], stop_before)
+    return nodes
+
+
+async def fetch_repos_changes(
+    cursors: Dict[str, datetime],
+    readme_paths: Dict[str, str],
+    initial_repos: List[str],
+) -> Dict[str, Dict[str, Any]]:
+    """
+    Commits, PRs et issues modifiés depuis le curseur de chaque repo, en une requête.
+    Les connexions dont la première page est pleine sont complétées page par page
+    (pageInfo) : rien n'est perdu quand le curseur avance ; un repo dont une page
+    échoue est marqué en erreur et garde son curseur.
+    Pour `initial_repos` (jamais synchronisés), les PRs et issues ouvertes sont
+    récupérées en plus sans filtre de date : le curseur ne borne que l'historique.
+    Retourne {repo: {description, stars, commits, prs, issues, readme_sha, readme_path, error}}.
+    Seul le SHA du README est demandé (au chemin déjà résolu s'il est connu) :
+    son contenu n'est relu que s'il a changé ; readme_sha vaut None si introuvable.
+    Les PRs n'ont pas de filtre `since` côté API : elles sont filtrées ici.
+    """
+    repos = list(cursors)
+    var_defs = []
+    fields = []
+    variables: Dict[str, Any] = {}
+    repo_vars: Dict[str, Dict[str, str]] = {}
+    for i, full_name in enumerate(repos):
+        owner, name = full_name.split("/", 1)
+        var_defs += [f"$o{i}: String!", f"$n{i}: String!", f"$s{i}: GitTimestamp!", f"$d{i}: DateTime!"]
+        readme_path = readme_paths.get(full_name)
+        if readme_path:
+            var_defs.append(f"$p{i}: String!")
+            variables[f"p{i}"] = f"HEAD:{readme_path}"
+        connections = dict(_CHANGES_CONNECTIONS)
+        if full_name in initial_repos:
+            connections.update(_OPEN_BACKFILL_CONNECTIONS)
+        fields.append(
+            f"  r{i}: repository(owner: $o{i}, name: $n{i}) {{\n    description\n    stargazerCount\n"
+            + "".join(f"    {selection.format(i=i, after='')}\n" for selection, _, _ in connections.values())
+            + (_README_BY_PATH if readme_path else _README_DEFAULT).format(i=i)
+            + "  }"
+        )
+        variables[f"o{i}"] = owner
+        variables[f"n{i}"] = name
+        since = cursors[full_name].astimezone(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
+        # history(since:) attend un GitTimestamp, issues(filterBy.since) un DateTime
+        variables[f"s{i}"] = since
+        variables[f"d{i}"] = since
+        repo_vars[full_name] = {"s": since, "d": since}
+    query = f"query({', '.join(var_defs)}) {{\n" + "\n".join(fields) + "\n}"
+
+    payload = await _post_graphql(query, variables)
+    errors = _repo_errors(payload)
+
+    changes: Dict[str, Dict[str, Any]] = {}
+    for i, full_name in enumerate(repos):
+        node = payload["data"].get(f"r{i}")
+        if node is None:
+            changes[full_name] = {"error": errors.get(f"r{i}", "repo introuvable")}
+            continue
+        cursor = cursors[full_name]
+        try:
+            pages = {
+                name: await _all_nodes(
+                    full_name, node, name, connection, repo_vars[full_name],
+                    stop_before=cursor if name == "pullRequests" else None,
+                )
+                for name, connection in _CHANGES_CONNECTIONS.items()
+            }
+            if full_name in initial_repos:
+                for name, connection in _OPEN_BACKFILL_CONNECTIONS.items():
+                    pages[name] = await _all_nodes(full_name, node, name, connection, repo_vars[full_name])
+        except Exception as e:
+            changes[full_name] = {"error": f"pagination : {e}"}
+            continue
+
+        if node.get("readme"):
+            readme_sha = node["readme"].get("oid")
+            readme_path = readme_paths.get(full_name) or "README.md"
+        else:
+            readme_sha = (node.get("readmeLower") or {}).get("oid")
+            readme_path = "readme.md" if readme_sha else None
+        changes[full_name] = {
+            "description": node.get("description") or "",
+            "stars": node.get("stargazerCount", 0),
+            "commits": [
+                {
+                    "sha": c["oid"],
+                    "message": (c.get("messageHeadline") or "")[:500],
+                    "author": (c.get("author") or {}).get("name", ""),
+                    "committed_at": datetime.fromisoformat(_iso(c["author"]["date"])),
+                }
+                for c in pages["history"]
+            ],
+            "prs": _merge_items(
+                [item for item in map(_to_item, pages["pullRequests"]) if item["updated_at"] >= cursor],
+                pages.get("openPullRequests", []),
+            ),
+            "issues": _merge_items(
+                [_to_item(n) for n in pages["issues"]],
+                pages.get("openIssues", []),
+            ),
+            "readme_sha": readme_sha,
+            "readme_path": readme_path,
+            "error": None,
+        }
+    return changes
+
+
+async def close_client() -> None:
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
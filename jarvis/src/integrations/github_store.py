@@ -0,0 +1,330 @@
+"""
+Store GitHub local — commits, PRs et issues synchronisés en base.
+
+Un job scheduler synchronise chaque repo de façon incrémentale (curseur
+`since` = dernière synchro réussie) via une requête GraphQL groupée, complétée
+page par page pour les repos dont une page revient pleine. Les
+consommateurs (digest, briefing, /github, rapport produit) lisent ensuite
+n'importe quelle fenêtre depuis Postgres, sans appel à l'API GitHub.
+
+Les README sont mis en cache par SHA de blob : la synchro ne demande que
+leur SHA et ne télécharge le contenu que lorsqu'il a changé. Un README hors
+README.md / readme.md est résolu une fois via REST, puis suivi à son chemin.
+"""
+import asyncio
+import logging
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional
+
+from src.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Historique de commits et d'éléments fermés récupéré au premier passage d'un repo
+# (les PRs / issues encore ouvertes sont toutes récupérées, quel que soit leur âge)
+INITIAL_BACKFILL = timedelta(days=30)
+# Recouvrement des curseurs : absorbe les décalages d'horloge et la latence d'indexation GitHub
+CURSOR_OVERLAP = timedelta(minutes=5)
+# Au-delà, une lecture déclenche d'abord une synchro (job arrêté, premier démarrage…)
+STALE_AFTER = timedelta(minutes=settings.github_sync_interval_minutes * 2)
+# Nombre d'éléments par repo exposés aux formatters (même forme que l'API)
+ITEMS_PER_REPO = 5
+
+_sync_lock = asyncio.Lock()
+
+
+# ─────────────────────────────────────────────────────────────
+# Synchronisation
+# ─────────────────────────────────────────────────────────────
+
+async def _load_cursors(repos: List[str]) -> Dict[str, Optional[datetime]]:
+    from sqlalchemy import select
+    from src.memory.database import GithubRepo, async_session
+
+    async with async_session() as session:
+        result = await session.execute(
+            select(GithubRepo.repo, GithubRepo.synced_at).where(GithubRepo.repo.in_(repos))
+        )
+        synced = dict(result.all())
+    return {repo: synced.get(repo) for repo in repos}
+
+
+async def _upsert_changes(repo: str, changes: Dict[str, Any], synced_at: datetime) -> None:
+    from sqlalchemy.dialects.postgresql import insert
+    from src.memory.database import GithubCommit, GithubItem, GithubRepo, async_session
+
+    async with async_session() as session:
+        if changes["commits"]:
+            await session.execute(
+                insert(GithubCommit)
+                .values([{"repo": repo, **c} for c in changes["commits"]])
+                .on_conflict_do_nothing(constraint="uq_github_commit")
+            )
+
+        items = (
+            [{"repo": repo, "kind": "pr", **p} for p in changes["prs"]]
+            + [{"repo": repo, "kind": "issue", **i} for i in changes["issues"]]
+        )
+        if items:
+            stmt = insert(GithubItem).values(items)
+            await session.execute(
+                stmt.on_conflict_do_update(
+                    constraint="uq_github_item",
+                    set_={
+                        "title": stmt.excluded.title,
+                        "author": stmt.excluded.author,
+                        "state": stmt.excluded.state,
+                        "updated_at": stmt.excluded.updated_at,
+                    },
+                )
+            )
+
+        stmt = insert(GithubRepo).values(
+            repo=repo,
+            description=changes["description"],
+            stars=changes["stars"],
+            synced_at=synced_at,
+        )
+        await session.execute(
+            stmt.on_conflict_do_update(
+                index_elements=[GithubRepo.repo],
+                set_={
+                    "description": stmt.excluded.description,
+                    "stars": stmt.excluded.stars,
+                    "synced_at": stmt.excluded.synced_at,
+                },
+            )
+        )
+        await session.commit()
+
+
+async def get_cached_readme(repo: str) -> Optional[str]:
+    """Contenu du README en cache, None s'il n'a jamais été récupéré."""
+    from sqlalchemy import select
+    from src.memory.database import GithubReadme, async_session
+
+    async with async_session() as session:
+        result = await session.execute(select(GithubReadme.content).where(GithubReadme.repo == repo))
+        return result.scalar_one_or_none()
+
+
+async def save_readme(repo: str, sha: str, content: str, path: Optional[str] = None) -> None:
+    from sqlalchemy.dialects.postgresql import insert
+    from src.memory.database import GithubReadme, async_session
+
+    stmt = insert(GithubReadme).values(
+        repo=repo, sha=sha, path=path or None, content=content, fetched_at=datetime.now(timezone.utc)
+    )
+    async with async_session() as session:
+        await session.execute(
+            stmt.on_conflict_do_update(
+                index_elements=[GithubReadme.repo],
+                set_={
+                    "sha": stmt.excluded.sha,
+                    "path": stmt.excluded.path,
+                    "content": stmt.excluded.content,
+                    "fetched_at": stmt.excluded.fetched_at,
+                },
+            )
+        )
+        await session.commit()
+
+
+async def _load_readme_paths(repos: List[str]) -> Dict[str, str]:
+    """Chemins de README résolus lors des synchros précédentes."""
+    from sqlalchemy import select
+    from src.memory.database import GithubReadme, async_session
+
+    async with async_session() as session:
+        result = await session.execute(
+            select(GithubReadme.repo, GithubReadme.path)
+            .where(GithubReadme.repo.in_(repos), GithubReadme.path.is_not(None))
+        )
+        return dict(result.all())
+
+
+async def _refresh_readmes(readmes: Dict[str, Dict[str, Optional[str]]]) -> None:
+    """
+    Télécharge uniquement les README dont le SHA de blob a changé depuis la dernière synchro.
+    readmes : {repo: {"sha", "path"}} ; sha None (README introuvable au chemin
+    demandé) → résolution par l'API REST, qui connaît tous les noms de README.
+    """
+    from sqlalchemy import select
+    from src.integrations.github import fetch_readme_blob, fetch_readme_rest
+    from src.memory.database import GithubReadme, async_session
+
+    async with async_session() as session:
+        result = await session.execute(
+            select(GithubReadme.repo, GithubReadme.sha).where(GithubReadme.repo.in_(list(readmes)))
+        )
+        cached = dict(result.all())
+
+    for repo, readme in readmes.items():
+        sha, path = readme["sha"], readme["path"]
+        try:
+            if sha is None:
+                resolved = await fetch_readme_rest(repo)
+                if not resolved["sha"] or cached.get(repo) == resolved["sha"]:
+                    continue
+                await save_readme(repo, resolved["sha"], resolved["content"], path=resolved["path"])
+                logger.info(f"README {repo} résolu via REST ({resolved['path']})")
+                continue
+            if cached.get(repo) == sha:
+                continue
+            await save_readme(repo, sha, await fetch_readme_blob(repo, sha), path=path)
+            logger.info(f"README {repo} mis à jour ({sha[:7]})")
+        except Exception as e:
+            logger.warning(f"Erreur récupération README {repo}: {e}")
+
+
+async def sync_github_activity() -> int:
+    """
+    Job scheduler — synchronise les changements depuis la dernière synchro de chaque repo.
+    Un repo en erreur garde son curseur et sera repris au passage suivant.
+    Retourne le nombre de repos synchronisés.
+    """
+    if not settings.github_configured or not settings.github_repo_list:
+        return 0
+
+    async with _sync_lock:
+        from src.integrations.github_graphql import fetch_repos_changes
+
+        repos = settings.github_repo_list
+        started = datetime.now(timezone.utc)
+        synced_ats = await _load_cursors(repos)
+        cursors = {
+            repo: (synced_at - CURSOR_OVERLAP) if synced_at else started - INITIAL_BACKFILL
+            for repo, synced_at in synced_ats.items()
+        }
+        initial_repos = [repo for repo, synced_at in synced_ats.items() if synced_at is None]
+
+        changes = await fetch_repos_changes(cursors, await _load_readme_paths(repos), initial_repos)
+
+        synced = 0
+        for repo, repo_changes in changes.items():
+            if repo_changes.get("error"):
+                logger.warning(f"Synchro GitHub {repo} en échec : {repo_changes['error']}")
+                continue
+            try:
+                await _upsert_changes(repo, repo_changes, started)
+                synced += 1
+            except Exception as e:
+                logger.error(f"Erreur écriture store GitHub {repo}: {e}")
+
+        await _refresh_readmes({
+            repo: {"sha": c["readme_sha"], "path": c["readme_path"]}
+            for repo, c in changes.items()
+            if not c.get("error")
+        })
+
+        logger.info(f"Store GitHub synchronisé : {synced}/{len(repos)} repo(s)")
+        return synced
+
+
+async def _ensure_fresh(repos: List[str]) -> None:
+    """Synchronise avant lecture si un repo n'a jamais été synchronisé ou est périmé."""
+    cursors = await _load_cursors(repos)
+    threshold = datetime.now(timezone.utc) - STALE_AFTER
+    if any(synced_at is None or synced_at < threshold for synced_at in cursors.values()):
+        await sync_github_activity()
+
+
+# ─────────────────────────────────────────────────────────────
+# Lecture
+# ─────────────────────────────────────────────────────────────
+
+async def load_activity(hours_back: int = 24, repos: Optional[List[str]] = None) -> List[Dict[str, Any]]:
+    """
+    Activité des repos (tous les repos configurés par défaut) sur une fenêtre
+    arbitraire, lue en base. Même forme que fetch_repos_activity
+    (commits de la fenêtre, PRs/issues ouvertes).
+    """
+    from sqlalchemy import select
+    from src.memory.database import GithubCommit, GithubItem, GithubRepo, async_session
+
+    repos = repos or settings.github_repo_list
+    try:
+        await _ensure_fresh(repos)
+    except Exception as e:
+        logger.warning(f"Synchro GitHub à la lecture impossible, lecture du store en l'état : {e}")
+
+    cutoff = datetime.now(timezone.utc) - timedelta(hours=hours_back)
+    async with async_session() as session:
+        repo_rows = (await session.execute(
+            select(GithubRepo).where(GithubRepo.repo.in_(repos))
+        )).scalars().all()
+        commit_rows = (await session.execute(
+            select(GithubCommit)
+            .where(GithubCommit.repo.in_(repos), GithubCommit.committed_at >= cutoff)
+            .order_by(GithubCommit.committed_at.desc())
+        )).scalars().all()
+        item_rows = (await session.execute(
+            select(GithubItem)
+            .where(GithubItem.repo.in_(repos), GithubItem.state == "open")
+            .order_by(GithubItem.updated_at.desc())
+        )).scalars().all()
+
+    meta = {r.repo: r for r in repo_rows}
+    activity: Dict[str, Dict[str, Any]] = {}
+    for repo in repos:
+        row = meta.get(repo)
+        if row is None or row.synced_at is None:
+            activity[repo] = {"repo": repo, "error": "jamais synchronisé", "commits": [], "open_prs": [], "open_issues": []}
+            continue
+        activity[repo] = {
+            "repo": repo,
+            "description": row.description or "",
+            "stars": row.stars,
+            "commits": [],
+            "open_prs": [],
+            "open_issues": [],
+            "error": None,
+        }
+
+    for c in commit_rows:
+        commits = activity[c.repo]["commits"]
+        if activity[c.repo]["error"] is None and len(commits) < ITEMS_PER_REPO:
+            commits.append({
+                "sha": c.sha[:7],
+                "message": c.message[:80],
+                "author": c.author,
+                "date": c.committed_at.isoformat(),
+            })
+
+    for item in item_rows:
+        key = "open_prs" if item.kind == "pr" else "open_issues"
+        bucket = activity[item.repo][key]
+        if activity[item.repo]["error"] is None and len(bucket) < ITEMS_PER_REPO:
+            bucket.append({
+                "number": item.number,
+                "title": item.title[:80],
+                "author": item.author,
+                "updated_at": item.updated_at.isoformat(),
+            })
+
+    return [activity[repo] for repo in repos]
+
+
+async def load_open_items(repo: str) -> Optional[Dict[str, List[Dict[str, Any]]]]:
+    """
+    Toutes les PRs et issues ouvertes d'un repo (non tronquées) : {"open_prs", "open_issues"}.
+    None si le repo n'a jamais été synchronisé (le store ne fait pas foi).
+    """
+    from sqlalchemy import select
+    from src.memory.database import GithubItem, GithubRepo, async_session
+
+    async with async_session() as session:
+        synced_at = (await session.execute(
+            select(GithubRepo.synced_at).where(GithubRepo.repo == repo)
+        )).scalar_one_or_none()
+        if synced_at is None:
+            return None
+        rows = (await session.execute(
+            select(GithubItem.kind, GithubItem.number, GithubItem.title)
+            .where(GithubItem.repo == repo, GithubItem.state == "open")
+            .order_by(GithubItem.updated_at.desc())
+        )).all()
+    return {
+        "open_prs": [{"number": number, "title": title[:80]} for kind, number, title in rows if kind == "pr"],
+        "open_issues": [{"number": number, "title": title[:80]} for kind, number, title in rows if kind == "issue"],
+    }
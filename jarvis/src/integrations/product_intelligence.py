@@ -3,10 +3,12 @@ Intelligence produit — analyse conviction par app + workflow roadmap.
 Utilise Claude API (tâche haute valeur) pour formuler des recommandations argumentées.
 Workflow : analyse → proposition Telegram → validation → roadmap stockée en DB.
 """
+import asyncio
+import hashlib
 import json
 import logging
 from datetime import datetime, timezone
-from typing import Any, Dict, List, Optional
+from typing import Any, Awaitable, Callable, Dict, List, Optional
 
 import pytz
 
@@ -16,6 +18,10 @@ logger = logging.getLogger(__name__)
 
 PARIS_TZ = pytz.timezone("Europe/Paris")
 
+# Analyses LLM simultanées au maximum, et durée maximale d'une analyse
+ANALYSIS_CONCURRENCY = 3
+ANALYSIS_TIMEOUT_SECONDS = 120
+
 # Mapping app → emoji pour le formatage
 APP_EMOJIS = {
     "Job Verdict": "⚖️",
@@ -24,6 +30,142 @@ APP_EMOJIS = {
 }
 
 
+# ─────────────────────────────────────────────────────────────
+# Entrées hebdomadaires persistées — diff d'une semaine sur l'autre
+# ─────────────────────────────────────────────────────────────
+
+def _app_key(app_name: str) -> str:
+    return app_name.lower().replace(" ", "_")
+
+
+def _snapshot_inputs(
+    readme: str,
+    activity: Dict[str, Any],
+    revenue_data: Optional[Dict[str, Any]],
+    open_items: Optional[Dict[str, List[Dict[str, Any]]]] = None,
+) -> Dict[str, Any]:
+    """
+    Entrées d'analyse réduites à ce qui sert au diff de la semaine suivante.
+    open_items : toutes les PRs / issues ouvertes (store GitHub) ; à défaut, le
+    top 5 de l'activité, marqué incomplet (open_complete=False).
+    """
+    source = open_items or activity
+    inputs = {
+        "date": datetime.now(timezone.utc).strftime("%Y-%m-%d"),
+        "readme_hash": hashlib.sha1(readme.encode()).hexdigest()[:12] if readme else "",
+        "commits": [{"sha": c["sha"], "message": c["message"]} for c in activity.get("commits", [])],
+        "open_prs": [{"number": p["number"], "title": p["title"]} for p in source.get("open_prs", [])],
+        "open_issues": [{"number": i["number"], "title": i["title"]} for i in source.get("open_issues", [])],
+        "open_complete": open_items is not None,
+        "revenue": None,
+    }
+    if revenue_data and not revenue_data.get("error"):
+        inputs["revenue"] = {
+            "mrr": revenue_data.get("mrr", 0.0),
+            "revenue_30d": revenue_data.get("revenue_30d", 0.0),
+            "active_subscriptions": revenue_data.get("active_subscriptions", 0),
+        }
+    return inputs
+
+
+def _diff_inputs(previous: Dict[str, Any], current: Dict[str, Any]) -> Dict[str, Any]:
+    """Diff structuré entre deux semaines : nouveautés, fermetures, écarts de revenus."""
+    def _by_number(items: List[Dict[str, Any]]) -> Dict[int, Dict[str, Any]]:
+        return {i["number"]: i for i in items}
+
+    prev_commits = {c["sha"] for c in previous.get("commits", [])}
+    prev_prs, cur_prs = _by_number(previous.get("open_prs", [])), _by_number(current["open_prs"])
+    prev_issues, cur_issues = _by_number(previous.get("open_issues", [])), _by_number(current["open_issues"])
+    # Sur des listes tronquées (top 5), un élément absent peut être toujours ouvert :
+    # les fermetures ne sont déduites que de listes complètes des deux côtés
+    complete = bool(previous.get("open_complete")) and current["open_complete"]
+
+    revenue_delta = None
+    if previous.get("revenue") and current["revenue"]:
+        revenue_delta = {
+            k: (previous["revenue"][k], current["revenue"][k])
+            for k in ("mrr", "revenue_30d", "active_subscriptions")
+        }
+
+    return {
+        "since": previous.get("date", ""),
+        "new_commits": [c for c in current["commits"] if c["sha"] not in prev_commits],
+        "new_prs": [p for n, p in cur_prs.items() if n not in prev_prs],
+        "closed_prs": [p for n, p in prev_prs.items() if n not in cur_prs] if complete else [],
+        "still_open_prs": len(set(prev_prs) & set(cur_prs)),
+        "new_issues": [i for n, i in cur_issues.items() if n not in prev_issues],
+        "closed_issues": [i for n, i in prev_issues.items() if n not in cur_issues] if complete else [],
+        "still_open_issues": len(set(prev_issues) & set(cur_issues)),
+        "readme_changed": previous.get("readme_hash") != current["readme_hash"],
+        "revenue": revenue_delta,
+    }
+
+
+def _format_diff(diff: Dict[str, Any]) -> str:
+    def _items(label: str, items: List[Dict[str, Any]], prefix: str) -> List[str]:
+        if not items:
+            return []
+        return [f"{label} :"] + [f"- {prefix}{i['number']} : {i['title']}" for i in items[:5]]
+
+    lines = []
+    if diff["new_commits"]:
+        lines.append("Nouveaux commits :")
+        lines += [f"- {c['sha']} : {c['message']}" for c in diff["new_commits"][:5]]
+    else:
+        lines.append("Aucun nouveau commit.")
+    lines += _items("PRs ouvertes", diff["new_prs"], "PR #")
+    lines += _items("PRs fermées/mergées", diff["closed_prs"], "PR #")
+    lines += _items("Nouvelles issues", diff["new_issues"], "Issue #")
+    lines += _items("Issues fermées", diff["closed_issues"], "Issue #")
+    if diff["still_open_prs"] or diff["still_open_issues"]:
+        lines.append(
+            f"Toujours ouvertes depuis la semaine dernière : "
+            f"{diff['still_open_prs']} PR(s), {diff['still_open_issues']} issue(s)"
+        )
+    if diff["revenue"]:
+        (mrr_prev, mrr_cur), (rev_prev, rev_cur), (subs_prev, subs_cur) = (
+            diff["revenue"]["mrr"], diff["revenue"]["revenue_30d"], diff["revenue"]["active_subscriptions"]
+        )
+        lines.append(
+            f"Revenus : MRR {mrr_prev:.0f}€ → {mrr_cur:.0f}€ ({mrr_cur - mrr_prev:+.0f}€) | "
+            f"30j {rev_prev:.0f}€ → {rev_cur:.0f}€ | abonnements {subs_prev} → {subs_cur}"
+        )
+    return "\n".join(lines)
+
+
+def _summarize_roadmap(roadmap: Optional[Dict[str, Any]]) -> str:
+    """Résumé compact d'une roadmap validée : ses actions numérotées et sa date."""
+    if not roadmap:
+        return ""
+    actions = [
+        line.strip() for line in roadmap.get("report", "").splitlines()
+        if line.strip()[:2] in ("1.", "2.", "3.")
+    ][:3]
+    if not actions:
+        return ""
+    approved = (roadmap.get("approved_at") or "")[:10]
+    return f"Roadmap validée ({approved}) :\n" + "\n".join(a[:160] for a in actions)
+
+
+async def _load_previous_inputs(app_key: str) -> Optional[Dict[str, Any]]:
+    from src.memory.database import get_memory
+    raw = await get_memory(f"product_inputs:{app_key}")
+    if not raw:
+        return None
+    try:
+        return json.loads(raw)
+    except Exception:
+        return None
+
+
+async def _save_inputs(app_key: str, inputs: Dict[str, Any]) -> None:
+    from src.memory.database import set_memory
+    try:
+        await set_memory(f"product_inputs:{app_key}", json.dumps(inputs))
+    except Exception as e:
+        logger.warning(f"Erreur sauvegarde entrées analyse {app_key} : {e}")
+
+
 # ─────────────────────────────────────────────────────────────
 # Analyse Claude par app
 # ─────────────────────────────────────────────────────────────
@@ -33,13 +175,22 @@ async def analyze_app_conviction(
     readme: str,
     activity: Dict[str, Any],
     revenue_data: Optional[Dict[str, Any]] = None,
+    persist_inputs: bool = False,
+    bypass_cache: bool = False,
+    on_partial=None,
 ) -> str:
     """
     Génère une analyse conviction d'une app via Claude API.
     Retourne un rapport structuré : état, priorité, roadmap proposée.
+
+    Si les entrées de la semaine précédente existent, le modèle ne reçoit que
+    le diff (nouveautés, fermetures, écarts de revenus) et un résumé de la
+    roadmap validée ; le README n'est renvoyé que s'il a changé.
+    persist_inputs=True enregistre les entrées comme référence (rapport hebdo).
+    bypass_cache=True ignore une analyse identique déjà en cache (/analyse … force).
+    on_partial reçoit le rapport au fil du streaming (affichage progressif /analyse).
     """
-    from src.llm.claude_client import claude_client
-    from src.llm.groq_client import groq_client
+    from src.llm.gateway import complete
 
     app_name = app_context.get("name", "App inconnue")
     app_type = app_context.get("type", "")
@@ -65,7 +216,42 @@ async def analyze_app_conviction(
             f"- Abonnements actifs : {revenue_data.get('active_subscriptions', 0)}"
         )
 
-    readme_str = f"\nREADME (extrait) :\n{readme[:1500]}" if readme else ""
+    app_key = _app_key(app_name)
+    open_items = None
+    if activity.get("repo"):
+        from src.integrations.github_store import load_open_items
+        try:
+            open_items = await load_open_items(activity["repo"])
+        except Exception as e:
+            logger.warning(f"Store GitHub indisponible pour le diff {app_name} : {e}")
+    current_inputs = _snapshot_inputs(readme, activity, revenue_data, open_items)
+    previous_inputs = await _load_previous_inputs(app_key)
+    roadmap_summary = _summarize_roadmap(await get_approved_roadmap(app_key))
+
+    if previous_inputs:
+        diff = _diff_inputs(previous_inputs, current_inputs)
+        readme_str = (
+            f"\nREADME modifié cette semaine (extrait) :\n{readme[:1500]}"
+            if readme and diff["readme_changed"] else ""
+        )
+        roadmap_str = f"\n\n{roadmap_summary}" if roadmap_summary else ""
+        activity_section = f"""**Changements depuis la dernière analyse ({diff['since']}) :**
+{_format_diff(diff)}{roadmap_str}"""
+        if diff["revenue"]:
+            revenue_str = ""  # les revenus figurent dans le diff
+    else:
+        readme_str = f"\nREADME (extrait) :\n{readme[:1500]}" if readme else ""
+        activity_section = f"""**Activité GitHub (7 derniers jours) :**
+Commits :
+{commit_str}
+
+PRs ouvertes :
+{prs_str}
+
+Issues ouvertes :
+{issues_str}"""
+        if roadmap_summary:
+            activity_section += f"\n\n{roadmap_summary}"
 
     prompt = f"""Tu es Jarvis, Chief of Staff de Nassim Boughazi. Analyse cette app et formule une recommandation avec conviction.
 
@@ -75,15 +261,7 @@ Domaine : {domain}
 Objectif 12 mois : {objective}
 Priorité actuelle : {priority_level}{revenue_str}{readme_str}
 
-**Activité GitHub (7 derniers jours) :**
-Commits :
-{commit_str}
-
-PRs ouvertes :
-{prs_str}
-
-Issues ouvertes :
-{issues_str}
+{activity_section}
 
 ---
 Génère un rapport structuré en Markdown (max 400 mots) :
@@ -110,15 +288,13 @@ Génère un rapport structuré en Markdown (max 400 mots) :
 Ton : factuel, direct, pas de fioritures. Tu ne présentes pas des options — tu recommandes avec conviction."""
 
     try:
-        # Utiliser Claude pour l'analyse haute valeur
-        if claude_client.available:
-            result = await claude_client.analyze(
-                content="",
-                task=prompt,
-            )
-        else:
-            # Fallback Groq si Claude non configuré
-            result = await groq_client.chat([{"role": "user", "content": prompt}])
+        # Claude pour l'analyse haute valeur (repli Groq si non configuré)
+        result = await complete(
+            prompt, site="product_analysis", provider="claude",
+            bypass_cache=bypass_cache, on_partial=on_partial,
+        )
+        if persist_inputs:
+            await _save_inputs(app_key, current_inputs)
         return result
     except Exception as e:
         logger.error(f"Erreur analyse conviction {app_name}: {e}")
@@ -129,67 +305,102 @@ Ton : factuel, direct, pas de fioritures. Tu ne présentes pas des options — t
 # Rapport hebdomadaire produit complet
 # ─────────────────────────────────────────────────────────────
 
-async def generate_weekly_product_report() -> List[Dict[str, Any]]:
+async def _analyze_context(
+    ctx: Dict[str, Any],
+    revenue_data: Optional[Dict[str, Any]],
+    semaphore: asyncio.Semaphore,
+) -> Optional[Dict[str, Any]]:
+    """Analyse une app sous le plafond de concurrence ; None si échec ou délai dépassé."""
+    app_context = ctx.get("app_context", {})
+    app_name = app_context.get("name", ctx["repo"])
+
+    # Ne passer les données Stripe qu'à l'app monétisée
+    app_revenue = revenue_data if app_context.get("monetized") else None
+
+    async with semaphore:
+        try:
+            report_text = await asyncio.wait_for(
+                analyze_app_conviction(
+                    app_context=app_context,
+                    readme=ctx.get("readme", ""),
+                    activity=ctx.get("activity", {}),
+                    revenue_data=app_revenue,
+                    persist_inputs=True,
+                ),
+                timeout=ANALYSIS_TIMEOUT_SECONDS,
+            )
+        except asyncio.TimeoutError:
+            logger.error(f"Analyse {app_name} abandonnée après {ANALYSIS_TIMEOUT_SECONDS}s")
+            return None
+        except Exception as e:
+            logger.error(f"Erreur rapport {app_name}: {e}")
+            return None
+
+    return {
+        "repo": ctx["repo"],
+        "app_name": app_name,
+        "report": report_text,
+        "app_context": app_context,
+    }
+
+
+async def generate_weekly_product_report(
+    on_report: Optional[Callable[[Dict[str, Any]], Awaitable[None]]] = None,
+) -> List[Dict[str, Any]]:
     """
     Génère le rapport hebdomadaire pour toutes les apps.
-    Retourne une liste de {app_name, report, repo}.
+    Analyses en parallèle (ANALYSIS_CONCURRENCY max, ANALYSIS_TIMEOUT_SECONDS par app) ;
+    `on_report` est appelé dès qu'une analyse aboutit (livraison partielle).
+    Retourne une liste de {app_name, report, repo} dans l'ordre des repos.
     """
-    from src.integrations.github import fetch_all_repos_full_context
-    from src.integrations.stripe_client import fetch_revenue
+    from src.integrations.github import fetch_repo_full_context
+    from src.snapshots import get_snapshot
 
     logger.info("Génération rapport produit hebdomadaire...")
 
-    # Récupérer contexte complet de tous les repos
-    all_contexts = await fetch_all_repos_full_context()
+    # Activité 7j partagée (snapshot GitHub) + README par repo
+    activity = []
+    if settings.github_configured:
+        activity = await get_snapshot("github")
+    all_contexts = await asyncio.gather(
+        *[fetch_repo_full_context(a["repo"], activity=a) for a in activity],
+        return_exceptions=True,
+    )
+    all_contexts = [c for c in all_contexts if not isinstance(c, Exception)]
 
     # Récupérer les revenus Stripe (pour Job Verdict uniquement)
     revenue_data = None
     if settings.stripe_configured:
         try:
-            revenue_data = await fetch_revenue()
+            revenue_data = await get_snapshot("stripe")
         except Exception as e:
             logger.warning(f"Stripe indisponible pour rapport produit : {e}")
 
-    reports = []
-    for ctx in all_contexts:
-        app_context = ctx.get("app_context", {})
-        app_name = app_context.get("name", ctx["repo"])
+    semaphore = asyncio.Semaphore(ANALYSIS_CONCURRENCY)
 
-        # Ne passer les données Stripe qu'à l'app monétisée
-        app_revenue = revenue_data if app_context.get("monetized") else None
+    async def _run(ctx: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        report = await _analyze_context(ctx, revenue_data, semaphore)
+        if report and on_report:
+            try:
+                await on_report(report)
+            except Exception as e:
+                logger.error(f"Erreur livraison rapport {report['app_name']}: {e}")
+        return report
 
-        try:
-            report_text = await analyze_app_conviction(
-                app_context=app_context,
-                readme=ctx.get("readme", ""),
-                activity=ctx.get("activity", {}),
-                revenue_data=app_revenue,
-            )
-            reports.append({
-                "repo": ctx["repo"],
-                "app_name": app_name,
-                "report": report_text,
-                "app_context": app_context,
-            })
-        except Exception as e:
-            logger.error(f"Erreur rapport {app_name}: {e}")
-
-    return reports
+    # gather conserve l'ordre des repos, quel que soit l'ordre de complétion
+    results = await asyncio.gather(*[_run(ctx) for ctx in all_contexts])
+    return [r for r in results if r]
 
 
 async def send_weekly_product_report() -> None:
     """
     Envoie le rapport produit hebdomadaire via Telegram.
-    Une analyse par app, chacune avec bouton de validation roadmap.
+    Une analyse par app, chacune avec bouton de validation roadmap,
+    envoyée dès que son analyse est terminée.
     """
     from telegram import Bot, InlineKeyboardButton, InlineKeyboardMarkup
     from src.memory.cache import set_cache
 
-    reports = await generate_weekly_product_report()
-    if not reports:
-        logger.warning("Rapport produit vide — aucun repo analysé")
-        return
-
     try:
         bot = Bot(token=settings.telegram_bot_token)
         async with bot:
@@ -198,11 +409,11 @@ async def send_weekly_product_report() -> None:
             await bot.send_message(
                 chat_id=settings.telegram_user_id,
                 text=f"📊 *Intelligence produit — semaine du {now.strftime('%d/%m')}*\n\n"
-                     f"{len(reports)} app(s) analysée(s) via Claude.",
+                     "Analyses en cours via Claude — chaque app arrive dès qu'elle est prête.",
                 parse_mode="Markdown",
             )
 
-            for r in reports:
+            async def _deliver(r: Dict[str, Any]) -> None:
                 app_name = r["app_name"]
                 emoji = APP_EMOJIS.get(app_name, "📱")
 
@@ -234,6 +445,15 @@ async def send_weekly_product_report() -> None:
                     reply_markup=keyboard,
                 )
 
+            reports = await generate_weekly_product_report(on_report=_deliver)
+            if not reports:
+                logger.warning("Rapport produit vide — aucun repo analysé")
+                await bot.send_message(
+                    chat_id=settings.telegram_user_id,
+                    text="⚠️ Aucune analyse produit n'a abouti cette semaine.",
+                )
+                return
+
         logger.info(f"Rapport produit envoyé : {len(reports)} apps")
 
     except Exception as e:
@@ -1,7 +1,8 @@
 """
 Stripe connector — revenus, abonnements, charges récentes.
+Les métriques sont lues dans le ledger local (stripe_ledger.py) ; l'appel
+direct à l'API ne sert plus que de repli.
 """
-import asyncio
 import logging
 from datetime import datetime, timedelta, timezone
 from typing import Any, Dict, List, Optional
@@ -12,7 +13,7 @@ logger = logging.getLogger(__name__)
 
 
 def _fetch_revenue_sync() -> Dict[str, Any]:
-    """Récupère les métriques Stripe — exécuté en thread executor."""
+    """Récupère les métriques Stripe en direct (repli) — exécuté en thread executor."""
     import stripe
     stripe.api_key = settings.stripe_secret_key
 
@@ -40,14 +41,17 @@ def _fetch_revenue_sync() -> Dict[str, Any]:
             if c.created >= int(start_of_month.timestamp())
         ) / 100
 
-        # Abonnements actifs
+        # Abonnements actifs — MRR sur tous les items, normalisé au mois, par devise
+        from src.integrations.stripe_ledger import PRIMARY_CURRENCY, monthly_amount, _subscription_row
         subscriptions = stripe.Subscription.list(status="active", limit=100)
-        active_subs = list(subscriptions.auto_paging_iter())
-        mrr = sum(
-            (s.items.data[0].price.unit_amount or 0) / 100
-            for s in active_subs
-            if s.items.data
-        )
+        active_subs = [_subscription_row(s) for s in subscriptions.auto_paging_iter()]
+        mrr_by_currency: Dict[str, float] = {}
+        for sub in active_subs:
+            for item in sub["items"]:
+                mrr_by_currency[item["currency"]] = (
+                    mrr_by_currency.get(item["currency"], 0.0) + monthly_amount(item) / 100
+                )
+        mrr_by_currency = {c: round(v, 2) for c, v in mrr_by_currency.items() if v}
 
         # Charges récentes (5 dernières)
         recent_charges_raw = stripe.Charge.list(limit=5)
@@ -66,7 +70,8 @@ def _fetch_revenue_sync() -> Dict[str, Any]:
             "revenue_7d": revenue_7d,
             "revenue_mtd": revenue_mtd,
             "active_subscriptions": len(active_subs),
-            "mrr": mrr,
+            "mrr": mrr_by_currency.get(PRIMARY_CURRENCY, 0.0),
+            "mrr_by_currency": mrr_by_currency,
             "recent_charges": recent,
             "currency": "EUR",
             "error": None,
@@ -78,15 +83,25 @@ def _fetch_revenue_sync() -> Dict[str, Any]:
 
 
 async def fetch_revenue() -> Dict[str, Any]:
-    """Récupère les métriques Stripe de façon asynchrone."""
+    """
+    Métriques Stripe — agrégats SQL sur le ledger local synchronisé.
+    Repli sur l'API Stripe si le ledger est indisponible.
+    """
     if not settings.stripe_configured:
         return {"error": "Stripe non configuré (STRIPE_SECRET_KEY manquant)"}
-    loop = asyncio.get_event_loop()
-    return await loop.run_in_executor(None, _fetch_revenue_sync)
+
+    from src.integrations.stripe_ledger import compute_revenue_metrics
+    try:
+        return await compute_revenue_metrics()
+    except Exception as e:
+        logger.warning(f"Ledger Stripe indisponible, appel direct à l'API : {e}")
+
+    from src.executors import run_blocking
+    return await run_blocking("stripe", _fetch_revenue_sync)
 
 
-def format_revenue_telegram(data: Dict[str, Any]) -> str:
-    """Formate les métriques Stripe pour Telegram."""
+def format_revenue_telegram(data: Dict[str, Any], age_seconds: Optional[float] = None) -> str:
+    """Formate les métriques Stripe pour Telegram (avec l'âge du snapshot si fourni)."""
     if data.get("error"):
         return f"💳 *Stripe* — Erreur : {data['error']}"
 
@@ -102,6 +117,9 @@ def format_revenue_telegram(data: Dict[str, Any]) -> str:
 
     if data.get("mrr"):
         lines.append(f"💰 *MRR estimé* : {data['mrr']:.2f} {currency}/mois")
+    for other, amount in sorted((data.get("mrr_by_currency") or {}).items()):
+        if other != currency:
+            lines.append(f"💰 *MRR {other}* : {amount:.2f} {other}/mois")
 
     recent = data.get("recent_charges", [])
     if recent:
@@ -111,6 +129,10 @@ def format_revenue_telegram(data: Dict[str, Any]) -> str:
             desc = f" — {c['description']}" if c["description"] else ""
             lines.append(f"{status_emoji} {c['date']} : {c['amount']:.2f} {c['currency']}{desc}")
 
+    if age_seconds is not None:
+        from src.snapshots import format_age
+        lines.append(f"\n🕒 _Données {format_age(age_seconds)}_")
+
     return "\n".join(lines)
 
 
@@ -132,8 +154,9 @@ async def send_weekly_revenue_report() -> None:
         return
 
     from telegram import Bot
-    data = await fetch_revenue()
-    msg = format_revenue_telegram(data)
+    from src.snapshots import get_snapshot_with_age
+    data, age = await get_snapshot_with_age("stripe")
+    msg = format_revenue_telegram(data, age_seconds=age)
 
     bot = Bot(token=settings.telegram_bot_token)
     async with bot:
@@ -0,0 +1,539 @@
+"""
+Ledger Stripe local — charges et abonnements synchronisés en base.
+
+Un job scheduler synchronise le ledger de façon incrémentale : les charges
+depuis le dernier `created` connu (avec un recouvrement qui rattrape les
+remboursements récents), les abonnements via les événements
+customer.subscription.* depuis le dernier événement appliqué. Les métriques
+(7j, 30j, mois en cours, MRR) sont des agrégats SQL indexés, sans appel Stripe.
+
+Quand les webhooks sont configurés (stripe_webhook.py), chaque événement est
+appliqué dès réception ; tous les événements passent par apply_event(), qui
+les journalise (stripe_events) : un événement déjà vu n'est jamais réappliqué
+et le journal peut être rejoué pour reconstruire le ledger.
+
+Stripe ne garantit pas l'ordre de livraison : chaque ligne garde la date de
+l'état qu'elle reflète (observed_at) et un état plus ancien ne l'écrase jamais
+(charge.succeeded tardif après un remboursement, abonnement annulé puis
+« réactivé » par un customer.subscription.updated en retard).
+"""
+import asyncio
+import json
+import logging
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List
+
+from src.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Historique récupéré au premier passage (couvre 30j et le mois en cours)
+INITIAL_BACKFILL = timedelta(days=90)
+# Les charges récentes sont relues : rattrape remboursements et changements de statut
+CHARGE_CURSOR_OVERLAP = timedelta(days=2)
+# Au-delà, une lecture déclenche d'abord une synchro (job arrêté, premier démarrage…)
+STALE_AFTER = timedelta(minutes=settings.stripe_sync_interval_minutes * 2)
+# Les webhooks ne sont considérés actifs que si l'un d'eux a été reçu récemment :
+# un secret configuré ne prouve pas que le endpoint est monté et joignable
+WEBHOOK_ACTIVE_WINDOW = timedelta(hours=24)
+
+SUBSCRIPTION_EVENT_TYPES = [
+    "customer.subscription.created",
+    "customer.subscription.updated",
+    "customer.subscription.deleted",
+]
+
+PRIMARY_CURRENCY = "EUR"
+
+# Mois par intervalle de facturation — normalisation MRR (montant ÷ mois couverts)
+MONTHS_PER_INTERVAL = {
+    "day": 12 / 365,
+    "week": 12 / 52,
+    "month": 1,
+    "year": 12,
+}
+
+_SYNCED_AT_KEY = "stripe_ledger:synced_at"
+_EVENTS_CURSOR_KEY = "stripe_ledger:subscription_events_cursor"
+
+_sync_lock = asyncio.Lock()
+
+
+# ─────────────────────────────────────────────────────────────
+# Conversion objets Stripe → lignes ledger
+# ─────────────────────────────────────────────────────────────
+
+def _ts(value: int) -> datetime:
+    return datetime.fromtimestamp(value, tz=timezone.utc)
+
+
+def _charge_row(c: Any) -> Dict[str, Any]:
+    customer = c["customer"]
+    return {
+        "charge_id": c["id"],
+        "amount": c["amount"],
+        "amount_refunded": c["amount_refunded"] or 0,
+        "currency": c["currency"].upper(),
+        "status": c["status"],
+        "description": (c["description"] or "")[:500],
+        "customer": customer if isinstance(customer, str) else None,
+        "created": _ts(c["created"]),
+    }
+
+
+def _unit_amount(price: Any) -> int:
+    # Prix à décimales (unit_amount null) : unit_amount_decimal en centimes
+    if price["unit_amount"] is not None:
+        return price["unit_amount"]
+    return round(float(price.get("unit_amount_decimal") or 0))
+
+
+def _item_row(subscription_id: str, item: Any) -> Dict[str, Any]:
+    price = item["price"]
+    recurring = price.get("recurring") or {}
+    return {
+        "item_id": item["id"],
+        "subscription_id": subscription_id,
+        "quantity": item.get("quantity") or 1,
+        "unit_amount": _unit_amount(price),
+        "currency": price["currency"].upper(),
+        "interval": recurring.get("interval") or "month",
+        "interval_count": recurring.get("interval_count") or 1,
+    }
+
+
+def _subscription_row(s: Any) -> Dict[str, Any]:
+    items = [_item_row(s["id"], item) for item in s["items"]["data"]]
+    customer = s["customer"]
+    return {
+        "subscription_id": s["id"],
+        "customer": customer if isinstance(customer, str) else None,
+        "status": s["status"],
+        "unit_amount": items[0]["unit_amount"] if items else 0,
+        "currency": (items[0]["currency"] if items else (s["currency"] or "eur").upper()),
+        "created": _ts(s["created"]),
+        "items": items,
+    }
+
+
+def monthly_amount(item: Dict[str, Any]) -> float:
+    """Montant mensuel normalisé d'un item (centimes) : quantité × prix ÷ mois couverts."""
+    months = MONTHS_PER_INTERVAL.get(item["interval"], 1) * item["interval_count"]
+    return item["quantity"] * item["unit_amount"] / months
+
+
+# ─────────────────────────────────────────────────────────────
+# Appels Stripe — exécutés dans le pool "stripe"
+# ─────────────────────────────────────────────────────────────
+
+def _stripe():
+    import stripe
+    stripe.api_key = settings.stripe_secret_key
+    return stripe
+
+
+def _list_charges_sync(created_gte: datetime) -> List[Dict[str, Any]]:
+    charges = _stripe().Charge.list(created={"gte": int(created_gte.timestamp())}, limit=100)
+    return [_charge_row(c) for c in charges.auto_paging_iter()]
+
+
+def _list_subscriptions_sync() -> List[Dict[str, Any]]:
+    subscriptions = _stripe().Subscription.list(status="all", limit=100)
+    return [_subscription_row(s) for s in subscriptions.auto_paging_iter()]
+
+
+def _list_subscription_events_sync(created_gt: int) -> List[Dict[str, Any]]:
+    """Événements abonnement depuis `created_gt`, dans l'ordre d'application (plus ancien d'abord)."""
+    events = _stripe().Event.list(
+        types=SUBSCRIPTION_EVENT_TYPES,
+        created={"gt": created_gt},
+        limit=100,
+    )
+    # str(StripeObject) est son JSON : même forme qu'un payload webhook
+    return sorted((json.loads(str(e)) for e in events.auto_paging_iter()), key=lambda e: e["created"])
+
+
+# ─────────────────────────────────────────────────────────────
+# Écriture ledger
+# ─────────────────────────────────────────────────────────────
+
+async def upsert_charges(rows: List[Dict[str, Any]], observed_at: datetime) -> None:
+    """
+    Écrit des charges dans l'état observé à `observed_at` (created de l'événement
+    ou date de lecture API) ; une charge déjà connue dans un état plus récent est conservée.
+    """
+    if not rows:
+        return
+    from sqlalchemy import func
+    from sqlalchemy.dialects.postgresql import insert
+    from src.memory.database import StripeCharge, async_session
+
+    stmt = insert(StripeCharge).values([{**r, "observed_at": observed_at} for r in rows])
+    async with async_session() as session:
+        await session.execute(
+            stmt.on_conflict_do_update(
+                index_elements=[StripeCharge.charge_id],
+                set_={
+                    "amount": stmt.excluded.amount,
+                    # Un remboursement ne diminue jamais, même à horodatage égal
+                    "amount_refunded": func.greatest(StripeCharge.amount_refunded, stmt.excluded.amount_refunded),
+                    "status": stmt.excluded.status,
+                    "description": stmt.excluded.description,
+                    "observed_at": stmt.excluded.observed_at,
+                },
+                where=StripeCharge.observed_at <= stmt.excluded.observed_at,
+            )
+        )
+        await session.commit()
+
+
+async def upsert_subscriptions(rows: List[Dict[str, Any]], observed_at: datetime) -> None:
+    """
+    Écrit des abonnements dans l'état observé à `observed_at` ; un abonnement déjà
+    connu dans un état plus récent (et ses items) est conservé.
+    """
+    if not rows:
+        return
+    from sqlalchemy import delete
+    from sqlalchemy.dialects.postgresql import insert
+    from src.memory.database import StripeSubscription, StripeSubscriptionItem, async_session
+
+    # Plusieurs événements pour un même abonnement : le dernier l'emporte
+    latest = {r["subscription_id"]: r for r in rows}
+    stmt = insert(StripeSubscription).values([
+        {**{k: v for k, v in r.items() if k != "items"}, "observed_at": observed_at}
+        for r in latest.values()
+    ])
+    async with async_session() as session:
+        result = await session.execute(
+            stmt.on_conflict_do_update(
+                index_elements=[StripeSubscription.subscription_id],
+                set_={
+                    "status": stmt.excluded.status,
+                    "unit_amount": stmt.excluded.unit_amount,
+                    "currency": stmt.excluded.currency,
+                    "observed_at": stmt.excluded.observed_at,
+                    "updated_at": datetime.now(timezone.utc),
+                },
+                where=StripeSubscription.observed_at <= stmt.excluded.observed_at,
+            ).returning(StripeSubscription.subscription_id)
+        )
+        # Seuls les abonnements insérés ou mis à jour sont renvoyés
+        written = list(result.scalars().all())
+        if written:
+            # Les items reflètent l'état courant de l'abonnement : remplacés en bloc
+            await session.execute(
+                delete(StripeSubscriptionItem)
+                .where(StripeSubscriptionItem.subscription_id.in_(written))
+            )
+            items = [item for sub_id in written for item in latest[sub_id]["items"]]
+            if items:
+                await session.execute(insert(StripeSubscriptionItem).values(items))
+        await session.commit()
+
+
+# ─────────────────────────────────────────────────────────────
+# Événements — webhooks et synchro, journalisés et idempotents
+# ─────────────────────────────────────────────────────────────
+
+CHARGE_EVENT_PREFIX = "charge."
+SUBSCRIPTION_EVENT_PREFIX = "customer.subscription."
+
+
+async def _apply_to_ledger(event: Dict[str, Any]) -> bool:
+    """Applique un événement au ledger. Retourne False si son type est ignoré."""
+    event_type = event["type"]
+    obj = event["data"]["object"]
+    observed_at = _ts(event["created"])
+    # charge.succeeded / failed / refunded / updated… : l'objet porte l'état complet de la charge
+    # (les événements refund.* sont doublés d'un charge.refunded)
+    if event_type.startswith(CHARGE_EVENT_PREFIX) and obj.get("object") == "charge":
+        await upsert_charges([_charge_row(obj)], observed_at)
+        return True
+    if event_type.startswith(SUBSCRIPTION_EVENT_PREFIX):
+        await upsert_subscriptions([_subscription_row(obj)], observed_at)
+        return True
+    return False
+
+
+async def apply_event(event: Dict[str, Any], source: str = "webhook") -> bool:
+    """
+    Journalise puis applique un événement Stripe (dict décodé du JSON).
+    Idempotent : retourne False si l'événement avait déjà été reçu.
+    """
+    from sqlalchemy.dialects.postgresql import insert
+    from src.memory.database import StripeEvent, async_session
+
+    async with async_session() as session:
+        result = await session.execute(
+            insert(StripeEvent)
+            .values(
+                event_id=event["id"],
+                type=event["type"],
+                source=source,
+                payload=json.dumps(event),
+                created=_ts(event["created"]),
+            )
+            .on_conflict_do_nothing(index_elements=[StripeEvent.event_id])
+            .returning(StripeEvent.id)
+        )
+        inserted = result.scalar_one_or_none() is not None
+        await session.commit()
+
+    if not inserted:
+        logger.debug(f"Événement Stripe {event['id']} déjà appliqué — ignoré")
+        return False
+    try:
+        applied = await _apply_to_ledger(event)
+    except Exception:
+        # Retiré du journal : la prochaine livraison (retry Stripe ou synchro) le réappliquera
+        from sqlalchemy import delete
+        async with async_session() as session:
+            await session.execute(delete(StripeEvent).where(StripeEvent.event_id == event["id"]))
+            await session.commit()
+        raise
+    if applied:
+        from src.snapshots import invalidate_snapshot
+        invalidate_snapshot("stripe")
+        logger.info(f"Événement Stripe appliqué ({source}) : {event['type']} {event['id']}")
+    return True
+
+
+async def replay_stripe_events(reset: bool = False) -> int:
+    """
+    Rejoue le journal d'événements dans l'ordre chronologique.
+    reset=True reconstruit le ledger : il est vidé, le journal rejoué, puis une
+    synchro complète ramène charges récentes et abonnements à l'état courant.
+    Retourne le nombre d'événements rejoués.
+    """
+    from sqlalchemy import delete, select
+    from src.memory.database import (
+        StripeCharge,
+        StripeEvent,
+        StripeSubscription,
+        StripeSubscriptionItem,
+        async_session,
+    )
+
+    if reset:
+        async with async_session() as session:
+            await session.execute(delete(StripeCharge))
+            await session.execute(delete(StripeSubscriptionItem))
+            await session.execute(delete(StripeSubscription))
+            await session.commit()
+
+    async with async_session() as session:
+        result = await session.stream_scalars(
+            select(StripeEvent.payload).order_by(StripeEvent.created, StripeEvent.id)
+        )
+        replayed = 0
+        async for payload in result:
+            if await _apply_to_ledger(json.loads(payload)):
+                replayed += 1
+
+    if reset:
+        await sync_stripe_ledger(full=True)
+    logger.info(f"Journal Stripe rejoué : {replayed} événement(s)")
+    return replayed
+
+
+# ─────────────────────────────────────────────────────────────
+# Synchronisation
+# ─────────────────────────────────────────────────────────────
+
+async def _charges_cursor(full: bool = False) -> datetime:
+    from sqlalchemy import func, select
+    from src.memory.database import StripeCharge, async_session
+
+    async with async_session() as session:
+        last = (await session.execute(select(func.max(StripeCharge.created)))).scalar()
+    if last is None or full:
+        return datetime.now(timezone.utc) - INITIAL_BACKFILL
+    return last - CHARGE_CURSOR_OVERLAP
+
+
+async def sync_stripe_ledger(full: bool = False) -> None:
+    """
+    Job scheduler — synchronise charges et abonnements depuis les derniers curseurs.
+    Avec les webhooks actifs, sert de rattrapage (événements manqués, indisponibilité).
+    full=True ignore les curseurs : backfill complet des charges et liste des abonnements.
+    """
+    if not settings.stripe_configured:
+        return
+
+    from src.executors import run_blocking
+    from src.memory.database import get_memory, set_memory
+
+    async with _sync_lock:
+        started = datetime.now(timezone.utc)
+
+        charges = await run_blocking("stripe", _list_charges_sync, await _charges_cursor(full))
+        # État lu maintenant : plus récent que tout événement déjà appliqué
+        await upsert_charges(charges, started)
+
+        events_cursor = await get_memory(_EVENTS_CURSOR_KEY)
+        if events_cursor is None or full:
+            # Premier passage : état complet, puis suivi par événements
+            subscriptions = await run_blocking("stripe", _list_subscriptions_sync)
+            await upsert_subscriptions(subscriptions, started)
+            updated = len(subscriptions)
+            next_cursor = int(started.timestamp())
+        else:
+            # Même chemin que les webhooks : un événement déjà reçu n'est pas réappliqué
+            events = await run_blocking("stripe", _list_subscription_events_sync, int(events_cursor))
+            updated = 0
+            for event in events:
+                updated += await apply_event(event, source="sync")
+            next_cursor = events[-1]["created"] if events else int(events_cursor)
+
+        await set_memory(_EVENTS_CURSOR_KEY, str(next_cursor))
+        await set_memory(_SYNCED_AT_KEY, started.isoformat())
+        logger.info(
+            f"Ledger Stripe synchronisé : {len(charges)} charge(s), "
+            f"{updated} abonnement(s) mis à jour"
+        )
+
+
+async def webhooks_active() -> bool:
+    """Vrai si un secret webhook est configuré et qu'un événement webhook est arrivé récemment."""
+    if not settings.stripe_webhook_configured:
+        return False
+    from sqlalchemy import func, select
+    from src.memory.database import StripeEvent, async_session
+
+    async with async_session() as session:
+        last_received = (await session.execute(
+            select(func.max(StripeEvent.received_at)).where(StripeEvent.source == "webhook")
+        )).scalar()
+    return last_received is not None and last_received >= datetime.now(timezone.utc) - WEBHOOK_ACTIVE_WINDOW
+
+
+async def run_stripe_sync_job() -> None:
+    """
+    Job scheduler — synchro à l'intervalle normal, espacée en simple rattrapage
+    (stripe_reconcile_interval_minutes) tant que les webhooks arrivent réellement.
+    """
+    if not settings.stripe_configured:
+        return
+    if await webhooks_active():
+        from src.memory.database import get_memory
+
+        synced_at = await get_memory(_SYNCED_AT_KEY)
+        reconcile_after = timedelta(minutes=settings.stripe_reconcile_interval_minutes)
+        if synced_at is not None and datetime.fromisoformat(synced_at) >= datetime.now(timezone.utc) - reconcile_after:
+            return
+    await sync_stripe_ledger()
+
+
+async def _ensure_fresh() -> None:
+    from src.memory.database import get_memory
+
+    synced_at = await get_memory(_SYNCED_AT_KEY)
+    if synced_at is None or datetime.fromisoformat(synced_at) < datetime.now(timezone.utc) - STALE_AFTER:
+        await sync_stripe_ledger()
+
+
+# ─────────────────────────────────────────────────────────────
+# Lecture — agrégats SQL
+# ─────────────────────────────────────────────────────────────
+
+def _mrr_expression():
+    """
+    MRR d'un item en SQL (centimes) — même normalisation que monthly_amount(),
+    évaluée en un seul agrégat sur l'ensemble des items d'abonnements actifs.
+    """
+    from sqlalchemy import case, cast, Float
+    from src.memory.database import StripeSubscriptionItem as Item
+
+    months = case(
+        {interval: factor for interval, factor in MONTHS_PER_INTERVAL.items()},
+        value=Item.interval,
+        else_=1,
+    ) * Item.interval_count
+    return cast(Item.quantity * Item.unit_amount, Float) / months
+
+
+async def compute_mrr() -> Dict[str, Any]:
+    """MRR par devise et nombre d'abonnements actifs — agrégats SQL sur le ledger."""
+    from sqlalchemy import func, select
+    from src.memory.database import StripeSubscription, StripeSubscriptionItem, async_session
+
+    async with async_session() as session:
+        active_subs = (await session.execute(
+            select(func.count()).where(StripeSubscription.status == "active")
+        )).scalar_one()
+        rows = (await session.execute(
+            select(StripeSubscriptionItem.currency, func.sum(_mrr_expression()))
+            .join(
+                StripeSubscription,
+                StripeSubscription.subscription_id == StripeSubscriptionItem.subscription_id,
+            )
+            .where(StripeSubscription.status == "active")
+            .group_by(StripeSubscriptionItem.currency)
+        )).all()
+
+    return {
+        "active_subscriptions": active_subs,
+        "mrr_by_currency": {currency: round(total / 100, 2) for currency, total in rows if total},
+    }
+
+
+async def compute_revenue_metrics() -> Dict[str, Any]:
+    """
+    Métriques revenus lues dans le ledger — même forme que l'ancien fetch Stripe.
+    Les remboursements (partiels ou totaux) sont déduits du chiffre d'affaires.
+    `mrr` est exprimé dans la devise principale ; `mrr_by_currency` détaille toutes les devises.
+    """
+    from sqlalchemy import func, select
+    from src.memory.database import StripeCharge, async_session
+
+    # Avec des webhooks effectivement reçus, le ledger est tenu à jour en continu : lecture purement locale
+    try:
+        if not await webhooks_active():
+            await _ensure_fresh()
+    except Exception as e:
+        logger.warning(f"Synchro Stripe à la lecture impossible, lecture du ledger en l'état : {e}")
+
+    now = datetime.now(timezone.utc)
+    start_of_month = now.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+    start_last_30 = now - timedelta(days=30)
+    start_last_7 = now - timedelta(days=7)
+    net = StripeCharge.amount - StripeCharge.amount_refunded
+
+    async with async_session() as session:
+        revenue_30d, revenue_7d, revenue_mtd = (await session.execute(
+            select(
+                func.coalesce(func.sum(net).filter(StripeCharge.created >= start_last_30), 0),
+                func.coalesce(func.sum(net).filter(StripeCharge.created >= start_last_7), 0),
+                func.coalesce(func.sum(net).filter(StripeCharge.created >= start_of_month), 0),
+            ).where(
+                StripeCharge.status == "succeeded",
+                StripeCharge.created >= min(start_last_30, start_of_month),
+            )
+        )).one()
+
+        recent_rows = (await session.execute(
+            select(StripeCharge).order_by(StripeCharge.created.desc()).limit(5)
+        )).scalars().all()
+
+    mrr = await compute_mrr()
+    return {
+        "revenue_30d": revenue_30d / 100,
+        "revenue_7d": revenue_7d / 100,
+        "revenue_mtd": revenue_mtd / 100,
+        "active_subscriptions": mrr["active_subscriptions"],
+        "mrr": mrr["mrr_by_currency"].get(PRIMARY_CURRENCY, 0.0),
+        "mrr_by_currency": mrr["mrr_by_currency"],
+        "recent_charges": [
+            {
+                "amount": c.amount / 100,
+                "currency": c.currency,
+                "status": c.status,
+                "description": (c.description or "")[:60],
+                "date": c.created.strftime("%d/%m %H:%M"),
+            }
+            for c in recent_rows
+        ],
+        "currency": PRIMARY_CURRENCY,
+        "error": None,
+    }
@@ -0,0 +1,224 @@
+"""
+Réception des webhooks Stripe — ledger revenus tenu à jour en temps réel.
+
+Le router FastAPI vérifie la signature (en-tête Stripe-Signature, HMAC-SHA256
+sur "timestamp.payload" avec STRIPE_WEBHOOK_SECRET) puis applique l'événement
+au ledger local via stripe_ledger.apply_event (journalisé, idempotent).
+À monter dans l'application webhook : app.include_router(router). Tant
+qu'aucun événement webhook n'a été reçu depuis 24 h (router non monté,
+endpoint injoignable), le ledger conserve la synchro périodique normale.
+
+Un émetteur d'événements factices signe ses payloads avec le même secret,
+pour tester la chaîne complète en local sans compte Stripe :
+    python -m src.integrations.stripe_webhook charge.succeeded --amount 4900
+"""
+import hashlib
+import hmac
+import json
+import logging
+import time
+import uuid
+from typing import Any, Dict, Optional
+
+from fastapi import APIRouter, Header, HTTPException, Request
+
+from src.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Écart maximal accepté entre l'horodatage signé et la réception (anti-rejeu)
+SIGNATURE_TOLERANCE_SECONDS = 300
+
+router = APIRouter()
+
+
+# ─────────────────────────────────────────────────────────────
+# Signature
+# ─────────────────────────────────────────────────────────────
+
+def _compute_signature(payload: bytes, secret: str, timestamp: int) -> str:
+    signed = f"{timestamp}.".encode() + payload
+    return hmac.new(secret.encode(), signed, hashlib.sha256).hexdigest()
+
+
+def sign_payload(payload: bytes, secret: str, timestamp: Optional[int] = None) -> str:
+    """En-tête Stripe-Signature pour `payload` — utilisé par l'émetteur factice."""
+    timestamp = timestamp or int(time.time())
+    return f"t={timestamp},v1={_compute_signature(payload, secret, timestamp)}"
+
+
+def verify_signature(payload: bytes, header: str, secret: str) -> Dict[str, Any]:
+    """
+    Vérifie l'en-tête Stripe-Signature et retourne l'événement décodé.
+    Lève ValueError si la signature est absente, invalide ou trop ancienne.
+    """
+    if not header:
+        raise ValueError("en-tête Stripe-Signature manquant")
+
+    timestamp = None
+    signatures = []
+    for part in header.split(","):
+        key, _, value = part.strip().partition("=")
+        if key == "t" and value.isdigit():
+            timestamp = int(value)
+        elif key == "v1":
+            signatures.append(value)
+    if timestamp is None or not signatures:
+        raise ValueError("en-tête Stripe-Signature mal formé")
+
+    if abs(time.time() - timestamp) > SIGNATURE_TOLERANCE_SECONDS:
+        raise ValueError("horodatage de signature hors tolérance")
+
+    expected = _compute_signature(payload, secret, timestamp)
+    if not any(hmac.compare_digest(expected, s) for s in signatures):
+        raise ValueError("signature invalide")
+
+    return json.loads(payload)
+
+
+# ─────────────────────────────────────────────────────────────
+# Endpoint
+# ─────────────────────────────────────────────────────────────
+
+@router.post("/webhooks/stripe")
+async def stripe_webhook(
+    request: Request,
+    stripe_signature: Optional[str] = Header(default=None, alias="Stripe-Signature"),
+) -> Dict[str, Any]:
+    """Reçoit un événement Stripe signé et l'applique au ledger local."""
+    if not settings.stripe_webhook_configured:
+        raise HTTPException(status_code=404, detail="Webhook Stripe non configuré")
+
+    payload = await request.body()
+    try:
+        event = verify_signature(payload, stripe_signature or "", settings.stripe_webhook_secret)
+    except ValueError as e:
+        logger.warning(f"Webhook Stripe rejeté : {e}")
+        raise HTTPException(status_code=400, detail=str(e))
+
+    from src.integrations.stripe_ledger import apply_event
+    try:
+        applied = await apply_event(event, source="webhook")
+    except Exception as e:
+        # 5xx : Stripe relivrera l'événement
+        logger.error(f"Erreur application événement Stripe {event.get('id')} : {e}")
+        raise HTTPException(status_code=500, detail="erreur application événement")
+
+    return {"received": True, "duplicate": not applied}
+
+
+# ─────────────────────────────────────────────────────────────
+# Émetteur d'événements factices — tests locaux
+# ─────────────────────────────────────────────────────────────
+
+def fake_charge(
+    amount: int = 4900,
+    currency: str = "eur",
+    status: str = "succeeded",
+    amount_refunded: int = 0,
+    charge_id: Optional[str] = None,
+) -> Dict[str, Any]:
+    return {
+        "id": charge_id or f"ch_fake_{uuid.uuid4().hex[:16]}",
+        "object": "charge",
+        "amount": amount,
+        "amount_refunded": amount_refunded,
+        "refunded": amount_refunded >= amount,
+        "currency": currency,
+        "status": status,
+        "description": "Charge factice",
+        "customer": "cus_fake",
+        "created": int(time.time()),
+    }
+
+
+def fake_subscription(
+    unit_amount: int = 990,
+    currency: str = "eur",
+    status: str = "active",
+    quantity: int = 1,
+    interval: str = "month",
+    subscription_id: Optional[str] = None,
+) -> Dict[str, Any]:
+    return {
+        "id": subscription_id or f"sub_fake_{uuid.uuid4().hex[:16]}",
+        "object": "subscription",
+        "customer": "cus_fake",
+        "status": status,
+        "currency": currency,
+        "created": int(time.time()),
+        "items": {
+            "object": "list",
+            "data": [{
+                "id": f"si_fake_{uuid.uuid4().hex[:12]}",
+                "quantity": quantity,
+                "price": {
+                    "unit_amount": unit_amount,
+                    "currency": currency,
+                    "recurring": {"interval": interval, "interval_count": 1},
+                },
+            }],
+        },
+    }
+
+
+def build_fake_event(event_type: str, obj: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        "id": f"evt_fake_{uuid.uuid4().hex[:16]}",
+        "object": "event",
+        "type": event_type,
+        "created": int(time.time()),
+        "livemode": False,
+        "data": {"object": obj},
+    }
+
+
+async def emit_fake_event(
+    event: Dict[str, Any],
+    url: str = "http://localhost:8000/webhooks/stripe",
+    secret: Optional[str] = None,
+) -> Dict[str, Any]:
+    """Signe et POST un événement factice vers le endpoint webhook."""
+    import httpx
+
+    payload = json.dumps(event).encode()
+    headers = {
+        "Content-Type": "application/json",
+        "Stripe-Signature": sign_payload(payload, secret or settings.stripe_webhook_secret),
+    }
+    async with httpx.AsyncClient(timeout=10) as client:
+        resp = await client.post(url, content=payload, headers=headers)
+    return {"status": resp.status_code, "body": resp.json() if resp.content else None}
+
+
+if __name__ == "__main__":
+    import argparse
+    import asyncio
+
+    parser = argparse.ArgumentParser(description="Émet un événement Stripe factice signé")
+    parser.add_argument("type", help="ex: charge.succeeded, charge.refunded, customer.subscription.updated")
+    parser.add_argument("--url", default="http://localhost:8000/webhooks/stripe")
+    parser.add_argument("--amount", type=int, default=4900, help="montant en centimes")
+    parser.add_argument("--id", dest="object_id", help="id de la charge / de l'abonnement à réutiliser")
+    parser.add_argument("--status", help="statut de l'objet")
+    parser.add_argument("--quantity", type=int, default=1)
+    parser.add_argument("--interval", default="month", choices=["day", "week", "month", "year"])
+    args = parser.parse_args()
+
+    if args.type.startswith("customer.subscription."):
+        obj = fake_subscription(
+            unit_amount=args.amount,
+            status=args.status or ("canceled" if args.type.endswith(".deleted") else "active"),
+            quantity=args.quantity,
+            interval=args.interval,
+            subscription_id=args.object_id,
+        )
+    else:
+        obj = fake_charge(
+            amount=args.amount,
+            status=args.status or "succeeded",
+            amount_refunded=args.amount if args.type == "charge.refunded" else 0,
+            charge_id=args.object_id,
+        )
+
+    print(asyncio.run(emit_fake_event(build_fake_event(args.type, obj), url=args.url)))
@@ -0,0 +1,171 @@
+"""
+Instrumentation du scheduler — listeners APScheduler.
+
+Chaque exécution de job est persistée (table job_runs) avec sa durée et son
+issue : succès, erreur, misfire (exécution manquée) ou chevauchement refusé
+par max_instances. Les percentiles p50/p95 sont exposés via /perf.
+"""
+import asyncio
+import logging
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Instant de soumission par (job_id, scheduled_run_time) → durée à l'exécution
+_started: Dict[Tuple[str, Any], float] = {}
+# Références fortes vers les tâches de persistance en cours
+_pending: Set[asyncio.Task] = set()
+
+
+async def _persist_run(
+    job_id: str,
+    outcome: str,
+    scheduled_at: Optional[datetime],
+    duration_ms: Optional[float] = None,
+    error: Optional[str] = None,
+) -> None:
+    from src.memory.database import JobRun, async_session
+    try:
+        async with async_session() as session:
+            session.add(JobRun(
+                job_id=job_id,
+                outcome=outcome,
+                scheduled_at=scheduled_at,
+                duration_ms=duration_ms,
+                error=error[:2000] if error else None,
+            ))
+            await session.commit()
+    except Exception as e:
+        logger.warning(f"Erreur persistance exécution job {job_id} : {e}")
+
+
+def _record(job_id: str, outcome: str, scheduled_at: Optional[datetime], **kwargs: Any) -> None:
+    try:
+        loop = asyncio.get_running_loop()
+    except RuntimeError:
+        return
+    task = loop.create_task(_persist_run(job_id, outcome, scheduled_at, **kwargs))
+    _pending.add(task)
+    task.add_done_callback(_pending.discard)
+
+
+def _on_submitted(event) -> None:
+    now = time.monotonic()
+    for run_time in event.scheduled_run_times:
+        _started[(event.job_id, run_time)] = now
+
+
+def _on_finished(event) -> None:
+    from apscheduler.events import EVENT_JOB_ERROR
+
+    started = _started.pop((event.job_id, event.scheduled_run_time), None)
+    duration_ms = (time.monotonic() - started) * 1000 if started is not None else None
+
+    if event.code == EVENT_JOB_ERROR:
+        logger.error(f"Job {event.job_id} en erreur : {event.exception}")
+        _record(event.job_id, "error", event.scheduled_run_time,
+                duration_ms=duration_ms, error=repr(event.exception))
+    else:
+        _record(event.job_id, "success", event.scheduled_run_time, duration_ms=duration_ms)
+
+
+def _on_missed(event) -> None:
+    logger.warning(f"Job {event.job_id} manqué (misfire) — prévu {event.scheduled_run_time}")
+    _record(event.job_id, "missed", event.scheduled_run_time)
+
+
+def _on_max_instances(event) -> None:
+    logger.warning(f"Job {event.job_id} ignoré — exécution précédente toujours en cours")
+    scheduled = event.scheduled_run_times[-1] if event.scheduled_run_times else None
+    _record(event.job_id, "overlap", scheduled)
+
+
+def install_job_listeners(scheduler) -> None:
+    """Branche les listeners d'instrumentation sur un scheduler APScheduler."""
+    from apscheduler.events import (
+        EVENT_JOB_ERROR,
+        EVENT_JOB_EXECUTED,
+        EVENT_JOB_MAX_INSTANCES,
+        EVENT_JOB_MISSED,
+        EVENT_JOB_SUBMITTED,
+    )
+    scheduler.add_listener(_on_submitted, EVENT_JOB_SUBMITTED)
+    scheduler.add_listener(_on_finished, EVENT_JOB_EXECUTED | EVENT_JOB_ERROR)
+    scheduler.add_listener(_on_missed, EVENT_JOB_MISSED)
+    scheduler.add_listener(_on_max_instances, EVENT_JOB_MAX_INSTANCES)
+
+
+# ─────────────────────────────────────────────────────────────
+# Lecture — commande /perf
+# ─────────────────────────────────────────────────────────────
+
+async def get_job_perf_stats(days: int = 7) -> List[Dict[str, Any]]:
+    """p50/p95 des durées et compteurs d'issues par job sur N jours."""
+    from sqlalchemy import func, select
+    from src.memory.database import JobRun, async_session
+
+    cutoff = datetime.now(timezone.utc) - timedelta(days=days)
+    async with async_session() as session:
+        result = await session.execute(
+            select(
+                JobRun.job_id,
+                func.count(JobRun.id),
+                func.percentile_cont(0.5).within_group(JobRun.duration_ms),
+                func.percentile_cont(0.95).within_group(JobRun.duration_ms),
+                func.count(JobRun.id).filter(JobRun.outcome == "error"),
+                func.count(JobRun.id).filter(JobRun.outcome == "missed"),
+                func.count(JobRun.id).filter(JobRun.outcome == "overlap"),
+            )
+            .where(JobRun.created_at >= cutoff)
+            .group_by(JobRun.job_id)
+            .order_by(JobRun.job_id)
+        )
+        rows = result.all()
+
+    return [
+        {
+            "job_id": job_id,
+            "runs": int(runs),
+            "p50_ms": float(p50) if p50 is not None else None,
+            "p95_ms": float(p95) if p95 is not None else None,
+            "errors": int(errors),
+            "missed": int(missed),
+            "overlaps": int(overlaps),
+        }
+        for job_id, runs, p50, p95, errors, missed, overlaps in rows
+    ]
+
+
+def _format_ms(value: Optional[float]) -> str:
+    if value is None:
+        return "—"
+    if value >= 1000:
+        return f"{value / 1000:.1f}s"
+    return f"{value:.0f}ms"
+
+
+def format_job_perf_telegram(stats: List[Dict[str, Any]], days: int = 7) -> str:
+    """Formate les statistiques jobs pour Telegram."""
+    if not stats:
+        return f"⏱️ *Jobs scheduler* — aucune exécution enregistrée sur {days} jours."
+
+    lines = [f"⏱️ *Jobs scheduler — {days} derniers jours*\n"]
+    for s in stats:
+        line = (
+            f"• `{s['job_id']}` — {s['runs']} run(s) | "
+            f"p50 {_format_ms(s['p50_ms'])} | p95 {_format_ms(s['p95_ms'])}"
+        )
+        issues = []
+        if s["errors"]:
+            issues.append(f"{s['errors']} erreur(s)")
+        if s["missed"]:
+            issues.append(f"{s['missed']} misfire(s)")
+        if s["overlaps"]:
+            issues.append(f"{s['overlaps']} chevauchement(s)")
+        if issues:
+            line += f"\n  ⚠️ {', '.join(issues)}"
+        lines.append(line)
+
+    return "\n".join(lines)
@@ -0,0 +1,104 @@
+"""
+Élection de leader entre réplicas — bail Redis.
+
+Un seul réplica détient le bail (SET NX PX) et exécute les jobs scheduler ;
+il le renouvelle tous les tiers de TTL. Si le leader disparaît, le bail expire
+et un autre réplica le reprend au tour suivant (bascule en ~TTL secondes).
+"""
+import asyncio
+import logging
+import os
+import socket
+import time
+import uuid
+from typing import Callable, Optional
+
+from src.config import settings
+
+logger = logging.getLogger(__name__)
+
+LEASE_KEY = "jarvis:scheduler:leader"
+REPLICA_ID = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+# Renouvellement / libération atomiques : uniquement si le bail nous appartient
+_RENEW_SCRIPT = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('pexpire', KEYS[1], ARGV[2])
+end
+return 0
+"""
+_RELEASE_SCRIPT = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('del', KEYS[1])
+end
+return 0
+"""
+
+_is_leader = False
+
+
+def is_leader() -> bool:
+    return _is_leader
+
+
+async def run_leader_election(
+    on_elected: Callable[[], None],
+    on_demoted: Callable[[], None],
+) -> None:
+    """
+    Boucle d'élection — à lancer en tâche de fond pour toute la durée du process.
+    on_elected / on_demoted sont appelés à chaque changement de rôle.
+    """
+    global _is_leader
+    import redis.asyncio as aioredis
+
+    ttl_ms = settings.leader_lease_ttl_seconds * 1000
+    interval = max(1.0, settings.leader_lease_ttl_seconds / 3)
+    client = aioredis.from_url(settings.redis_url)
+    last_renewed: Optional[float] = None
+
+    def _set_role(leader: bool) -> None:
+        global _is_leader
+        if leader == _is_leader:
+            return
+        _is_leader = leader
+        if leader:
+            logger.info(f"Réplica {REPLICA_ID} élu leader — jobs scheduler actifs")
+            on_elected()
+        else:
+            logger.warning(f"Réplica {REPLICA_ID} n'est plus leader — jobs scheduler en pause")
+            on_demoted()
+
+    try:
+        while True:
+            try:
+                if _is_leader:
+                    renewed = await client.eval(_RENEW_SCRIPT, 1, LEASE_KEY, REPLICA_ID, ttl_ms)
+                    if renewed:
+                        last_renewed = time.monotonic()
+                    else:
+                        _set_role(False)
+                else:
+                    acquired = await client.set(LEASE_KEY, REPLICA_ID, nx=True, px=ttl_ms)
+                    if acquired:
+                        last_renewed = time.monotonic()
+                        _set_role(True)
+            except Exception as e:
+                logger.warning(f"Erreur bail leader Redis : {e}")
+                # Sans confirmation, pause avant l'expiration théorique du bail : le
+                # prochain tour arriverait trop tard et chevaucherait un nouveau leader
+                if _is_leader and (
+                    last_renewed is None
+                    or time.monotonic() - last_renewed >= settings.leader_lease_ttl_seconds - interval
+                ):
+                    _set_role(False)
+            await asyncio.sleep(interval)
+    finally:
+        if _is_leader:
+            try:
+                await client.eval(_RELEASE_SCRIPT, 1, LEASE_KEY, REPLICA_ID)
+                logger.info(f"Bail leader libéré par {REPLICA_ID}")
+            except Exception as e:
+                logger.warning(f"Erreur libération bail leader : {e}")
+            _is_leader = False
+        await client.close()
@@ -0,0 +1,681 @@
+"""
+Passerelle LLM — point d'entrée unique de tous les appels modèles.
+
+Transport : la passerelle possède un client HTTP mutualisé par fournisseur
+(Groq via son API compatible OpenAI, Claude via l'API Messages d'Anthropic),
+en HTTP/2 quand le paquet h2 est installé. Les 429 / 5xx et erreurs réseau
+sont rejoués avec un backoff exponentiel à jitter ; chaque fournisseur a son
+disjoncteur, et un fournisseur en échec ou disjoncté bascule automatiquement
+sur l'autre. Chaque appel journalise tokens consommés et latence.
+Le prompt système peut être fourni en blocs ordonnés du plus stable au plus
+volatil (context.build_system_blocks) : Claude reçoit des points de cache
+(cache_control) sur les blocs stables, Groq le texte concaténé dont le
+préfixe reste identique d'un appel à l'autre. Les tokens lus depuis le
+cache fournisseur sont comptés à part.
+Avec on_partial, la réponse est lue en streaming (SSE) et le texte cumulé
+est transmis au fil de l'eau — cf. src.telegram.streaming pour l'affichage
+progressif côté Telegram.
+
+Débit : chaque appel passe par le limiteur à seau de jetons (rate_limit) —
+les handlers Telegram sont servis avant les jobs planifiés, et un 429 met
+l'appel en file jusqu'à libération du quota au lieu de le faire échouer.
+
+Cache : les réponses sont mises en cache dans Redis sous une clé dérivée du
+modèle et d'un hash canonique des messages (JSON trié, compact) : deux
+demandes identiques — /analyse relancé dans l'heure, /briefing rejoué le
+matin, plan repas régénéré sur un planning sport inchangé — sont servies
+sans appel LLM. La durée de vie dépend du site d'appel (CACHE_TTLS) ;
+bypass_cache=True force un nouvel appel et rafraîchit l'entrée en cache.
+Les appels identiques simultanés (job planifié et commande manuelle qui se
+chevauchent) sont fusionnés : tant qu'une génération est en cours pour un
+hash, les appelants suivants attendent son résultat au lieu de relancer le
+modèle (single-flight, par process).
+
+Métriques (cache par site, appels par fournisseur) exposées via /perf ;
+chaque appel est aussi inscrit au registre d'usage par fonctionnalité
+(llm.usage, cumul du jour dans /status).
+"""
+import asyncio
+import hashlib
+import importlib.util
+import json
+import logging
+import random
+import threading
+import time
+from collections import deque
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple, Union
+
+import httpx
+
+from src.config import settings
+from src.llm import rate_limit
+from src.llm.usage import record_usage
+
+logger = logging.getLogger(__name__)
+
+CACHE_PREFIX = "llm:response:"
+
+# site d'appel → durée de vie du cache en secondes (0 = jamais mis en cache)
+CACHE_TTLS: Dict[str, int] = {
+    "briefing": 3 * 3600,           # le prompt ne dépend que de la date et des données du jour
+    "product_analysis": 3600,       # /analyse relancé dans l'heure
+    "meal_plan": 0,                 # JSON : meal_planner ne met en cache que le plan parsé
+    "sport_plan": 6 * 3600,         # phrase d'accompagnement d'un planning calculé localement
+    "chat": 0,                      # conversation : jamais rejouée
+}
+DEFAULT_CACHE_TTL = 0
+
+# Fournisseurs — ordre de repli : le fournisseur demandé puis les autres
+PROVIDERS: Dict[str, Dict[str, str]] = {
+    "groq": {"url": "https://api.groq.com/openai/v1/chat/completions"},
+    "claude": {"url": "https://api.anthropic.com/v1/messages"},
+}
+ANTHROPIC_VERSION = "2023-06-01"
+MAX_OUTPUT_TOKENS = 2048
+# Sites à réponse longue : plafond de tokens de sortie relevé
+OUTPUT_TOKENS_BY_SITE: Dict[str, int] = {
+    "meal_plan": 8192,  # 7 jours × 3 repas avec ingrédients détaillés (JSON)
+}
+
+# Transport
+REQUEST_TIMEOUT_SECONDS = 90
+MAX_CONNECTIONS = 10
+RETRYABLE_STATUS = {429, 500, 502, 503, 504, 529}
+MAX_ATTEMPTS = 4                  # 1 appel + 3 reprises
+BACKGROUND_MAX_RATE_LIMITED = 10  # 429 tolérés en arrière-plan avant abandon (remis en file)
+BACKOFF_BASE_SECONDS = 1.0
+BACKOFF_MAX_SECONDS = 20.0
+
+# Disjoncteur : ouvert après N appels en échec consécutifs, pendant X secondes
+CIRCUIT_FAILURE_THRESHOLD = 3
+CIRCUIT_OPEN_SECONDS = 60
+
+# Échantillons de latence conservés par fournisseur (fenêtre glissante)
+_LATENCY_SAMPLES = 256
+
+Messages = Union[str, List[Dict[str, str]]]
+# Prompt système : texte, ou blocs {"text", "cache"} (cf. context.build_system_blocks)
+System = Union[str, List[Dict[str, Any]]]
+# Reçoit le texte cumulé à chaque fragment streamé
+PartialCallback = Callable[[str], Awaitable[None]]
+
+_clients: Dict[str, httpx.AsyncClient] = {}
+_breakers: Dict[str, Dict[str, float]] = {}
+_provider_stats: Dict[str, Dict[str, Any]] = {}
+_stats: Dict[str, Dict[str, int]] = {}
+_lock = threading.Lock()
+
+# hash du prompt → génération en cours (single-flight)
+_inflight: Dict[str, "asyncio.Task[str]"] = {}
+
+
+# ─────────────────────────────────────────────────────────────
+# Fournisseurs et clients HTTP mutualisés
+# ─────────────────────────────────────────────────────────────
+
+def _provider_configured(provider: str) -> bool:
+    if provider == "claude":
+        return bool(settings.claude_api_key)
+    return bool(settings.groq_api_key)
+
+
+def _model_for(provider: str) -> str:
+    return settings.claude_model if provider == "claude" else settings.groq_model
+
+
+def _provider_order(provider: str) -> List[str]:
+    """Fournisseur demandé puis fournisseurs de repli, limités aux fournisseurs configurés."""
+    order = [provider] + [p for p in PROVIDERS if p != provider]
+    return [p for p in order if _provider_configured(p)]
+
+
+def _get_client(provider: str) -> httpx.AsyncClient:
+    client = _clients.get(provider)
+    if client is None or client.is_closed:
+        if provider == "claude":
+            headers = {
+                "x-api-key": settings.claude_api_key,
+                "anthropic-version": ANTHROPIC_VERSION,
+            }
+        else:
+            headers = {"Authorization": f"Bearer {settings.groq_api_key}"}
+        client = httpx.AsyncClient(
+            http2=importlib.util.find_spec("h2") is not None,
+            headers=headers,
+            timeout=httpx.Timeout(REQUEST_TIMEOUT_SECONDS, connect=10),
+            limits=httpx.Limits(
+                max_connections=MAX_CONNECTIONS,
+                max_keepalive_connections=MAX_CONNECTIONS,
+            ),
+        )
+        _clients[provider] = client
+    return client
+
+
+async def close_clients() -> None:
+    """Ferme les connexions HTTP des fournisseurs (arrêt du process)."""
+    clients = list(_clients.values())
+    _clients.clear()
+    for client in clients:
+        await client.aclose()
+    logger.info("Clients LLM fermés")
+
+
+def _system_blocks(system: System) -> List[Dict[str, Any]]:
+    if isinstance(system, str):
+        return [{"text": system, "cache": False}]
+    return system
+
+
+def _system_text(system: Optional[System]) -> str:
+    if not system:
+        return ""
+    from src.context import join_system_blocks
+    return join_system_blocks(_system_blocks(system))
+
+
+def _build_request(
+    provider: str,
+    messages: List[Dict[str, str]],
+    system: List[Dict[str, Any]],
+    max_tokens: int = MAX_OUTPUT_TOKENS,
+) -> Dict[str, Any]:
+    if provider == "claude":
+        return {
+            "model": settings.claude_model,
+            "max_tokens": max_tokens,
+            "system": [
+                {"type": "text", "text": b["text"]}
+                | ({"cache_control": {"type": "ephemeral"}} if b.get("cache") else {})
+                for b in system
+            ],
+            "messages": [m for m in messages if m["role"] in ("user", "assistant")],
+        }
+    return {
+        "model": settings.groq_model,
+        "max_tokens": max_tokens,
+        "messages": [{"role": "system", "content": _system_text(system)}] + messages,
+    }
+
+
+def _parse_response(provider: str, data: Dict[str, Any]) -> Tuple[str, Dict[str, int]]:
+    """Texte généré + usage {prompt_tokens, completion_tokens, cache_read_tokens}."""
+    usage = data.get("usage") or {}
+    if provider == "claude":
+        text = "".join(b.get("text", "") for b in data.get("content", []) if b.get("type") == "text")
+        # input_tokens exclut les tokens lus / écrits dans le cache de prompts
+        cache_read = usage.get("cache_read_input_tokens") or 0
+        cache_write = usage.get("cache_creation_input_tokens") or 0
+        return text, {
+            "prompt_tokens": (usage.get("input_tokens") or 0) + cache_read + cache_write,
+            "completion_tokens": usage.get("output_tokens") or 0,
+            "cache_read_tokens": cache_read,
+        }
+    text = data["choices"][0]["message"]["content"] or ""
+    return text, {
+        "prompt_tokens": usage.get("prompt_tokens") or 0,
+        "completion_tokens": usage.get("completion_tokens") or 0,
+        "cache_read_tokens": (usage.get("prompt_tokens_details") or {}).get("cached_tokens") or 0,
+    }
+
+
+async def _notify_partial(on_partial: PartialCallback, text: str) -> None:
+    try:
+        await on_partial(text)
+    except Exception as e:
+        logger.warning(f"Erreur affichage partiel LLM : {e}")
+
+
+async def _read_stream(
+    client: httpx.AsyncClient,
+    provider: str,
+    payload: Dict[str, Any],
+    on_partial: PartialCallback,
+) -> Dict[str, Any]:
+    """
+    Lit une réponse SSE et retourne un corps au format non streamé (cf. _parse_response).
+    on_partial reçoit le texte cumulé : une reprise repart de zéro sans incohérence.
+    """
+    payload = {**payload, "stream": True}
+    if provider == "groq":
+        payload["stream_options"] = {"include_usage": True}
+
+    text = ""
+    usage: Dict[str, int] = {}
+    async with client.stream("POST", PROVIDERS[provider]["url"], json=payload) as resp:
+        if resp.status_code >= 400:
+            await resp.aread()
+            resp.raise_for_status()
+        async for line in resp.aiter_lines():
+            if not line.startswith("data:"):
+                continue
+            data = line[5:].strip()
+            if not data or data == "[DONE]":
+                continue
+            chunk = json.loads(data)
+
+            delta = ""
+            if provider == "claude":
+                kind = chunk.get("type")
+                if kind == "message_start":
+                    usage.update(chunk["message"].get("usage") or {})
+                elif kind == "content_block_delta":
+                    delta = chunk["delta"].get("text", "")
+                elif kind == "message_delta":
+                    usage.update(chunk.get("usage") or {})
+                elif kind == "error":
+                    raise RuntimeError(chunk.get("error", {}).get("message", "erreur de streaming"))
+            else:
+                if chunk.get("choices"):
+                    delta = chunk["choices"][0].get("delta", {}).get("content") or ""
+                usage.update(chunk.get("usage") or (chunk.get("x_groq") or {}).get("usage") or {})
+
+            if delta:
+                text += delta
+                await _notify_partial(on_partial, text)
+
+    if provider == "claude":
+        return {"content": [{"type": "text", "text": text}], "usage": usage}
+    return {"choices": [{"message": {"content": text}}], "usage": usage}
+
+
+# ─────────────────────────────────────────────────────────────
+# Reprises et disjoncteur
+# ─────────────────────────────────────────────────────────────
+
+def _backoff_delay(attempt: int, retry_after: Optional[str]) -> float:
+    """Backoff exponentiel à jitter complet ; Retry-After du fournisseur prioritaire."""
+    if retry_after:
+        try:
+            return min(float(retry_after), BACKOFF_MAX_SECONDS)
+        except ValueError:
+            pass
+    return random.uniform(0, min(BACKOFF_MAX_SECONDS, BACKOFF_BASE_SECONDS * 2 ** attempt))
+
+
+async def _post_with_retries(
+    provider: str,
+    payload: Dict[str, Any],
+    priority: int,
+    on_partial: Optional[PartialCallback] = None,
+) -> Dict[str, Any]:
+    """
+    POST avec reprises (en streaming si on_partial est fourni). Un 429 bloque le seau du limiteur puis remet l'appel en
+    file ; en arrière-plan il ne consomme pas de tentative (jusqu'à
+    BACKGROUND_MAX_RATE_LIMITED), l'appel attend plutôt que d'échouer.
+    """
+    client = _get_client(provider)
+    url = PROVIDERS[provider]["url"]
+    attempt = 0
+    rate_limited = 0
+
+    while True:
+        retry_after = None
+        try:
+            if on_partial is not None:
+                return await _read_stream(client, provider, payload, on_partial)
+            resp = await client.post(url, json=payload)
+            resp.raise_for_status()
+            return resp.json()
+        except httpx.HTTPStatusError as e:
+            status = e.response.status_code
+            if status == 429 and priority == rate_limit.BACKGROUND and rate_limited < BACKGROUND_MAX_RATE_LIMITED:
+                rate_limited += 1
+                delay = _backoff_delay(rate_limited, e.response.headers.get("retry-after"))
+                _record_provider(provider, "retries")
+                logger.warning(f"LLM {provider} : 429, appel d'arrière-plan remis en file ({delay:.1f}s)")
+                rate_limit.penalize(provider, delay)
+                await rate_limit.acquire(provider, 0, priority)
+                continue
+            if status not in RETRYABLE_STATUS or attempt == MAX_ATTEMPTS - 1:
+                raise
+            retry_after = e.response.headers.get("retry-after")
+            reason = f"HTTP {status}"
+        except httpx.TransportError as e:
+            if attempt == MAX_ATTEMPTS - 1:
+                raise
+            reason = type(e).__name__
+
+        delay = _backoff_delay(attempt, retry_after)
+        attempt += 1
+        _record_provider(provider, "retries")
+        logger.warning(
+            f"LLM {provider} : {reason}, reprise {attempt}/{MAX_ATTEMPTS - 1} dans {delay:.1f}s"
+        )
+        if reason == "HTTP 429":
+            rate_limit.penalize(provider, delay)
+            await rate_limit.acquire(provider, 0, priority)
+        else:
+            await asyncio.sleep(delay)
+
+
+def _circuit_open(provider: str) -> bool:
+    breaker = _breakers.get(provider)
+    return bool(breaker) and time.monotonic() < breaker["opened_until"]
+
+
+def _breaker_success(provider: str) -> None:
+    _breakers[provider] = {"failures": 0, "opened_until": 0.0}
+
+
+def _breaker_failure(provider: str) -> None:
+    breaker = _breakers.setdefault(provider, {"failures": 0, "opened_until": 0.0})
+    breaker["failures"] += 1
+    # Demi-ouvert : après expiration, un seul échec suffit à rouvrir
+    if breaker["failures"] >= CIRCUIT_FAILURE_THRESHOLD:
+        breaker["opened_until"] = time.monotonic() + CIRCUIT_OPEN_SECONDS
+        logger.error(
+            f"Disjoncteur LLM {provider} ouvert pour {CIRCUIT_OPEN_SECONDS}s "
+            f"({int(breaker['failures'])} échecs consécutifs)"
+        )
+
+
+# ─────────────────────────────────────────────────────────────
+# Clé de cache
+# ─────────────────────────────────────────────────────────────
+
+def _normalize_messages(messages: Messages) -> List[Dict[str, str]]:
+    if isinstance(messages, str):
+        return [{"role": "user", "content": messages}]
+    return [{"role": m.get("role", "user"), "content": m.get("content", "")} for m in messages]
+
+
+def prompt_hash(provider: str, messages: List[Dict[str, str]], system: Optional[System] = None) -> str:
+    """Hash canonique (sha256) du modèle, du prompt système et des messages."""
+    canonical = json.dumps(
+        {
+            "provider": provider,
+            "model": _model_for(provider),
+            "system": _system_text(system),
+            "messages": messages,
+        },
+        sort_keys=True,
+        separators=(",", ":"),
+        ensure_ascii=False,
+    )
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+# ─────────────────────────────────────────────────────────────
+# Métriques
+# ─────────────────────────────────────────────────────────────
+
+def _record(site: str, outcome: str) -> None:
+    with _lock:
+        stats = _stats.setdefault(site, {"hits": 0, "misses": 0, "bypassed": 0, "coalesced": 0})
+        stats[outcome] += 1
+
+
+def _record_provider(provider: str, outcome: str, **values: Any) -> None:
+    with _lock:
+        stats = _provider_stats.setdefault(provider, {
+            "calls": 0,
+            "errors": 0,
+            "retries": 0,
+            "failovers": 0,
+            "prompt_tokens": 0,
+            "completion_tokens": 0,
+            "cache_read_tokens": 0,
+            "latencies_ms": deque(maxlen=_LATENCY_SAMPLES),
+        })
+        stats[outcome] += 1
+        stats["prompt_tokens"] += values.get("prompt_tokens", 0)
+        stats["completion_tokens"] += values.get("completion_tokens", 0)
+        stats["cache_read_tokens"] += values.get("cache_read_tokens", 0)
+        if "latency_ms" in values:
+            stats["latencies_ms"].append(values["latency_ms"])
+
+
+def get_cache_stats() -> List[Dict[str, Any]]:
+    """Hits / miss / contournements par site d'appel depuis le démarrage."""
+    with _lock:
+        snapshot = {site: dict(stats) for site, stats in _stats.items()}
+    result = []
+    for site, stats in sorted(snapshot.items()):
+        lookups = stats["hits"] + stats["misses"]
+        result.append({
+            "site": site,
+            "ttl": CACHE_TTLS.get(site, DEFAULT_CACHE_TTL),
+            **stats,
+            "hit_rate": stats["hits"] / lookups if lookups else None,
+        })
+    return result
+
+
+def get_provider_stats() -> List[Dict[str, Any]]:
+    """Appels, erreurs, reprises, tokens et latences par fournisseur depuis le démarrage."""
+    from src.executors import _percentile
+
+    with _lock:
+        snapshot = {
+            provider: (dict(stats), list(stats["latencies_ms"]))
+            for provider, stats in _provider_stats.items()
+        }
+    return [
+        {
+            "provider": provider,
+            "model": _model_for(provider),
+            "calls": stats["calls"],
+            "errors": stats["errors"],
+            "retries": stats["retries"],
+            "failovers": stats["failovers"],
+            "prompt_tokens": stats["prompt_tokens"],
+            "completion_tokens": stats["completion_tokens"],
+            "cache_read_tokens": stats["cache_read_tokens"],
+            "latency_p50_ms": _percentile(latencies, 0.5) if latencies else None,
+            "latency_p95_ms": _percentile(latencies, 0.95) if latencies else None,
+            "circuit_open": _circuit_open(provider),
+        }
+        for provider, (stats, latencies) in sorted(snapshot.items())
+    ]
+
+
+def format_cache_stats_telegram(stats: List[Dict[str, Any]]) -> str:
+    """Formate les métriques du cache LLM pour Telegram (section de /perf)."""
+    if not stats:
+        return "🧠 *Cache LLM* — aucun appel depuis le démarrage."
+
+    lines = ["🧠 *Cache LLM (depuis le démarrage)*\n"]
+    for s in stats:
+        rate = f"{s['hit_rate'] * 100:.0f}%" if s["hit_rate"] is not None else "—"
+        ttl = f"{s['ttl'] // 60} min" if s["ttl"] else "désactivé"
+        lines.append(
+            f"• `{s['site']}` — {s['hits']} hit(s) / {s['misses']} miss ({rate}) | TTL {ttl}"
+            + (f" | {s['bypassed']} forcé(s)" if s["bypassed"] else "")
+            + (f" | {s['coalesced']} fusionné(s)" if s["coalesced"] else "")
+        )
+    return "\n".join(lines)
+
+
+def format_provider_stats_telegram(stats: List[Dict[str, Any]]) -> str:
+    """Formate les métriques des fournisseurs LLM pour Telegram (section de /perf)."""
+    from src.job_metrics import _format_ms
+
+    if not stats:
+        return "🤖 *Fournisseurs LLM* — aucun appel depuis le démarrage."
+
+    lines = ["🤖 *Fournisseurs LLM (depuis le démarrage)*\n"]
+    for s in stats:
+        lines.append(
+            f"• `{s['provider']}` ({s['model']}) — {s['calls']} appel(s) | "
+            f"{s['prompt_tokens'] + s['completion_tokens']} tokens"
+            + (f" (dont {s['cache_read_tokens']} lus en cache)" if s["cache_read_tokens"] else "")
+            + "\n"
+            f"  latence p50 {_format_ms(s['latency_p50_ms'])} | p95 {_format_ms(s['latency_p95_ms'])}"
+            + (f" | {s['retries']} reprise(s)" if s["retries"] else "")
+            + (f" | {s['failovers']} bascule(s)" if s["failovers"] else "")
+            + (f" | ⚠️ {s['errors']} erreur(s)" if s["errors"] else "")
+            + (" | 🔴 disjoncté" if s["circuit_open"] else "")
+        )
+    return "\n".join(lines)
+
+
+# ─────────────────────────────────────────────────────────────
+# Appel
+# ─────────────────────────────────────────────────────────────
+
+async def _call_provider(
+    provider: str,
+    messages: List[Dict[str, str]],
+    system: List[Dict[str, Any]],
+    priority: int,
+    on_partial: Optional[PartialCallback] = None,
+    max_tokens: int = MAX_OUTPUT_TOKENS,
+) -> Tuple[str, Dict[str, int]]:
+    reserved = rate_limit.estimate_tokens(
+        [b["text"] for b in system] + [m["content"] for m in messages], max_tokens // 4,
+    )
+    await rate_limit.acquire(provider, reserved, priority)
+    try:
+        data = await _post_with_retries(
+            provider, _build_request(provider, messages, system, max_tokens), priority, on_partial,
+        )
+    except Exception:
+        rate_limit.settle(provider, reserved, reserved)
+        raise
+    text, usage = _parse_response(provider, data)
+    rate_limit.settle(provider, reserved, usage["prompt_tokens"] + usage["completion_tokens"])
+    return text, usage
+
+
+async def _call_with_failover(
+    site: str,
+    providers: List[str],
+    messages: List[Dict[str, str]],
+    system: Optional[System],
+    priority: int,
+    on_partial: Optional[PartialCallback] = None,
+) -> str:
+    """Appelle le premier fournisseur disponible, bascule sur le suivant en cas d'échec."""
+    if not providers:
+        raise RuntimeError("Aucun fournisseur LLM configuré")
+
+    if system is None:
+        from src.context import build_system_blocks
+        system = build_system_blocks()
+    system = _system_blocks(system)
+
+    last_error: Optional[Exception] = None
+    for provider in providers:
+        if _circuit_open(provider):
+            logger.warning(f"LLM {provider} disjoncté — ignoré pour {site}")
+            continue
+
+        started = time.monotonic()
+        try:
+            text, usage = await _call_provider(
+                provider, messages, system, priority, on_partial,
+                OUTPUT_TOKENS_BY_SITE.get(site, MAX_OUTPUT_TOKENS),
+            )
+        except Exception as e:
+            _breaker_failure(provider)
+            _record_provider(provider, "errors")
+            logger.error(f"Erreur LLM {provider} ({site}) : {e}")
+            last_error = e
+            continue
+
+        latency_ms = (time.monotonic() - started) * 1000
+        _breaker_success(provider)
+        _record_provider(provider, "calls", latency_ms=latency_ms, **usage)
+        if provider != providers[0]:
+            _record_provider(provider, "failovers")
+        record_usage(site, provider, latency_ms, **usage)
+        logger.info(
+            f"LLM {site} via {provider} ({_model_for(provider)}) — "
+            f"{usage['prompt_tokens']}+{usage['completion_tokens']} tokens "
+            f"({usage['cache_read_tokens']} lus en cache), {latency_ms:.0f} ms"
+        )
+        return text
+
+    raise RuntimeError(f"Aucun fournisseur LLM disponible pour {site} : {last_error or 'tous disjonctés'}")
+
+
+async def _generate(
+    site: str,
+    providers: List[str],
+    messages: List[Dict[str, str]],
+    system: Optional[System],
+    cache_key: Optional[str],
+    ttl: int,
+    priority: int,
+    on_partial: Optional[PartialCallback],
+) -> str:
+    from src.memory.cache import set_cache
+
+    response = await _call_with_failover(site, providers, messages, system, priority, on_partial)
+    if cache_key and response:
+        try:
+            await set_cache(cache_key, response, ttl=ttl)
+        except Exception as e:
+            logger.warning(f"Écriture cache LLM impossible ({site}) : {e}")
+    return response
+
+
+async def complete(
+    messages: Messages,
+    *,
+    site: str,
+    provider: str = "groq",
+    system: Optional[System] = None,
+    bypass_cache: bool = False,
+    cache_ttl: Optional[int] = None,
+    priority: Optional[int] = None,
+    on_partial: Optional[PartialCallback] = None,
+) -> str:
+    """
+    Génère une réponse LLM en passant par le cache de prompts.
+
+    site : site d'appel (clé de CACHE_TTLS, des métriques et des logs d'usage).
+    provider : fournisseur préféré, "groq" ou "claude" ; bascule sur l'autre en cas d'échec.
+    system : prompt système, texte ou blocs (défaut : context.build_system_blocks()).
+    bypass_cache : ignore l'entrée existante et la remplace par la nouvelle réponse.
+    cache_ttl : surcharge la durée de vie du site (0 = pas de cache).
+    priority : rate_limit.INTERACTIVE / BACKGROUND (défaut : priorité de la tâche
+    courante, cf. rate_limit.mark_interactive ; la conversation est toujours interactive).
+    on_partial : active le streaming — appelé avec le texte cumulé à chaque fragment
+    (pas appelé si la réponse vient du cache ou d'un appel identique en cours).
+    Un appel identique déjà en cours est attendu plutôt que relancé.
+    Lève RuntimeError si aucun fournisseur n'a pu répondre.
+    """
+    from src.memory.cache import get_cache
+
+    started = time.monotonic()
+    normalized = _normalize_messages(messages)
+    providers = _provider_order(provider)
+    if priority is None:
+        priority = rate_limit.INTERACTIVE if site == "chat" else rate_limit.current_priority()
+    ttl = CACHE_TTLS.get(site, DEFAULT_CACHE_TTL) if cache_ttl is None else cache_ttl
+    digest = prompt_hash(providers[0] if providers else provider, normalized, system)
+    key = CACHE_PREFIX + digest if ttl > 0 else None
+
+    if key and not bypass_cache:
+        try:
+            cached = await get_cache(key)
+        except Exception as e:
+            logger.warning(f"Lecture cache LLM impossible ({site}) : {e}")
+            cached = None
+        if cached:
+            _record(site, "hits")
+            record_usage(site, None, (time.monotonic() - started) * 1000, cache_hit=True)
+            return cached
+        _record(site, "misses")
+    elif key:
+        _record(site, "bypassed")
+
+    task = _inflight.get(digest)
+    if task is None:
+        task = asyncio.create_task(
+            _generate(site, providers, normalized, system, key, ttl, priority, on_partial)
+        )
+        _inflight[digest] = task
+        task.add_done_callback(lambda _t: _inflight.pop(digest, None))
+        # shield : l'annulation d'un appelant n'interrompt pas la génération partagée
+        return await asyncio.shield(task)
+
+    _record(site, "coalesced")
+    logger.info(f"Appel LLM identique déjà en cours ({site}) — résultat partagé")
+    response = await asyncio.shield(task)
+    # Pas de tokens dépensés : compté comme réponse servie par le cache
+    record_usage(site, None, (time.monotonic() - started) * 1000, cache_hit=True)
+    return response
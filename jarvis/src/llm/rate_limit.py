@@ -0,0 +1,221 @@
+"""
+Limiteur de débit LLM — seau à jetons par fournisseur, partagé par tout le process.
+
+Chaque fournisseur a deux seaux rechargés en continu : tokens par minute et
+requêtes par minute (limites du compte, cf. config). Un appel réserve une
+estimation de ses tokens avant de partir, puis l'écart avec l'usage réel est
+régularisé. Quand le seau est vide, l'appel attend dans une file à priorité :
+les messages Telegram interactifs passent devant les jobs planifiés, qui
+patientent au lieu d'échouer. Un 429 du fournisseur bloque le seau pendant
+la durée Retry-After, ce qui met toute la file en attente.
+"""
+import asyncio
+import heapq
+import itertools
+import logging
+import time
+from collections import deque
+from contextvars import ContextVar
+from typing import Any, Dict, List, Optional
+
+from src.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Priorités — la plus petite valeur est servie en premier
+INTERACTIVE = 0
+BACKGROUND = 1
+PRIORITY_LABELS = {INTERACTIVE: "interactif", BACKGROUND: "arrière-plan"}
+
+# Estimation grossière avant appel : ~4 caractères par token
+CHARS_PER_TOKEN = 4
+
+# Échantillons de temps d'attente conservés par priorité (fenêtre glissante)
+_WAIT_SAMPLES = 256
+
+_priority: ContextVar[int] = ContextVar("llm_priority", default=BACKGROUND)
+_buckets: Dict[str, Dict[str, Any]] = {}
+_sequence = itertools.count()
+_stats: Dict[int, Dict[str, Any]] = {}
+
+
+def _limits(provider: str) -> Dict[str, int]:
+    if provider == "claude":
+        return {"tpm": settings.claude_tokens_per_minute, "rpm": settings.claude_requests_per_minute}
+    return {"tpm": settings.groq_tokens_per_minute, "rpm": settings.groq_requests_per_minute}
+
+
+# ─────────────────────────────────────────────────────────────
+# Priorité de la tâche courante
+# ─────────────────────────────────────────────────────────────
+
+def mark_interactive() -> None:
+    """Marque les appels LLM de la tâche courante comme interactifs (handlers Telegram)."""
+    _priority.set(INTERACTIVE)
+
+
+def current_priority() -> int:
+    return _priority.get()
+
+
+def estimate_tokens(texts: List[str], completion_tokens: int) -> int:
+    """Estimation des tokens consommés par un appel (prompt + réponse attendue)."""
+    return sum(len(t) for t in texts) // CHARS_PER_TOKEN + completion_tokens
+
+
+# ─────────────────────────────────────────────────────────────
+# Seaux
+# ─────────────────────────────────────────────────────────────
+
+def _bucket(provider: str) -> Dict[str, Any]:
+    bucket = _buckets.get(provider)
+    if bucket is None:
+        limits = _limits(provider)
+        bucket = {
+            **limits,
+            "tokens": float(limits["tpm"]),
+            "requests": float(limits["rpm"]),
+            "updated": time.monotonic(),
+            "blocked_until": 0.0,
+            "waiters": [],
+            "timer": None,
+        }
+        _buckets[provider] = bucket
+    return bucket
+
+
+def _refill(bucket: Dict[str, Any], now: float) -> None:
+    elapsed = now - bucket["updated"]
+    bucket["updated"] = now
+    bucket["tokens"] = min(bucket["tpm"], bucket["tokens"] + elapsed * bucket["tpm"] / 60)
+    bucket["requests"] = min(bucket["rpm"], bucket["requests"] + elapsed * bucket["rpm"] / 60)
+
+
+def _wait_time(bucket: Dict[str, Any], cost: int, now: float) -> float:
+    """Secondes avant que le seau puisse servir `cost` tokens et une requête."""
+    if now < bucket["blocked_until"]:
+        return bucket["blocked_until"] - now
+    missing_tokens = max(0.0, cost - bucket["tokens"])
+    missing_requests = max(0.0, 1 - bucket["requests"])
+    return max(missing_tokens * 60 / bucket["tpm"], missing_requests * 60 / bucket["rpm"])
+
+
+def _dispatch(provider: str) -> None:
+    """Sert la file dans l'ordre de priorité tant que le seau le permet."""
+    bucket = _bucket(provider)
+    bucket["timer"] = None
+    now = time.monotonic()
+    _refill(bucket, now)
+
+    waiters = bucket["waiters"]
+    while waiters:
+        _, _, cost, future = waiters[0]
+        if future.done():  # appelant annulé
+            heapq.heappop(waiters)
+            continue
+        wait = _wait_time(bucket, cost, now)
+        if wait > 0:
+            # La tête de file attend : personne ne la double, pas même un appel moins coûteux
+            bucket["timer"] = asyncio.get_running_loop().call_later(wait, _dispatch, provider)
+            return
+        heapq.heappop(waiters)
+        bucket["tokens"] -= cost
+        bucket["requests"] -= 1
+        future.set_result(None)
+
+
+def _reschedule(provider: str) -> None:
+    bucket = _bucket(provider)
+    if bucket["timer"] is not None:
+        bucket["timer"].cancel()
+    _dispatch(provider)
+
+
+# ─────────────────────────────────────────────────────────────
+# API
+# ─────────────────────────────────────────────────────────────
+
+async def acquire(provider: str, cost: int, priority: Optional[int] = None) -> None:
+    """Attend que le seau de `provider` puisse servir `cost` tokens (file à priorité)."""
+    priority = current_priority() if priority is None else priority
+    bucket = _bucket(provider)
+    cost = min(cost, bucket["tpm"])  # un appel plus gros que le seau passerait jamais
+
+    future = asyncio.get_running_loop().create_future()
+    heapq.heappush(bucket["waiters"], (priority, next(_sequence), cost, future))
+    queued_at = time.monotonic()
+    _reschedule(provider)
+
+    if not future.done():
+        logger.info(
+            f"LLM {provider} : limite de débit atteinte, appel {PRIORITY_LABELS[priority]} "
+            f"en file ({len(bucket['waiters'])} en attente)"
+        )
+    await future
+    _record_wait(priority, (time.monotonic() - queued_at) * 1000)
+
+
+def settle(provider: str, reserved: int, used: int) -> None:
+    """Régularise la réservation avec l'usage réel renvoyé par le fournisseur."""
+    bucket = _bucket(provider)
+    bucket["tokens"] = min(bucket["tpm"], bucket["tokens"] + reserved - used)
+    if used < reserved:
+        _reschedule(provider)
+
+
+def penalize(provider: str, delay: float) -> None:
+    """429 reçu : plus aucun appel vers `provider` pendant `delay` secondes."""
+    bucket = _bucket(provider)
+    bucket["blocked_until"] = max(bucket["blocked_until"], time.monotonic() + delay)
+    _reschedule(provider)
+
+
+# ─────────────────────────────────────────────────────────────
+# Métriques
+# ─────────────────────────────────────────────────────────────
+
+def _record_wait(priority: int, wait_ms: float) -> None:
+    stats = _stats.setdefault(priority, {"granted": 0, "waits_ms": deque(maxlen=_WAIT_SAMPLES)})
+    stats["granted"] += 1
+    stats["waits_ms"].append(wait_ms)
+
+
+def get_limiter_stats() -> Dict[str, Any]:
+    """File d'attente par fournisseur et temps d'attente par priorité."""
+    from src.executors import _percentile
+
+    return {
+        "queues": {
+            provider: sum(1 for w in bucket["waiters"] if not w[3].done())
+            for provider, bucket in sorted(_buckets.items())
+        },
+        "priorities": [
+            {
+                "priority": PRIORITY_LABELS[priority],
+                "granted": stats["granted"],
+                "wait_p50_ms": _percentile(list(stats["waits_ms"]), 0.5),
+                "wait_max_ms": max(stats["waits_ms"]),
+            }
+            for priority, stats in sorted(_stats.items())
+            if stats["waits_ms"]
+        ],
+    }
+
+
+def format_limiter_stats_telegram(stats: Dict[str, Any]) -> str:
+    """Formate l'état du limiteur LLM pour Telegram (section de /perf)."""
+    from src.job_metrics import _format_ms
+
+    if not stats["priorities"]:
+        return "🚦 *Limiteur LLM* — aucun appel depuis le démarrage."
+
+    lines = ["🚦 *Limiteur LLM (depuis le démarrage)*\n"]
+    for s in stats["priorities"]:
+        lines.append(
+            f"• {s['priority']} — {s['granted']} appel(s) | "
+            f"attente p50 {_format_ms(s['wait_p50_ms'])} | max {_format_ms(s['wait_max_ms'])}"
+        )
+    queued = [f"{p} {n}" for p, n in stats["queues"].items() if n]
+    if queued:
+        lines.append(f"• En file : {', '.join(queued)}")
+    return "\n".join(lines)
@@ -0,0 +1,138 @@
+"""
+Registre d'usage LLM — chaque appel de la passerelle, par fonctionnalité.
+
+Une ligne par appel (table llm_usage) : fonctionnalité (site d'appel),
+fournisseur, tokens prompt / réponse, tokens de prompt lus dans le cache du
+fournisseur, latence et réponse servie par le cache local.
+La persistance est asynchrone et n'interrompt jamais l'appel. Le cumul du
+jour par fonctionnalité est affiché dans /status pour repérer les chemins
+coûteux.
+"""
+import asyncio
+import logging
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional, Set
+
+import pytz
+
+logger = logging.getLogger(__name__)
+
+PARIS_TZ = pytz.timezone("Europe/Paris")
+
+# Références fortes vers les tâches de persistance en cours
+_pending: Set[asyncio.Task] = set()
+
+
+async def _persist_usage(
+    feature: str,
+    provider: Optional[str],
+    prompt_tokens: int,
+    completion_tokens: int,
+    cache_read_tokens: int,
+    latency_ms: float,
+    cache_hit: bool,
+) -> None:
+    from src.memory.database import LlmUsage, async_session
+    try:
+        async with async_session() as session:
+            session.add(LlmUsage(
+                feature=feature,
+                provider=provider,
+                prompt_tokens=prompt_tokens,
+                completion_tokens=completion_tokens,
+                cache_read_tokens=cache_read_tokens,
+                latency_ms=latency_ms,
+                cache_hit=cache_hit,
+            ))
+            await session.commit()
+    except Exception as e:
+        logger.warning(f"Erreur persistance usage LLM {feature} : {e}")
+
+
+def record_usage(
+    feature: str,
+    provider: Optional[str],
+    latency_ms: float,
+    prompt_tokens: int = 0,
+    completion_tokens: int = 0,
+    cache_read_tokens: int = 0,
+    cache_hit: bool = False,
+) -> None:
+    """Enregistre un appel LLM en tâche de fond (sans bloquer l'appelant)."""
+    try:
+        loop = asyncio.get_running_loop()
+    except RuntimeError:
+        return
+    task = loop.create_task(_persist_usage(
+        feature, provider, prompt_tokens, completion_tokens, cache_read_tokens, latency_ms, cache_hit,
+    ))
+    _pending.add(task)
+    task.add_done_callback(_pending.discard)
+
+
+# ─────────────────────────────────────────────────────────────
+# Lecture — commande /status
+# ─────────────────────────────────────────────────────────────
+
+async def get_daily_usage(days_ago: int = 0) -> List[Dict[str, Any]]:
+    """Cumul par fonctionnalité d'une journée (heure de Paris), la plus coûteuse en premier."""
+    from sqlalchemy import func, select
+    from src.memory.database import LlmUsage, async_session
+
+    day_start = datetime.now(PARIS_TZ).replace(hour=0, minute=0, second=0, microsecond=0)
+    day_start -= timedelta(days=days_ago)
+    day_end = day_start + timedelta(days=1)
+    total_tokens = func.sum(LlmUsage.prompt_tokens + LlmUsage.completion_tokens)
+
+    async with async_session() as session:
+        result = await session.execute(
+            select(
+                LlmUsage.feature,
+                func.count(LlmUsage.id),
+                func.count(LlmUsage.id).filter(LlmUsage.cache_hit.is_(True)),
+                func.sum(LlmUsage.prompt_tokens),
+                func.sum(LlmUsage.completion_tokens),
+                func.sum(LlmUsage.cache_read_tokens),
+                func.sum(LlmUsage.latency_ms),
+                func.percentile_cont(0.95).within_group(LlmUsage.latency_ms),
+            )
+            .where(LlmUsage.created_at >= day_start, LlmUsage.created_at < day_end)
+            .group_by(LlmUsage.feature)
+            .order_by(total_tokens.desc())
+        )
+        rows = result.all()
+
+    return [
+        {
+            "feature": feature,
+            "calls": int(calls),
+            "cache_hits": int(hits),
+            "prompt_tokens": int(prompt or 0),
+            "completion_tokens": int(completion or 0),
+            "cache_read_tokens": int(cache_read or 0),
+            "total_latency_ms": float(latency or 0),
+            "p95_ms": float(p95) if p95 is not None else None,
+        }
+        for feature, calls, hits, prompt, completion, cache_read, latency, p95 in rows
+    ]
+
+
+def format_daily_usage_telegram(usage: List[Dict[str, Any]]) -> str:
+    """Formate le cumul du jour pour Telegram (section de /status)."""
+    from src.job_metrics import _format_ms
+
+    if not usage:
+        return "*Usage LLM (aujourd'hui)* : aucun appel"
+
+    total = sum(u["prompt_tokens"] + u["completion_tokens"] for u in usage)
+    lines = [f"*Usage LLM (aujourd'hui)* — {total} tokens"]
+    for u in usage:
+        tokens = u["prompt_tokens"] + u["completion_tokens"]
+        lines.append(
+            f"• `{u['feature']}` — {u['calls']} appel(s)"
+            + (f" dont {u['cache_hits']} en cache" if u["cache_hits"] else "")
+            + f" | {tokens} tokens ({u['prompt_tokens']}+{u['completion_tokens']})"
+            + (f", {u['cache_read_tokens']} lus en cache" if u["cache_read_tokens"] else "")
+            + f" | ⏱ {_format_ms(u['total_latency_ms'])} cumulé, p95 {_format_ms(u['p95_ms'])}"
+        )
+    return "\n".join(lines)
@@ -2,7 +2,7 @@ import logging
 from datetime import datetime, timezone
 from typing import Optional
 
-from sqlalchemy import BigInteger, DateTime, Float, String, Text, UniqueConstraint
+from sqlalchemy import BigInteger, Boolean, DateTime, Float, Index, Integer, String, Text, UniqueConstraint
 from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.orm import DeclarativeBase, Mapped, mapped_column
 
@@ -182,6 +182,192 @@ class PersonContext(Base):
     )
 
 
+class JobRun(Base):
+    """Exécutions des jobs scheduler — durée, issue, misfires, chevauchements."""
+
+    __tablename__ = "job_runs"
+
+    id: Mapped[int] = mapped_column(primary_key=True, autoincrement=True)
+    job_id: Mapped[str] = mapped_column(String(255), index=True)
+    outcome: Mapped[str] = mapped_column(String(20))  # "success" | "error" | "missed" | "overlap"
+    scheduled_at: Mapped[Optional[datetime]] = mapped_column(DateTime(timezone=True), nullable=True)
+    duration_ms: Mapped[Optional[float]] = mapped_column(Float, nullable=True)
+    error: Mapped[Optional[str]] = mapped_column(Text, nullable=True)
+    created_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True),
+        default=lambda: datetime.now(timezone.utc),
+        index=True,
+    )
+
+
+class GithubRepo(Base):
+    """Repos GitHub suivis — métadonnées + curseur de synchronisation incrémentale."""
+
+    __tablename__ = "github_repos"
+
+    id: Mapped[int] = mapped_column(primary_key=True, autoincrement=True)
+    repo: Mapped[str] = mapped_column(String(255), unique=True)  # "owner/name"
+    description: Mapped[Optional[str]] = mapped_column(Text, nullable=True)
+    stars: Mapped[int] = mapped_column(default=0)
+    synced_at: Mapped[Optional[datetime]] = mapped_column(DateTime(timezone=True), nullable=True)
+
+
+class GithubCommit(Base):
+    """Commits synchronisés depuis GitHub (branche par défaut)."""
+
+    __tablename__ = "github_commits"
+
+    id: Mapped[int] = mapped_column(primary_key=True, autoincrement=True)
+    repo: Mapped[str] = mapped_column(String(255))
+    sha: Mapped[str] = mapped_column(String(40))
+    message: Mapped[str] = mapped_column(Text)
+    author: Mapped[str] = mapped_column(String(255))
+    committed_at: Mapped[datetime] = mapped_column(DateTime(timezone=True))
+
+    __table_args__ = (
+        UniqueConstraint("repo", "sha", name="uq_github_commit"),
+        Index("ix_github_commits_repo_date", "repo", "committed_at"),
+    )
+
+
+class GithubItem(Base):
+    """PRs et issues synchronisées depuis GitHub."""
+
+    __tablename__ = "github_items"
+
+    id: Mapped[int] = mapped_column(primary_key=True, autoincrement=True)
+    repo: Mapped[str] = mapped_column(String(255))
+    kind: Mapped[str] = mapped_column(String(10))     # "pr" | "issue"
+    number: Mapped[int] = mapped_column()
+    title: Mapped[str] = mapped_column(Text)
+    author: Mapped[str] = mapped_column(String(255))
+    state: Mapped[str] = mapped_column(String(20))    # "open" | "closed" | "merged"
+    updated_at: Mapped[datetime] = mapped_column(DateTime(timezone=True))
+
+    __table_args__ = (
+        UniqueConstraint("repo", "kind", "number", name="uq_github_item"),
+        Index("ix_github_items_repo_state", "repo", "kind", "state", "updated_at"),
+    )
+
+
+class GithubReadme(Base):
+    """README des repos, mis en cache par SHA de blob — re-téléchargé seulement s'il change."""
+
+    __tablename__ = "github_readmes"
+
+    id: Mapped[int] = mapped_column(primary_key=True, autoincrement=True)
+    repo: Mapped[str] = mapped_column(String(255), unique=True)
+    sha: Mapped[str] = mapped_column(String(40))
+    # Chemin résolu par l'API (README.rst, docs/README.md…) — relu par SHA aux synchros suivantes
+    path: Mapped[Optional[str]] = mapped_column(String(255), nullable=True)
+    content: Mapped[str] = mapped_column(Text)
+    fetched_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True), default=lambda: datetime.now(timezone.utc)
+    )
+
+
+class StripeCharge(Base):
+    """Ledger local des charges Stripe — synchronisé par curseur `created`."""
+
+    __tablename__ = "stripe_charges"
+
+    id: Mapped[int] = mapped_column(primary_key=True, autoincrement=True)
+    charge_id: Mapped[str] = mapped_column(String(255), unique=True)
+    amount: Mapped[int] = mapped_column(BigInteger)                 # centimes
+    amount_refunded: Mapped[int] = mapped_column(BigInteger, default=0)
+    currency: Mapped[str] = mapped_column(String(10))
+    status: Mapped[str] = mapped_column(String(20))                 # succeeded | pending | failed
+    description: Mapped[Optional[str]] = mapped_column(Text, nullable=True)
+    customer: Mapped[Optional[str]] = mapped_column(String(255), nullable=True)
+    created: Mapped[datetime] = mapped_column(DateTime(timezone=True))
+    # Date de l'état stocké (created de l'événement, ou lecture API) — un état plus ancien est ignoré
+    observed_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True), default=lambda: datetime.now(timezone.utc)
+    )
+
+    __table_args__ = (Index("ix_stripe_charges_status_created", "status", "created"),)
+
+
+class StripeSubscription(Base):
+    """Ledger local des abonnements Stripe."""
+
+    __tablename__ = "stripe_subscriptions"
+
+    id: Mapped[int] = mapped_column(primary_key=True, autoincrement=True)
+    subscription_id: Mapped[str] = mapped_column(String(255), unique=True)
+    customer: Mapped[Optional[str]] = mapped_column(String(255), nullable=True)
+    status: Mapped[str] = mapped_column(String(30))                 # active | past_due | canceled…
+    unit_amount: Mapped[int] = mapped_column(BigInteger, default=0)  # centimes, premier item
+    currency: Mapped[str] = mapped_column(String(10))
+    created: Mapped[datetime] = mapped_column(DateTime(timezone=True))
+    # Date de l'état stocké (created de l'événement, ou lecture API) — un état plus ancien est ignoré
+    observed_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True), default=lambda: datetime.now(timezone.utc)
+    )
+    updated_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True),
+        default=lambda: datetime.now(timezone.utc),
+        onupdate=lambda: datetime.now(timezone.utc),
+    )
+
+    __table_args__ = (Index("ix_stripe_subscriptions_status", "status"),)
+
+
+class StripeSubscriptionItem(Base):
+    """Items d'abonnement Stripe — base du calcul MRR (quantité × prix ÷ période)."""
+
+    __tablename__ = "stripe_subscription_items"
+
+    id: Mapped[int] = mapped_column(primary_key=True, autoincrement=True)
+    item_id: Mapped[str] = mapped_column(String(255), unique=True)
+    subscription_id: Mapped[str] = mapped_column(String(255))
+    quantity: Mapped[int] = mapped_column(default=1)
+    unit_amount: Mapped[int] = mapped_column(BigInteger, default=0)  # centimes
+    currency: Mapped[str] = mapped_column(String(10))
+    interval: Mapped[str] = mapped_column(String(10))                # day | week | month | year
+    interval_count: Mapped[int] = mapped_column(default=1)
+
+    __table_args__ = (Index("ix_stripe_subscription_items_subscription", "subscription_id"),)
+
+
+class StripeEvent(Base):
+    """Journal des événements Stripe appliqués au ledger — idempotence et rejeu."""
+
+    __tablename__ = "stripe_events"
+
+    id: Mapped[int] = mapped_column(primary_key=True, autoincrement=True)
+    event_id: Mapped[str] = mapped_column(String(255), unique=True)
+    type: Mapped[str] = mapped_column(String(100))
+    source: Mapped[str] = mapped_column(String(20))    # "webhook" | "sync"
+    payload: Mapped[str] = mapped_column(Text)         # JSON de l'événement
+    created: Mapped[datetime] = mapped_column(DateTime(timezone=True))
+    received_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True), default=lambda: datetime.now(timezone.utc)
+    )
+
+    __table_args__ = (Index("ix_stripe_events_created", "created"),)
+
+
+class LlmUsage(Base):
+    """Appels LLM par fonctionnalité — tokens, latence, cache, fournisseur."""
+
+    __tablename__ = "llm_usage"
+
+    id: Mapped[int] = mapped_column(primary_key=True, autoincrement=True)
+    feature: Mapped[str] = mapped_column(String(50))                            # site d'appel de la passerelle
+    provider: Mapped[Optional[str]] = mapped_column(String(20), nullable=True)  # None si servi par le cache
+    prompt_tokens: Mapped[int] = mapped_column(Integer, default=0)
+    completion_tokens: Mapped[int] = mapped_column(Integer, default=0)
+    cache_read_tokens: Mapped[int] = mapped_column(Integer, default=0)  # préfixe lu dans le cache fournisseur
+    latency_ms: Mapped[float] = mapped_column(Float)
+    cache_hit: Mapped[bool] = mapped_column(Boolean, default=False)
+    created_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True), default=lambda: datetime.now(timezone.utc)
+    )
+
+    __table_args__ = (Index("ix_llm_usage_created_feature", "created_at", "feature"),)
+
+
 async def init_db() -> None:
     """Crée toutes les tables si elles n'existent pas."""
     async with engine.begin() as conn:
@@ -16,6 +16,8 @@ import signal
 from src.config import settings
 from src.memory.cache import close_redis, init_redis
 from src.memory.database import init_db
+from src.executors import shutdown_executors
+from src.llm.gateway import close_clients
 from src.scheduler import start_scheduler, stop_scheduler
 
 logging.basicConfig(
@@ -37,7 +39,7 @@ async def main() -> None:
     # Créer une instance avec updater (polling) séparée de l'instance prod (webhook)
     from telegram.ext import Application, CallbackQueryHandler, CommandHandler, MessageHandler, filters
     from src.telegram.commands import (
-        cmd_start, cmd_help, cmd_status, cmd_briefing,
+        cmd_start, cmd_help, cmd_status, cmd_perf, cmd_briefing,
         cmd_mails, cmd_agenda, handle_draft_callback,
         cmd_sport, cmd_eau, cmd_repas, cmd_bilan,
         cmd_complements, cmd_planning, cmd_courses, cmd_repasplan, cmd_fitness,
@@ -53,6 +55,7 @@ async def main() -> None:
     application.add_handler(CommandHandler("start", cmd_start))
     application.add_handler(CommandHandler("help", cmd_help))
     application.add_handler(CommandHandler("status", cmd_status))
+    application.add_handler(CommandHandler("perf", cmd_perf))
     application.add_handler(CommandHandler("briefing", cmd_briefing))
     application.add_handler(CommandHandler("mails", cmd_mails))
     application.add_handler(CommandHandler("agenda", cmd_agenda))
@@ -96,6 +99,8 @@ async def main() -> None:
         await application.stop()
 
     stop_scheduler()
+    shutdown_executors()
+    await close_clients()
     await close_redis()
     logger.info("Jarvis arrêté.")
 
@@ -1,228 +1,217 @@
+import asyncio
 import logging
+from typing import Any, Callable
+
 import pytz
+from apscheduler.jobstores.sqlalchemy import SQLAlchemyJobStore
 from apscheduler.schedulers.asyncio import AsyncIOScheduler
 from apscheduler.triggers.cron import CronTrigger
+from apscheduler.triggers.combining import OrTrigger
 from apscheduler.triggers.interval import IntervalTrigger
 
 logger = logging.getLogger(__name__)
 
 PARIS_TZ = pytz.timezone("Europe/Paris")
 _scheduler: AsyncIOScheduler | None = None
+_leader_task: asyncio.Task | None = None
+_registered_job_ids: set = set()
+
+
+def _add_job(func: Callable, trigger: Any, job_id: str, name: str, **kwargs: Any) -> None:
+    """
+    Ajoute ou met à jour un job dans le job store persistant.
+    Conserve la prochaine exécution déjà stockée : un run manqué pendant un
+    redémarrage reste dû et sera rejoué selon son misfire_grace_time.
+    """
+    existing = _scheduler.get_job(job_id)
+    if existing is not None and existing.next_run_time is not None:
+        kwargs.setdefault("next_run_time", existing.next_run_time)
+    _scheduler.add_job(func, trigger=trigger, id=job_id, name=name, replace_existing=True, **kwargs)
+    _registered_job_ids.add(job_id)
+
+
+def _remove_stale_jobs() -> None:
+    """Supprime du job store les jobs qui ne sont plus déclarés dans ce module."""
+    for job in _scheduler.get_jobs():
+        if job.id not in _registered_job_ids:
+            _scheduler.remove_job(job.id)
+            logger.info(f"Job obsolète retiré du job store : {job.id}")
 
 
 def start_scheduler() -> None:
-    global _scheduler
+    """
+    Démarre le scheduler en pause sur chaque réplica ; seul le leader élu
+    (bail Redis) le réactive. Les jobs vivent dans un job store SQL partagé.
+    """
+    global _scheduler, _leader_task
 
     from src.briefing.daily import send_daily_briefing
     from src.email.poller import poll_emails
     from src.calendar.conflict import check_and_notify_conflicts
     from src.wellness.reminders import (
-        remind_sport,
-        remind_water,
-        remind_lunch,
-        remind_dinner,
-        remind_walk,
-        remind_standing_desk,
+        reminder_slot_times,
+        run_reminder_tick,
         send_weekly_wellness_report,
     )
-    from src.wellness.supplements import remind_supplements_morning, remind_supplements_evening
     from src.wellness.sport_scheduler import propose_weekly_sport_plan
     from src.wellness.meal_planner import send_weekly_meal_plan
     from src.integrations.github import send_github_digest
-    from src.integrations.stripe_client import send_weekly_revenue_report
-    from src.integrations.product_intelligence import send_weekly_product_report
-
-    _scheduler = AsyncIOScheduler(timezone=PARIS_TZ)
+    from src.integrations.github_store import sync_github_activity
+    from src.integrations.stripe_ledger import run_stripe_sync_job
+    from src.snapshots import run_monday_reports
+    from src.job_metrics import install_job_listeners
+    from src.config import settings
+    from src.leader import run_leader_election
+
+    # Par défaut : une seule instance par job, exécutions en retard fusionnées
+    _scheduler = AsyncIOScheduler(
+        timezone=PARIS_TZ,
+        jobstores={"default": SQLAlchemyJobStore(url=settings.scheduler_jobstore_sync_url)},
+        job_defaults={"coalesce": True, "max_instances": 1, "misfire_grace_time": 60},
+    )
+    install_job_listeners(_scheduler)
+    # Démarré en pause : aucun job ne s'exécute tant que ce réplica n'est pas leader
+    _scheduler.start(paused=True)
 
     # Briefing quotidien à 8h00 heure de Paris
-    _scheduler.add_job(
+    _add_job(
         send_daily_briefing,
-        trigger=CronTrigger(hour=8, minute=0, timezone=PARIS_TZ),
-        id="daily_briefing",
+        CronTrigger(hour=8, minute=0, timezone=PARIS_TZ),
+        job_id="daily_briefing",
         name="Briefing quotidien 8h00 Paris",
-        replace_existing=True,
+        misfire_grace_time=3600,
     )
 
-    # Polling emails toutes les 15 minutes
-    _scheduler.add_job(
+    # Polling emails toutes les 15 minutes — jamais deux polls en parallèle
+    _add_job(
         poll_emails,
-        trigger=IntervalTrigger(minutes=15),
-        id="email_poll",
+        IntervalTrigger(minutes=15),
+        job_id="email_poll",
         name="Polling emails toutes les 15 min",
-        replace_existing=True,
         misfire_grace_time=60,
+        max_instances=1,
+        coalesce=True,
     )
 
     # Vérification conflits agenda toutes les 30 minutes
-    _scheduler.add_job(
+    _add_job(
         check_and_notify_conflicts,
-        trigger=IntervalTrigger(minutes=30),
-        id="calendar_conflict",
+        IntervalTrigger(minutes=30),
+        job_id="calendar_conflict",
         name="Vérification conflits agenda toutes les 30 min",
-        replace_existing=True,
         misfire_grace_time=120,
     )
 
     # ── Sprint 3 — Bien-être & Rythme ────────────────────────
 
-    # Compléments matin (configurable — défaut 7h30)
-    _scheduler.add_job(
-        remind_supplements_morning,
-        trigger=CronTrigger(hour=7, minute=30, timezone=PARIS_TZ),
-        id="supplement_morning",
-        name="Compléments matin 7h30",
-        replace_existing=True,
+    # Rappels bien-être (compléments, sport, eau, repas, marche, bureau debout) :
+    # un seul job, déclenché sur l'union des créneaux des règles déclaratives
+    _add_job(
+        run_reminder_tick,
+        OrTrigger([
+            CronTrigger(hour=h, minute=m, timezone=PARIS_TZ)
+            for h, m in reminder_slot_times()
+        ]),
+        job_id="wellness_reminders",
+        name="Rappels bien-être (moteur de règles)",
+        misfire_grace_time=300,
     )
 
-    # Compléments soir (configurable — défaut 21h00)
-    _scheduler.add_job(
-        remind_supplements_evening,
-        trigger=CronTrigger(hour=21, minute=0, timezone=PARIS_TZ),
-        id="supplement_evening",
-        name="Compléments soir 21h00",
-        replace_existing=True,
-    )
-
-    # Rappel sport à 7h30 (lun-sam)
-    _scheduler.add_job(
-        remind_sport,
-        trigger=CronTrigger(hour=7, minute=30, day_of_week="mon-sat", timezone=PARIS_TZ),
-        id="remind_sport",
-        name="Rappel sport 7h30",
-        replace_existing=True,
-    )
-
-    # Rappel hydratation toutes les 2h (9h → 21h)
-    _scheduler.add_job(
-        remind_water,
-        trigger=CronTrigger(hour="9,11,13,15,17,19,21", minute=0, timezone=PARIS_TZ),
-        id="remind_water",
-        name="Rappel eau toutes les 2h",
-        replace_existing=True,
-    )
-
-    # Rappel déjeuner à 12h30
-    _scheduler.add_job(
-        remind_lunch,
-        trigger=CronTrigger(hour=12, minute=30, timezone=PARIS_TZ),
-        id="remind_lunch",
-        name="Rappel déjeuner 12h30",
-        replace_existing=True,
-    )
-
-    # Rappel marche — après déjeuner (13h30) et après dîner (20h30)
-    _scheduler.add_job(
-        remind_walk,
-        trigger=CronTrigger(hour="13,20", minute=30, timezone=PARIS_TZ),
-        id="remind_walk",
-        name="Rappel marche 13h30 et 20h30",
-        replace_existing=True,
-    )
-
-    # Rappel dîner à 19h30
-    _scheduler.add_job(
-        remind_dinner,
-        trigger=CronTrigger(hour=19, minute=30, timezone=PARIS_TZ),
-        id="remind_dinner",
-        name="Rappel dîner 19h30",
-        replace_existing=True,
-    )
-
-    # Bureau debout toutes les 90 min (lun-ven) : 10h00, 11h30, 14h00, 15h30, 17h00
-    for _debout_id, _debout_h, _debout_m in [
-        ("debout_1000", 10, 0),
-        ("debout_1130", 11, 30),
-        ("debout_1400", 14, 0),
-        ("debout_1530", 15, 30),
-        ("debout_1700", 17, 0),
-    ]:
-        _scheduler.add_job(
-            remind_standing_desk,
-            trigger=CronTrigger(hour=_debout_h, minute=_debout_m, day_of_week="mon-fri", timezone=PARIS_TZ),
-            id=f"remind_standing_desk_{_debout_id}",
-            name=f"Bureau debout {_debout_h}h{_debout_m:02d}",
-            replace_existing=True,
-        )
-
     # Rapport bien-être hebdomadaire — dimanche 20h00
-    _scheduler.add_job(
+    _add_job(
         send_weekly_wellness_report,
-        trigger=CronTrigger(day_of_week="sun", hour=20, minute=0, timezone=PARIS_TZ),
-        id="weekly_wellness",
+        CronTrigger(day_of_week="sun", hour=20, minute=0, timezone=PARIS_TZ),
+        job_id="weekly_wellness",
         name="Rapport bien-être hebdomadaire dimanche 20h",
-        replace_existing=True,
+        misfire_grace_time=7200,
     )
 
     # Planning sport proposé le vendredi à 18h00
-    _scheduler.add_job(
+    _add_job(
         propose_weekly_sport_plan,
-        trigger=CronTrigger(day_of_week="fri", hour=18, minute=0, timezone=PARIS_TZ),
-        id="sport_plan_weekly",
+        CronTrigger(day_of_week="fri", hour=18, minute=0, timezone=PARIS_TZ),
+        job_id="sport_plan_weekly",
         name="Proposition planning sport vendredi 18h",
-        replace_existing=True,
+        misfire_grace_time=7200,
     )
 
     # Plan repas + liste de courses — dimanche 19h00
-    _scheduler.add_job(
+    _add_job(
         send_weekly_meal_plan,
-        trigger=CronTrigger(day_of_week="sun", hour=19, minute=0, timezone=PARIS_TZ),
-        id="weekly_meal_plan",
+        CronTrigger(day_of_week="sun", hour=19, minute=0, timezone=PARIS_TZ),
+        job_id="weekly_meal_plan",
         name="Plan repas hebdomadaire dimanche 19h",
-        replace_existing=True,
+        misfire_grace_time=7200,
     )
 
     # ── Sprint 4 — GitHub + Stripe ────────────────────────────
 
+    # Synchro incrémentale du store GitHub local (commits, PRs, issues)
+    _add_job(
+        sync_github_activity,
+        IntervalTrigger(minutes=settings.github_sync_interval_minutes),
+        job_id="github_sync",
+        name=f"Synchro store GitHub toutes les {settings.github_sync_interval_minutes} min",
+        misfire_grace_time=300,
+    )
+
+    # Synchro incrémentale du ledger Stripe local (charges, abonnements) —
+    # le job espace lui-même les passages tant que des webhooks arrivent réellement
+    _add_job(
+        run_stripe_sync_job,
+        IntervalTrigger(minutes=settings.stripe_sync_interval_minutes),
+        job_id="stripe_sync",
+        name=f"Synchro ledger Stripe toutes les {settings.stripe_sync_interval_minutes} min",
+        misfire_grace_time=300,
+    )
+
     # Digest GitHub quotidien à 9h00 (lun-ven)
-    _scheduler.add_job(
+    _add_job(
         send_github_digest,
-        trigger=CronTrigger(hour=9, minute=0, day_of_week="mon-fri", timezone=PARIS_TZ),
-        id="github_digest",
+        CronTrigger(hour=9, minute=0, day_of_week="mon-fri", timezone=PARIS_TZ),
+        job_id="github_digest",
         name="Digest GitHub 9h00 lun-ven",
-        replace_existing=True,
+        misfire_grace_time=3600,
     )
 
-    # Rapport Stripe hebdomadaire — lundi 8h05
-    _scheduler.add_job(
-        send_weekly_revenue_report,
-        trigger=CronTrigger(day_of_week="mon", hour=8, minute=5, timezone=PARIS_TZ),
-        id="stripe_weekly",
-        name="Rapport Stripe lundi 8h05",
-        replace_existing=True,
+    # Rapports du lundi 8h05 — DAG : snapshots Stripe + GitHub produits une fois,
+    # puis rapport Stripe et intelligence produit dès que leurs entrées sont prêtes
+    _add_job(
+        run_monday_reports,
+        CronTrigger(day_of_week="mon", hour=8, minute=5, timezone=PARIS_TZ),
+        job_id="monday_reports",
+        name="Rapports lundi 8h05 (Stripe + produit)",
+        misfire_grace_time=7200,
     )
 
-    # Intelligence produit hebdomadaire — lundi 8h30
-    _scheduler.add_job(
-        send_weekly_product_report,
-        trigger=CronTrigger(day_of_week="mon", hour=8, minute=30, timezone=PARIS_TZ),
-        id="weekly_product_report",
-        name="Intelligence produit lundi 8h30",
-        replace_existing=True,
-    )
+    _remove_stale_jobs()
 
-    _scheduler.start()
+    loop = asyncio.get_event_loop()
+    _leader_task = loop.create_task(
+        run_leader_election(on_elected=_scheduler.resume, on_demoted=_scheduler.pause)
+    )
     logger.info(
-        "Scheduler démarré — "
+        "Scheduler démarré (en attente du bail leader) — "
         "Briefing 8h | "
         "Emails /15 min | "
         "Conflits /30 min | "
-        "Compléments 7h30+21h | "
-        "Sport 7h30 | "
-        "Eau /2h | "
-        "Repas 12h30+19h30 | "
-        "Marche 13h30+20h30 | "
-        "Bureau debout /90min | "
+        f"Rappels bien-être {len(reminder_slot_times())} créneaux | "
         "Planning sport ven 18h | "
         "Plan repas dim 19h | "
         "Bilan hebdo dim 20h | "
+        f"Synchro GitHub /{settings.github_sync_interval_minutes} min | "
+        f"Synchro Stripe /{settings.stripe_sync_interval_minutes} min | "
         "GitHub 9h lun-ven | "
-        "Stripe lundi 8h05 | "
-        "Produit lundi 8h30"
+        "Stripe + Produit lundi 8h05 (DAG)"
     )
 
 
 def stop_scheduler() -> None:
-    global _scheduler
+    global _scheduler, _leader_task
+    if _leader_task and not _leader_task.done():
+        # Le bail est libéré dans le finally de la boucle d'élection
+        _leader_task.cancel()
+        _leader_task = None
     if _scheduler and _scheduler.running:
         _scheduler.shutdown(wait=False)
         logger.info("Scheduler arrêté")
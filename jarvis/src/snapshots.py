@@ -0,0 +1,184 @@
+"""
+Snapshots de données partagés entre jobs et rapports — Stripe, GitHub, agenda.
+
+Chaque producteur s'exécute au plus une fois par fenêtre de fraîcheur : les
+consommateurs (briefing, digest, rapports du lundi) lisent le même résultat
+et les appels concurrents attendent le même fetch en cours.
+
+Les rapports du lundi sont orchestrés par un petit DAG : les tâches
+productrices tournent une fois, en parallèle, puis chaque rapport démarre dès
+que ses dépendances sont prêtes.
+"""
+import asyncio
+import logging
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+# ─────────────────────────────────────────────────────────────
+# Producteurs
+# ─────────────────────────────────────────────────────────────
+
+async def _produce_stripe() -> Dict[str, Any]:
+    from src.integrations.stripe_client import fetch_revenue
+    return await fetch_revenue()
+
+
+async def _produce_github() -> List[Dict[str, Any]]:
+    # Fenêtre 7 jours lue dans le store GitHub local (rapport produit du lundi)
+    from src.integrations.github import fetch_all_repos_activity
+    return await fetch_all_repos_activity(hours_back=168)
+
+
+async def _produce_calendar() -> List[Dict[str, Any]]:
+    from src.calendar.google_cal import fetch_today_events
+    return await fetch_today_events()
+
+
+# nom → (producteur, fraîcheur par défaut en secondes)
+SNAPSHOT_PRODUCERS: Dict[str, Tuple[Callable[[], Awaitable[Any]], int]] = {
+    # Lecture du ledger local : fraîcheur courte, invalidé à chaque événement webhook
+    "stripe": (_produce_stripe, 5 * 60),
+    "github": (_produce_github, 90 * 60),
+    "calendar": (_produce_calendar, 15 * 60),
+}
+
+# nom → (horodatage monotonic, données)
+_snapshots: Dict[str, Tuple[float, Any]] = {}
+_inflight: Dict[str, asyncio.Task] = {}
+
+
+def _is_error(data: Any) -> bool:
+    return isinstance(data, dict) and bool(data.get("error"))
+
+
+def snapshot_age(name: str) -> Optional[float]:
+    """Âge en secondes du snapshot en cache, None s'il n'existe pas."""
+    entry = _snapshots.get(name)
+    return time.monotonic() - entry[0] if entry else None
+
+
+def invalidate_snapshot(name: str) -> None:
+    _snapshots.pop(name, None)
+
+
+def format_age(age_seconds: Optional[float]) -> str:
+    """Âge lisible d'un snapshot : « à l'instant », « il y a 4 min », « il y a 2 h »."""
+    if age_seconds is None or age_seconds < 60:
+        return "à l'instant"
+    if age_seconds < 3600:
+        return f"il y a {int(age_seconds // 60)} min"
+    return f"il y a {int(age_seconds // 3600)} h"
+
+
+async def get_snapshot(name: str, max_age: Optional[int] = None) -> Any:
+    """
+    Retourne le snapshot `name` s'il a moins de `max_age` secondes,
+    sinon le reproduit une seule fois (les appels concurrents attendent).
+    Les résultats en erreur ne sont pas mis en cache.
+    """
+    data, _ = await get_snapshot_with_age(name, max_age)
+    return data
+
+
+async def get_snapshot_with_age(name: str, max_age: Optional[int] = None) -> Tuple[Any, float]:
+    """Comme get_snapshot, en retournant aussi l'âge des données en secondes."""
+    producer, default_max_age = SNAPSHOT_PRODUCERS[name]
+    if max_age is None:
+        max_age = default_max_age
+
+    entry = _snapshots.get(name)
+    if entry and time.monotonic() - entry[0] < max_age:
+        return entry[1], time.monotonic() - entry[0]
+
+    task = _inflight.get(name)
+    if task is None:
+        task = asyncio.create_task(_produce(name, producer))
+        _inflight[name] = task
+        task.add_done_callback(lambda _t: _inflight.pop(name, None))
+    # shield : l'annulation d'un appelant n'interrompt pas le fetch partagé
+    data = await asyncio.shield(task)
+    return data, snapshot_age(name) or 0.0
+
+
+async def _produce(name: str, producer: Callable[[], Awaitable[Any]]) -> Any:
+    data = await producer()
+    if not _is_error(data):
+        _snapshots[name] = (time.monotonic(), data)
+    return data
+
+
+# ─────────────────────────────────────────────────────────────
+# DAG de jobs
+# ─────────────────────────────────────────────────────────────
+
+async def run_dag(nodes: Dict[str, Dict[str, Any]]) -> Dict[str, Optional[Exception]]:
+    """
+    Exécute un DAG de tâches async.
+    nodes : {nom: {"deps": [noms], "soft_deps": [noms], "run": coroutine function}}
+    Une tâche démarre dès que toutes ses dépendances sont terminées ; elle est
+    ignorée si l'une de ses `deps` a échoué, alors qu'une `soft_deps` en échec
+    est seulement journalisée (la tâche gère elle-même l'entrée manquante).
+    Retourne {nom: exception ou None}.
+    """
+    tasks: Dict[str, asyncio.Task] = {}
+    outcome: Dict[str, Optional[Exception]] = {}
+
+    async def _run_node(name: str) -> None:
+        node = nodes[name]
+        deps = node.get("deps", [])
+        soft_deps = node.get("soft_deps", [])
+        if deps or soft_deps:
+            await asyncio.gather(*(tasks[d] for d in deps + soft_deps), return_exceptions=True)
+            failed = [d for d in deps if outcome.get(d) is not None]
+            if failed:
+                outcome[name] = RuntimeError(f"dépendance(s) en échec : {', '.join(failed)}")
+                logger.warning(f"DAG — {name} ignoré ({', '.join(failed)} en échec)")
+                return
+            degraded = [d for d in soft_deps if outcome.get(d) is not None]
+            if degraded:
+                logger.warning(f"DAG — {name} lancé sans {', '.join(degraded)} (en échec)")
+        started = time.monotonic()
+        try:
+            await node["run"]()
+            outcome[name] = None
+            logger.info(f"DAG — {name} terminé en {time.monotonic() - started:.1f}s")
+        except Exception as e:
+            outcome[name] = e
+            logger.error(f"DAG — {name} en erreur : {e}", exc_info=True)
+
+    for name in nodes:
+        tasks[name] = asyncio.ensure_future(_run_node(name))
+    await asyncio.gather(*tasks.values())
+    return outcome
+
+
+async def run_monday_reports() -> None:
+    """
+    Job du lundi matin : snapshots Stripe + GitHub produits une seule fois,
+    puis rapport revenus et intelligence produit dès que leurs entrées sont prêtes.
+    """
+    from src.integrations.product_intelligence import send_weekly_product_report
+    from src.integrations.stripe_client import send_weekly_revenue_report
+
+    async def _stripe_snapshot() -> None:
+        from src.config import settings
+        if settings.stripe_configured:
+            await get_snapshot("stripe")
+
+    async def _github_snapshot() -> None:
+        await get_snapshot("github")
+
+    await run_dag({
+        "stripe_snapshot": {"run": _stripe_snapshot},
+        "github_snapshot": {"run": _github_snapshot},
+        "revenue_report": {"deps": ["stripe_snapshot"], "run": send_weekly_revenue_report},
+        # Stripe ne sert qu'au verdict : le rapport produit part sans en cas d'échec
+        "product_report": {
+            "deps": ["github_snapshot"],
+            "soft_deps": ["stripe_snapshot"],
+            "run": send_weekly_product_report,
+        },
+    })
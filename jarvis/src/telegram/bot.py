@@ -21,6 +21,7 @@ def setup_handlers() -> None:
         cmd_start,
         cmd_help,
         cmd_status,
+        cmd_perf,
         cmd_briefing,
         # Sprint 2
         cmd_mails,
@@ -60,6 +61,7 @@ def setup_handlers() -> None:
     application.add_handler(CommandHandler("start", cmd_start))
     application.add_handler(CommandHandler("help", cmd_help))
     application.add_handler(CommandHandler("status", cmd_status))
+    application.add_handler(CommandHandler("perf", cmd_perf))
     application.add_handler(CommandHandler("briefing", cmd_briefing))
 
     # ── Sprint 2 — Communication ───────────────────────────────
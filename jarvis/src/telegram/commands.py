@@ -10,6 +10,7 @@ from telegram.ext import ContextTypes
 
 from src.config import settings
 from src.context import get_paris_time
+from src.llm.rate_limit import mark_interactive
 
 logger = logging.getLogger(__name__)
 
@@ -29,7 +30,7 @@ async def cmd_start(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
         "Jarvis opérationnel.\n\n"
         "Envoyez un message texte ou vocal pour interagir.\n\n"
         "Commandes :\n"
-        "/briefing — Briefing du jour\n"
+        "/briefing [force] — Briefing du jour\n"
         "/mails — Emails prioritaires des dernières 24h\n"
         "/agenda — Agenda du jour\n"
         "/sport [activité] [durée min] — Logger une séance\n"
@@ -43,9 +44,10 @@ async def cmd_start(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
         "/fitness — Trouver la salle Fitness Park la plus proche\n"
         "/analyse [app] — Analyse conviction app(s) via Claude\n"
         "/memoire — Ce que Jarvis a appris\n"
-        "/github — Activité GitHub 24h\n"
+        "/github [heures] — Activité GitHub (24h par défaut)\n"
         "/revenue — Dashboard Stripe\n"
         "/status — État du système\n"
+        "/perf — Durées des jobs scheduler\n"
         "/help — Aide"
     )
 
@@ -56,7 +58,7 @@ async def cmd_help(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     await update.message.reply_text(
         "Jarvis — Commandes disponibles :\n\n"
         "/start — Initialisation\n"
-        "/briefing — Briefing du jour\n"
+        "/briefing [force] — Briefing du jour\n"
         "/mails — Emails prioritaires 24h\n"
         "/agenda — Agenda du jour\n"
         "/sport [activité] [durée min] — Logger une séance sport\n"
@@ -74,6 +76,7 @@ async def cmd_status(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None
         return
 
     from src.auth.oauth_store import list_connected_accounts
+    from src.llm.usage import format_daily_usage_telegram, get_daily_usage
     try:
         connected = await list_connected_accounts()
         google_accounts = ", ".join(connected["google"]) or "Aucun"
@@ -82,6 +85,12 @@ async def cmd_status(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None
         google_accounts = "Erreur"
         ms_accounts = "Erreur"
 
+    try:
+        llm_usage = format_daily_usage_telegram(await get_daily_usage())
+    except Exception as e:
+        logger.warning(f"Erreur lecture usage LLM : {e}")
+        llm_usage = "*Usage LLM (aujourd'hui)* : indisponible"
+
     status = (
         f"*Jarvis — État du système*\n\n"
         f"Heure Paris : {get_paris_time()}\n"
@@ -90,18 +99,67 @@ async def cmd_status(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None
         f"STT : Whisper `{settings.whisper_model}`\n\n"
         f"*Comptes Google* : {google_accounts}\n"
         f"*Comptes Microsoft* : {ms_accounts}\n\n"
+        f"{llm_usage}\n\n"
         f"Statut : ✓ Opérationnel"
     )
     await update.message.reply_text(status, parse_mode="Markdown")
 
 
+async def cmd_perf(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Affiche p50/p95 des jobs scheduler et l'état des pools d'exécution. Usage: /perf [jours]"""
+    if not is_authorized(update.effective_user.id):
+        return
+
+    args = context.args or []
+    days = 7
+    if args and args[0].isdigit():
+        days = max(1, min(int(args[0]), 90))
+
+    from src.executors import format_executor_stats_telegram, get_executor_stats
+    from src.job_metrics import format_job_perf_telegram, get_job_perf_stats
+    from src.llm.gateway import (
+        format_cache_stats_telegram,
+        format_provider_stats_telegram,
+        get_cache_stats,
+        get_provider_stats,
+    )
+    from src.llm.rate_limit import format_limiter_stats_telegram, get_limiter_stats
+    try:
+        stats = await get_job_perf_stats(days=days)
+    except Exception as e:
+        await update.message.reply_text(f"Erreur lecture métriques jobs : {e}")
+        return
+    msg = (
+        format_job_perf_telegram(stats, days=days)
+        + "\n\n"
+        + format_executor_stats_telegram(get_executor_stats())
+        + "\n\n"
+        + format_cache_stats_telegram(get_cache_stats())
+        + "\n\n"
+        + format_provider_stats_telegram(get_provider_stats())
+        + "\n\n"
+        + format_limiter_stats_telegram(get_limiter_stats())
+    )
+    await update.message.reply_text(msg, parse_mode="Markdown")
+
+
 async def cmd_briefing(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     if not is_authorized(update.effective_user.id):
         return
+    mark_interactive()
     await update.message.reply_chat_action(ChatAction.TYPING)
     from src.briefing.daily import generate_briefing
-    briefing = await generate_briefing()
-    await update.message.reply_text(briefing, parse_mode="Markdown")
+    from src.telegram.streaming import ProgressiveReply
+    # /briefing force : ignore le briefing déjà généré ce matin
+    force = bool(context.args) and context.args[0].lower() == "force"
+    reply = ProgressiveReply(update.message)
+    try:
+        briefing = await generate_briefing(bypass_cache=force, on_partial=reply.update)
+    except Exception as e:
+        logger.error(f"Erreur LLM briefing : {e}")
+        await reply.finish("Service momentanément indisponible. Réessayez dans un instant.")
+        return
+    await reply.finish(briefing, parse_mode="Markdown")
 
 
 # ─────────────────────────────────────────────────────────────
@@ -561,6 +619,7 @@ async def cmd_planning(update: Update, context: ContextTypes.DEFAULT_TYPE) -> No
     """Affiche ou génère le planning sport de la semaine."""
     if not is_authorized(update.effective_user.id):
         return
+    mark_interactive()
 
     await update.message.reply_chat_action(ChatAction.TYPING)
     args = context.args or []
@@ -627,6 +686,7 @@ async def cmd_repasplan(update: Update, context: ContextTypes.DEFAULT_TYPE) -> N
     """Affiche le plan repas de la semaine ou le génère."""
     if not is_authorized(update.effective_user.id):
         return
+    mark_interactive()
 
     await update.message.reply_chat_action(ChatAction.TYPING)
     args = context.args or []
@@ -634,7 +694,10 @@ async def cmd_repasplan(update: Update, context: ContextTypes.DEFAULT_TYPE) -> N
     if args and args[0] == "generer":
         from src.wellness.meal_planner import send_weekly_meal_plan
         await update.message.reply_text("⏳ Génération du plan repas en cours…")
-        await send_weekly_meal_plan()
+        if not await send_weekly_meal_plan():
+            await update.message.reply_text(
+                "❌ Impossible de générer le plan repas pour le moment. Réessayez dans quelques minutes."
+            )
         return
 
     from src.memory.cache import get_cache
@@ -696,6 +759,7 @@ async def handle_sport_plan_callback(update: Update, context: ContextTypes.DEFAU
 
     if not is_authorized(query.from_user.id):
         return
+    mark_interactive()
 
     action = query.data
 
@@ -709,7 +773,7 @@ async def handle_sport_plan_callback(update: Update, context: ContextTypes.DEFAU
     if action == "sport_plan_regenerate":
         await query.edit_message_text("⏳ Régénération du planning sport…")
         from src.wellness.sport_scheduler import propose_weekly_sport_plan
-        await propose_weekly_sport_plan()
+        await propose_weekly_sport_plan(bypass_cache=True)
         return
 
     if action == "sport_plan_confirm":
@@ -780,9 +844,11 @@ async def cmd_analyse(update: Update, context: ContextTypes.DEFAULT_TYPE) -> Non
     Déclenche une analyse conviction pour une app ou toutes les apps.
     Usage: /analyse           → rapport pour toutes les apps
            /analyse job       → rapport pour Job Verdict uniquement
+           /analyse job force → idem, sans réutiliser l'analyse en cache
     """
     if not is_authorized(update.effective_user.id):
         return
+    mark_interactive()
 
     await update.message.reply_chat_action(ChatAction.TYPING)
 
@@ -800,6 +866,10 @@ async def cmd_analyse(update: Update, context: ContextTypes.DEFAULT_TYPE) -> Non
         return
 
     args = context.args or []
+    # /analyse <app> force : ignore l'analyse déjà en cache
+    force = bool(args) and args[-1].lower() == "force"
+    if force:
+        args = args[:-1]
     app_filter = " ".join(args).lower() if args else None
 
     await update.message.reply_text(
@@ -809,33 +879,28 @@ async def cmd_analyse(update: Update, context: ContextTypes.DEFAULT_TYPE) -> Non
     try:
         if app_filter:
             # Rapport ciblé sur une app
-            from src.integrations.github import fetch_all_repos_full_context
-            from src.integrations.stripe_client import fetch_revenue
+            from src.integrations.github import (
+                configured_app_names,
+                fetch_repo_full_context,
+                resolve_repo,
+            )
+            from src.snapshots import get_snapshot
             from src.integrations.product_intelligence import analyze_app_conviction, APP_EMOJIS
             from src.memory.cache import set_cache
             import json
             from datetime import datetime, timezone
 
-            all_contexts = await fetch_all_repos_full_context()
-            # Trouver l'app matching le filtre
-            match = None
-            for ctx in all_contexts:
-                app_name = ctx.get("app_context", {}).get("name", "").lower()
-                repo_name = ctx["repo"].split("/")[-1].lower()
-                if app_filter in app_name or app_filter in repo_name:
-                    match = ctx
-                    break
-
-            if not match:
+            # Résolution locale du filtre : seul le repo ciblé est ensuite récupéré
+            repo = resolve_repo(app_filter)
+            if not repo:
                 await update.message.reply_text(
                     f"App '{app_filter}' introuvable. Apps disponibles : "
-                    + ", ".join(
-                        ctx.get("app_context", {}).get("name", ctx["repo"])
-                        for ctx in all_contexts
-                    )
+                    + ", ".join(configured_app_names())
                 )
                 return
 
+            match = await fetch_repo_full_context(repo)
+
             app_context = match.get("app_context", {})
             app_name = app_context.get("name", match["repo"])
             emoji = APP_EMOJIS.get(app_name, "📱")
@@ -843,15 +908,20 @@ async def cmd_analyse(update: Update, context: ContextTypes.DEFAULT_TYPE) -> Non
             revenue_data = None
             if settings.stripe_configured and app_context.get("monetized"):
                 try:
-                    revenue_data = await fetch_revenue()
+                    revenue_data = await get_snapshot("stripe")
                 except Exception:
                     pass
 
+            # Rapport affiché au fil du streaming, clavier ajouté à la version finale
+            from src.telegram.streaming import ProgressiveReply
+            reply = ProgressiveReply(update.message, prefix=f"{emoji} ")
             report = await analyze_app_conviction(
                 app_context=app_context,
                 readme=match.get("readme", ""),
                 activity=match.get("activity", {}),
                 revenue_data=revenue_data,
+                bypass_cache=force,
+                on_partial=reply.update,
             )
 
             # Stocker en cache pour validation roadmap
@@ -871,11 +941,7 @@ async def cmd_analyse(update: Update, context: ContextTypes.DEFAULT_TYPE) -> Non
                 InlineKeyboardButton("❌ Rejeter", callback_data=f"roadmap_reject:{safe_key}"),
             ]])
 
-            await update.message.reply_text(
-                f"{emoji} {report[:4000]}",
-                parse_mode="Markdown",
-                reply_markup=keyboard,
-            )
+            await reply.finish(report, parse_mode="Markdown", reply_markup=keyboard)
 
         else:
             # Rapport complet toutes les apps via send_weekly_product_report
@@ -957,7 +1023,7 @@ async def cmd_memoire(update: Update, context: ContextTypes.DEFAULT_TYPE) -> Non
 # ─────────────────────────────────────────────────────────────
 
 async def cmd_github(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
-    """Affiche l'activité GitHub des 24 dernières heures."""
+    """Affiche l'activité GitHub (24h par défaut, /github [heures])."""
     if not is_authorized(update.effective_user.id):
         return
 
@@ -976,10 +1042,10 @@ async def cmd_github(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None
     args = context.args or []
     hours = 24
     if args and args[0].isdigit():
-        hours = min(int(args[0]), 168)  # max 7 jours
+        hours = min(int(args[0]), 720)  # max 30 jours (historique du store local)
 
     activity = await fetch_all_repos_activity(hours_back=hours)
-    msg = format_activity_telegram(activity)
+    msg = format_activity_telegram(activity, hours_back=hours)
     await update.message.reply_text(msg, parse_mode="Markdown")
 
 
@@ -990,7 +1056,8 @@ async def cmd_revenue(update: Update, context: ContextTypes.DEFAULT_TYPE) -> Non
 
     await update.message.reply_chat_action(ChatAction.TYPING)
 
-    from src.integrations.stripe_client import fetch_revenue, format_revenue_telegram
+    from src.integrations.stripe_client import format_revenue_telegram
+    from src.snapshots import get_snapshot_with_age
     from src.config import settings
 
     if not settings.stripe_configured:
@@ -1000,8 +1067,8 @@ async def cmd_revenue(update: Update, context: ContextTypes.DEFAULT_TYPE) -> Non
         )
         return
 
-    data = await fetch_revenue()
-    msg = format_revenue_telegram(data)
+    data, age = await get_snapshot_with_age("stripe")
+    msg = format_revenue_telegram(data, age_seconds=age)
     await update.message.reply_text(msg, parse_mode="Markdown")
 
 
@@ -1012,21 +1079,23 @@ async def cmd_revenue(update: Update, context: ContextTypes.DEFAULT_TYPE) -> Non
 async def handle_text_message(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     if not is_authorized(update.effective_user.id):
         return
+    mark_interactive()
 
     await update.message.reply_chat_action(ChatAction.TYPING)
 
-    from src.llm.groq_client import groq_client
+    from src.llm.gateway import complete
     from src.memory.cache import get_conversation_history, save_conversation_history
     from src.memory.database import log_message
     from src.memory.learning import record_active_moment
-    from src.context import build_enriched_system_prompt
+    from src.context import build_enriched_system_blocks
+    from src.telegram.streaming import ProgressiveReply
 
     user_id = str(update.effective_user.id)
     user_text = update.message.text
 
     # Tracker l'activité + construire le prompt enrichi en parallèle
     system_prompt, _ = await asyncio.gather(
-        build_enriched_system_prompt(),
+        build_enriched_system_blocks(),
         record_active_moment(),
         return_exceptions=True,
     )
@@ -1036,29 +1105,38 @@ async def handle_text_message(update: Update, context: ContextTypes.DEFAULT_TYPE
     history = await get_conversation_history(user_id)
     history.append({"role": "user", "content": user_text})
 
-    response = await groq_client.chat(history, system_override=system_prompt or None)
+    reply = ProgressiveReply(update.message)
+    try:
+        response = await complete(
+            history, site="chat", system=system_prompt or None, on_partial=reply.update,
+        )
+    except Exception as e:
+        logger.error(f"Erreur LLM conversation : {e}")
+        await reply.finish("Service momentanément indisponible. Réessayez dans un instant.")
+        return
 
     history.append({"role": "assistant", "content": response})
     await save_conversation_history(user_id, history)
     await log_message(telegram_user_id=update.effective_user.id, role="user", content=user_text)
     await log_message(telegram_user_id=update.effective_user.id, role="assistant", content=response)
 
-    await update.message.reply_text(response)
+    await reply.finish(response)
 
 
 async def handle_voice_message(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     if not is_authorized(update.effective_user.id):
         return
+    mark_interactive()
 
     await update.message.reply_chat_action(ChatAction.TYPING)
 
-    from src.llm.groq_client import groq_client
+    from src.llm.gateway import complete
     from src.audio.tts import text_to_ogg
     from src.audio.stt import transcribe_audio
     from src.memory.cache import get_conversation_history, save_conversation_history
     from src.memory.database import log_message
     from src.memory.learning import record_active_moment
-    from src.context import build_enriched_system_prompt
+    from src.context import build_enriched_system_blocks
 
     user_id = str(update.effective_user.id)
     voice = update.message.voice or update.message.audio
@@ -1079,7 +1157,7 @@ async def handle_voice_message(update: Update, context: ContextTypes.DEFAULT_TYP
 
         # Tracker l'activité + construire le prompt enrichi en parallèle
         system_prompt, _ = await asyncio.gather(
-            build_enriched_system_prompt(),
+            build_enriched_system_blocks(),
             record_active_moment(),
             return_exceptions=True,
         )
@@ -1089,7 +1167,12 @@ async def handle_voice_message(update: Update, context: ContextTypes.DEFAULT_TYP
         history = await get_conversation_history(user_id)
         history.append({"role": "user", "content": transcription})
 
-        response = await groq_client.chat(history, system_override=system_prompt or None)
+        try:
+            response = await complete(history, site="chat", system=system_prompt or None)
+        except Exception as e:
+            logger.error(f"Erreur LLM conversation vocale : {e}")
+            await update.message.reply_text("Service momentanément indisponible. Réessayez dans un instant.")
+            return
 
         history.append({"role": "assistant", "content": response})
         await save_conversation_history(user_id, history)
@@ -0,0 +1,102 @@
+"""
+Affichage progressif d'une réponse LLM streamée dans Telegram.
+
+Le message est posté au premier fragment reçu puis édité à cadence bornée
+(edit_message_text) au fil du streaming : le temps perçu devient celui du
+premier token et non plus celui de la réponse complète. Les éditions
+intermédiaires sont en texte brut (un Markdown tronqué serait rejeté par
+Telegram) ; la version finale applique le parse_mode et le clavier éventuel.
+"""
+import logging
+import time
+from typing import Any, List, Optional
+
+from telegram import Message
+from telegram.error import BadRequest, RetryAfter
+
+logger = logging.getLogger(__name__)
+
+# Telegram tolère ~1 édition/s par message ; marge pour ne pas déclencher de RetryAfter
+EDIT_INTERVAL_SECONDS = 1.5
+MAX_MESSAGE_LENGTH = 4000
+STREAMING_SUFFIX = " ▍"
+
+
+def _split(text: str) -> List[str]:
+    """Découpe en messages Telegram, de préférence sur un saut de ligne."""
+    parts = []
+    while len(text) > MAX_MESSAGE_LENGTH:
+        cut = text.rfind("\n", 0, MAX_MESSAGE_LENGTH)
+        if cut <= 0:
+            cut = MAX_MESSAGE_LENGTH
+        parts.append(text[:cut])
+        text = text[cut:].lstrip("\n")
+    parts.append(text)
+    return parts
+
+
+class ProgressiveReply:
+    """
+    Réponse Telegram mise à jour au fil du streaming.
+    update(texte_cumulé) sert de on_partial à la passerelle LLM ; finish(texte) publie la version finale.
+    """
+
+    def __init__(self, message: Message, prefix: str = "") -> None:
+        self._message = message
+        self._prefix = prefix
+        self._sent: Optional[Message] = None
+        self._last_text = ""
+        self._next_edit_at = 0.0
+
+    async def update(self, text: str) -> None:
+        now = time.monotonic()
+        if self._sent is not None and now < self._next_edit_at:
+            return
+
+        display = self._prefix + text
+        if len(display) > MAX_MESSAGE_LENGTH:
+            display = display[:MAX_MESSAGE_LENGTH - 1] + "…"
+        else:
+            display += STREAMING_SUFFIX
+        if display == self._last_text:
+            return
+
+        try:
+            if self._sent is None:
+                self._sent = await self._message.reply_text(display)
+            else:
+                await self._sent.edit_text(display)
+            self._last_text = display
+            self._next_edit_at = now + EDIT_INTERVAL_SECONDS
+        except RetryAfter as e:
+            retry_after = e.retry_after.total_seconds() if hasattr(e.retry_after, "total_seconds") else e.retry_after
+            self._next_edit_at = now + float(retry_after)
+        except BadRequest as e:
+            logger.debug(f"Édition progressive ignorée : {e}")
+
+    async def _publish(self, text: str, parse_mode: Optional[str], reply_markup: Any, edit: bool) -> None:
+        try:
+            if edit:
+                await self._sent.edit_text(text, parse_mode=parse_mode, reply_markup=reply_markup)
+            else:
+                await self._message.reply_text(text, parse_mode=parse_mode, reply_markup=reply_markup)
+        except BadRequest as e:
+            if "not modified" in str(e).lower():
+                return
+            if parse_mode is None:
+                raise
+            # Markdown généré mal formé : repli en texte brut plutôt que de perdre la réponse
+            logger.warning(f"Markdown rejeté par Telegram, envoi en texte brut : {e}")
+            await self._publish(text, None, reply_markup, edit)
+
+    async def finish(
+        self,
+        text: str,
+        parse_mode: Optional[str] = None,
+        reply_markup: Any = None,
+    ) -> None:
+        """Publie la réponse complète (découpée si trop longue) ; le clavier va sur le dernier message."""
+        parts = _split(self._prefix + text)
+        for i, part in enumerate(parts):
+            markup = reply_markup if i == len(parts) - 1 else None
+            await self._publish(part, parse_mode, markup, edit=(i == 0 and self._sent is not None))
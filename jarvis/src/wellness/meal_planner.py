@@ -2,8 +2,13 @@
 Plan repas hebdomadaire halal + liste de courses + créneaux dans l'agenda.
 Proposé chaque dimanche soir, adapté au planning sport de la semaine.
 """
+import hashlib
+import json
 import logging
+import math
+import unicodedata
 from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional, Tuple
 
 import pytz
 
@@ -14,11 +19,81 @@ logger = logging.getLogger(__name__)
 PARIS_TZ = pytz.timezone("Europe/Paris")
 
 
-async def generate_weekly_meal_plan() -> str:
-    """Génère un plan repas hebdomadaire via Groq, adapté au planning sport."""
-    from src.llm.groq_client import groq_client
-    from src.memory.cache import get_cache
-    import json
+# Rayons de la liste de courses — ordre d'affichage, en-tête Markdown
+AISLES = {
+    "viandes": "🥩 *Viandes & Poissons (Halal — boucherie)*",
+    "fruits_legumes": "🥦 *Fruits & Légumes*",
+    "feculents": "🌾 *Féculents & Légumineuses*",
+    "cremerie": "🥚 *Produits laitiers & Œufs*",
+    "epicerie": "🫙 *Épicerie sèche & Condiments*",
+    "surgeles": "❄️ *Surgelés (optionnel)*",
+}
+DEFAULT_AISLE = "epicerie"
+
+# Plan parsé mis en cache par prompt (dépend du planning sport de la semaine) ;
+# une réponse tronquée ou mal formée n'est jamais mise en cache et est regénérée
+PLAN_CACHE_PREFIX = "meal_plan:parsed:"
+PLAN_CACHE_TTL = 24 * 3600
+PLAN_ATTEMPTS = 2
+
+# Repli si le modèle n'indique pas de rayon valide : mot-clé → rayon
+AISLE_KEYWORDS = {
+    "viandes": ("poulet", "dinde", "boeuf", "bœuf", "agneau", "veau", "steak", "viande",
+                "saumon", "thon", "cabillaud", "poisson", "crevette", "merguez", "kefta"),
+    "cremerie": ("oeuf", "œuf", "yaourt", "fromage", "lait", "skyr", "beurre", "crème", "creme"),
+    "feculents": ("riz", "quinoa", "pâtes", "pates", "patate", "pomme de terre", "pain", "avoine",
+                  "lentille", "pois chiche", "haricot", "semoule", "boulgour", "flocons"),
+    "fruits_legumes": ("tomate", "salade", "épinard", "epinard", "brocoli", "courgette", "carotte",
+                       "poivron", "oignon", "ail", "banane", "pomme", "citron", "avocat", "concombre",
+                       "haricots verts", "champignon", "fruit", "légume", "legume", "persil", "coriandre"),
+    "surgeles": ("surgelé", "surgele"),
+}
+
+# Unité → (unité de base, facteur) ; les quantités sont agrégées dans l'unité de base
+UNIT_ALIASES = {
+    "g": ("g", 1), "gr": ("g", 1), "gramme": ("g", 1), "grammes": ("g", 1),
+    "kg": ("g", 1000), "kilo": ("g", 1000), "kilos": ("g", 1000),
+    "ml": ("ml", 1), "cl": ("ml", 10), "dl": ("ml", 100), "l": ("ml", 1000), "litre": ("ml", 1000),
+    "litres": ("ml", 1000),
+    "pièce": ("pièce", 1), "pièces": ("pièce", 1), "piece": ("pièce", 1), "pieces": ("pièce", 1),
+    "unité": ("pièce", 1), "unités": ("pièce", 1), "pc": ("pièce", 1), "pcs": ("pièce", 1),
+    "": ("pièce", 1),
+    "cs": ("cs", 1), "c. à soupe": ("cs", 1), "cuillère à soupe": ("cs", 1), "càs": ("cs", 1),
+    "cc": ("cc", 1), "c. à café": ("cc", 1), "cuillère à café": ("cc", 1), "càc": ("cc", 1),
+}
+
+DAY_TYPE_LABELS = {
+    "muscu": "Muscu — protéines++",
+    "boxe": "Boxe — glucides complexes",
+    "repos": "Repos — repas léger",
+}
+MEAL_ICONS = {"petit_dej": "🌅 Petit-déj", "dejeuner": "🌞 Déjeuner", "diner": "🌙 Dîner", "collation": "🍏 Collation"}
+
+
+# ─────────────────────────────────────────────────────────────
+# Plan repas structuré (LLM, JSON)
+# ─────────────────────────────────────────────────────────────
+
+def _parse_plan_json(raw: str) -> Dict[str, Any]:
+    raw = raw.strip()
+    if raw.startswith("```"):
+        raw = raw.split("```")[1]
+        if raw.startswith("json"):
+            raw = raw[4:]
+    plan = json.loads(raw.strip())
+    if not isinstance(plan, dict) or not plan.get("days"):
+        raise ValueError("plan repas sans jours")
+    return plan
+
+
+async def generate_weekly_meal_plan() -> Dict[str, Any]:
+    """
+    Génère un plan repas hebdomadaire structuré via Groq, adapté au planning sport.
+    Retourne {"week_start", "days": [{"day", "type", "meals": [{"meal", "dish",
+    "ingredients": [{"name", "quantity", "unit", "aisle"}]}]}]} ou {} en cas d'échec.
+    """
+    from src.llm.gateway import complete
+    from src.memory.cache import get_cache, set_cache
 
     now = datetime.now(PARIS_TZ)
 
@@ -63,100 +138,182 @@ Profil Nassim :
 - Jours boxe ({boxe_str}) → glucides complexes + récupération
 - Dimanche → repos, repas léger, légèrement en déficit
 
-Semaine du {next_monday.strftime('%d/%m/%Y')} :
-
-Format EXACT (Markdown Telegram) :
-*Plan repas — semaine du {next_monday.strftime('%d/%m')}*
+Semaine du {next_monday.strftime('%d/%m/%Y')}.
 
-*Lundi* _(Muscu — protéines++)_
-🌅 Petit-déj : ...
-🌞 Déjeuner : ...
-🌙 Dîner : ...
-
-[continuer pour chaque jour]
+Réponds en JSON valide compact, exactement ce schéma :
+{{"week_start": "{next_monday.strftime('%Y-%m-%d')}", "days": [
+  {{"day": "lundi", "type": "muscu", "meals": [
+    {{"meal": "petit_dej", "dish": "Omelette 4 œufs, flocons d'avoine, banane",
+      "ingredients": [{{"name": "œuf", "quantity": 4, "unit": "pièce", "aisle": "cremerie"}}, ...]}},
+    {{"meal": "dejeuner", ...}}, {{"meal": "diner", ...}}
+  ]}},
+  ...
+]}}
 
 Règles :
+- 7 jours, 3 repas par jour (meal : petit_dej, dejeuner, diner)
+- type : muscu, boxe ou repos
 - Cuisine variée : poulet, dinde, bœuf halal, agneau, poisson, œufs, légumineuses
 - Féculents : riz basmati, quinoa, patate douce, pain complet
-- Maximum 20 lignes par jour
-- Portions réalistes et concrètes (ex: "150g de blanc de poulet grillé")""",
+- dish : une ligne, portions réalistes et concrètes (ex: "150g de blanc de poulet grillé, riz basmati")
+- ingredients : quantités pour 1 personne et pour ce repas, nom simple au singulier
+- unit : g, ml, pièce, cs ou cc uniquement
+- aisle : viandes, fruits_legumes, feculents, cremerie, epicerie ou surgeles
+- UNIQUEMENT le JSON, aucun texte autour""",
     }]
 
+    cache_key = PLAN_CACHE_PREFIX + hashlib.sha256(prompt[0]["content"].encode()).hexdigest()[:32]
     try:
-        plan = await groq_client.chat(prompt)
-        return plan
+        cached = await get_cache(cache_key)
+        if cached:
+            return json.loads(cached)
     except Exception as e:
-        logger.error(f"Erreur génération plan repas : {e}")
-        return ""
-
-
-async def generate_shopping_list(meal_plan: str) -> str:
-    """Extrait une liste de courses organisée depuis le plan repas."""
-    from src.llm.groq_client import groq_client
-
-    prompt = [{
-        "role": "user",
-        "content": f"""À partir de ce plan repas, génère une liste de courses complète, organisée par rayon.
-
-Plan repas :
-{meal_plan[:3000]}
-
-Format EXACT (Markdown Telegram) :
-🛒 *Liste de courses — semaine*
-
-🥩 *Viandes & Poissons (Halal — boucherie)*
-- ...
-
-🥦 *Fruits & Légumes*
-- ...
-
-🌾 *Féculents & Légumineuses*
-- ...
-
-🥚 *Produits laitiers & Œufs*
-- ...
+        logger.warning(f"Lecture cache plan repas impossible : {e}")
 
-🫙 *Épicerie sèche & Condiments*
-- ...
-
-❄️ *Surgelés (optionnel)*
-- ...
+    for attempt in range(1, PLAN_ATTEMPTS + 1):
+        try:
+            plan = _parse_plan_json(await complete(prompt, site="meal_plan"))
+        except Exception as e:
+            logger.error(f"Erreur génération plan repas (essai {attempt}/{PLAN_ATTEMPTS}) : {e}")
+            continue
+        try:
+            await set_cache(cache_key, json.dumps(plan), ttl=PLAN_CACHE_TTL)
+        except Exception as e:
+            logger.warning(f"Mise en cache plan repas impossible : {e}")
+        return plan
+    return {}
 
-Règles :
-- Quantités pour 1 personne sur 7 jours
-- Regroupe les ingrédients identiques
-- Indique les quantités approximatives (ex: "500g de blanc de poulet")
-- Marque "⚠️ boucherie halal" pour les viandes fraîches
-- Reste concis, liste seulement l'essentiel""",
-    }]
 
+def render_meal_plan_markdown(plan: Dict[str, Any]) -> str:
+    """Plan repas structuré → Markdown Telegram."""
     try:
-        return await groq_client.chat(prompt)
-    except Exception as e:
-        logger.error(f"Erreur génération liste de courses : {e}")
-        return ""
+        week_start = datetime.strptime(plan.get("week_start", ""), "%Y-%m-%d").strftime("%d/%m")
+    except ValueError:
+        week_start = ""
+    lines = [f"*Plan repas — semaine du {week_start}*" if week_start else "*Plan repas — semaine*"]
+    for day in plan.get("days", []):
+        label = DAY_TYPE_LABELS.get(day.get("type", ""), "")
+        lines.append(f"\n*{day.get('day', '').capitalize()}*" + (f" _({label})_" if label else ""))
+        for meal in day.get("meals", []):
+            icon = MEAL_ICONS.get(meal.get("meal", ""), "🍽 Repas")
+            lines.append(f"{icon} : {meal.get('dish', '')}")
+    return "\n".join(lines)
+
+
+# ─────────────────────────────────────────────────────────────
+# Liste de courses — agrégation locale
+# ─────────────────────────────────────────────────────────────
+
+def _ingredient_key(name: str) -> str:
+    """Clé de dédoublonnage : minuscules, sans accents ni pluriel simple."""
+    key = unicodedata.normalize("NFKD", name.strip().lower())
+    key = "".join(c for c in key if not unicodedata.combining(c))
+    key = " ".join(key.replace("œ", "oe").split())
+    return key[:-1] if key.endswith("s") and not key.endswith("ss") else key
+
+
+def _normalize_unit(unit: str, quantity: float) -> Tuple[str, float]:
+    base, factor = UNIT_ALIASES.get((unit or "").strip().lower().rstrip("."), (unit.strip().lower(), 1))
+    return base, quantity * factor
+
+
+def _aisle_for(name: str, aisle: Optional[str]) -> str:
+    if aisle in AISLES:
+        return aisle
+    lowered = name.lower()
+    for candidate, keywords in AISLE_KEYWORDS.items():
+        if any(k in lowered for k in keywords):
+            return candidate
+    return DEFAULT_AISLE
+
+
+def build_shopping_list(plan: Dict[str, Any]) -> Dict[str, List[Dict[str, Any]]]:
+    """
+    Agrège les ingrédients du plan : unités ramenées à g / ml / pièce / cs / cc,
+    doublons fusionnés (même ingrédient, même unité), regroupement par rayon.
+    Retourne {rayon: [{"name", "quantity", "unit"}]} trié par nom.
+    """
+    totals: Dict[Tuple[str, str], Dict[str, Any]] = {}
+    for day in plan.get("days", []):
+        for meal in day.get("meals", []):
+            for ing in meal.get("ingredients", []):
+                name = str(ing.get("name", "")).strip()
+                if not name:
+                    continue
+                try:
+                    quantity = float(ing.get("quantity") or 0)
+                except (TypeError, ValueError):
+                    quantity = 0.0
+                unit, quantity = _normalize_unit(str(ing.get("unit") or ""), quantity)
+                key = (_ingredient_key(name), unit)
+                entry = totals.setdefault(key, {
+                    "name": name,
+                    "unit": unit,
+                    "quantity": 0.0,
+                    "aisle": _aisle_for(name, ing.get("aisle")),
+                })
+                entry["quantity"] += quantity
+
+    by_aisle: Dict[str, List[Dict[str, Any]]] = {}
+    for entry in sorted(totals.values(), key=lambda e: _ingredient_key(e["name"])):
+        by_aisle.setdefault(entry["aisle"], []).append(
+            {"name": entry["name"], "quantity": entry["quantity"], "unit": entry["unit"]}
+        )
+    return by_aisle
 
 
-async def send_weekly_meal_plan() -> None:
+def _format_quantity(quantity: float, unit: str) -> str:
+    if quantity <= 0:
+        return ""
+    if unit == "g" and quantity >= 1000:
+        return f"{quantity / 1000:.1f}".rstrip("0").rstrip(".") + " kg"
+    if unit == "ml" and quantity >= 1000:
+        return f"{quantity / 1000:.1f}".rstrip("0").rstrip(".") + " L"
+    if unit == "pièce":
+        return f"{math.ceil(quantity)}"
+    if unit in ("g", "ml"):
+        # Arrondi aux 10 supérieurs : quantités d'achat réalistes
+        return f"{int(math.ceil(quantity / 10) * 10)} {unit}"
+    return f"{quantity:g} {unit}"
+
+
+def render_shopping_list_markdown(shopping_list: Dict[str, List[Dict[str, Any]]]) -> str:
+    """Liste de courses agrégée → Markdown Telegram, rayon par rayon."""
+    lines = ["🛒 *Liste de courses — semaine*"]
+    for aisle, header in AISLES.items():
+        items = shopping_list.get(aisle)
+        if not items:
+            continue
+        lines.append(f"\n{header}")
+        for item in items:
+            quantity = _format_quantity(item["quantity"], item["unit"])
+            lines.append(f"- {item['name']}" + (f" — {quantity}" if quantity else ""))
+    return "\n".join(lines)
+
+
+async def send_weekly_meal_plan() -> bool:
     """
     Envoie le plan repas + liste de courses chaque dimanche soir.
     Puis propose de bloquer les créneaux courses dans l'agenda.
+    La liste de courses est calculée localement depuis le plan structuré.
+    Retourne False si le plan n'a pas pu être généré ou envoyé.
     """
     from src.memory.cache import set_cache
     from telegram import Bot, InlineKeyboardButton, InlineKeyboardMarkup
 
     logger.info("Génération du plan repas hebdomadaire…")
-    meal_plan = await generate_weekly_meal_plan()
-    if not meal_plan:
+    plan = await generate_weekly_meal_plan()
+    if not plan:
         logger.warning("Plan repas vide — abandon")
-        return
+        return False
 
-    shopping_list = await generate_shopping_list(meal_plan)
+    meal_plan = render_meal_plan_markdown(plan)
+    shopping_list = render_shopping_list_markdown(build_shopping_list(plan))
 
     # Persister en cache 7 jours
     await set_cache("weekly_meal_plan", meal_plan, ttl=7 * 24 * 3600)
-    if shopping_list:
-        await set_cache("weekly_shopping_list", shopping_list, ttl=7 * 24 * 3600)
+    await set_cache("weekly_meal_plan_json", json.dumps(plan), ttl=7 * 24 * 3600)
+    await set_cache("weekly_shopping_list", shopping_list, ttl=7 * 24 * 3600)
 
     keyboard = InlineKeyboardMarkup([[
         InlineKeyboardButton("📅 Bloquer courses + boucherie", callback_data="courses_block_slots"),
@@ -173,16 +330,17 @@ async def send_weekly_meal_plan() -> None:
                 parse_mode="Markdown",
             )
             # Liste de courses avec bouton
-            if shopping_list:
-                await bot.send_message(
-                    chat_id=settings.telegram_user_id,
-                    text=shopping_list[:4000],
-                    parse_mode="Markdown",
-                    reply_markup=keyboard,
-                )
+            await bot.send_message(
+                chat_id=settings.telegram_user_id,
+                text=shopping_list[:4000],
+                parse_mode="Markdown",
+                reply_markup=keyboard,
+            )
         logger.info("Plan repas + liste de courses envoyés")
+        return True
     except Exception as e:
         logger.error(f"Erreur envoi plan repas hebdomadaire : {e}")
+        return False
 
 
 async def block_shopping_and_butcher_slots() -> None:
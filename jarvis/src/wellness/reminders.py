@@ -1,13 +1,155 @@
 """
 Rappels bien-être — envoi automatique via Telegram.
-Déclenchés par le scheduler APScheduler.
+
+Moteur de règles : chaque rappel est une entrée déclarative de REMINDER_RULES.
+Un seul job scheduler (run_reminder_tick) évalue toutes les règles dues sur le
+créneau courant contre un snapshot unique du jour (totaux bien-être + agenda),
+puis regroupe les rappels du même créneau en un seul message Telegram.
 """
 import logging
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional, Tuple
+
+import pytz
 
 from src.config import settings
+from src.wellness.supplements import SUPPLEMENT_MESSAGES
 
 logger = logging.getLogger(__name__)
 
+PARIS_TZ = pytz.timezone("Europe/Paris")
+
+WATER_GOAL_ML = 2000
+
+# Tolérance de retard d'un tick (misfire) pour rattacher l'exécution à son créneau
+SLOT_TOLERANCE = timedelta(minutes=15)
+
+MON_SAT = [0, 1, 2, 3, 4, 5]
+MON_FRI = [0, 1, 2, 3, 4]
+
+def _parse_slot(value: str) -> Tuple[int, int]:
+    hour, minute = value.split(":", 1)
+    return int(hour), int(minute)
+
+
+def _normalize_slot(value: str) -> str:
+    """« 7:30 » → « 07:30 » : même format que _current_slot."""
+    hour, minute = _parse_slot(value)
+    return f"{hour:02d}:{minute:02d}"
+
+
+# ─────────────────────────────────────────────────────────────
+# Règles de rappel
+#
+# Clés supportées :
+#   id                 : identifiant unique de la règle
+#   times              : créneaux "HH:MM" (heure de Paris)
+#   days               : jours autorisés (0=Lundi … 6=Dimanche) — défaut : tous
+#   skip_if            : {"category", "min_count" | "min_quantity"} — silence si atteint
+#   skip_if_busy       : silence si un événement agenda est en cours
+#   message            : texte (format str.format avec les variables du snapshot)
+#   message_by_weekday : texte par jour de la semaine
+#   message_by_time    : texte par créneau "HH:MM"
+# ─────────────────────────────────────────────────────────────
+
+REMINDER_RULES: List[Dict[str, Any]] = [
+    {
+        "id": "supplements_morning",
+        "times": [settings.supplement_time_morning],
+        "message": SUPPLEMENT_MESSAGES["matin"],
+    },
+    {
+        "id": "sport",
+        "times": ["07:30"],
+        "days": MON_SAT,
+        "skip_if": {"category": "sport", "min_count": 1},
+        "message_by_weekday": {
+            0: "🏃 *Rappel sport* — Lundi : course ou muscu. Lance-toi maintenant, tu le regretteras pas.",
+            1: "🏋️ *Rappel sport* — Mardi : séance muscu prévue. Prépare ta tenue.",
+            2: "🚴 *Rappel sport* — Mercredi : cardio ou mobilité. 30 min suffisent.",
+            3: "🏃 *Rappel sport* — Jeudi : course ou HIIT. Tu es à mi-semaine, tiens bon.",
+            4: "🏋️ *Rappel sport* — Vendredi : dernière séance de la semaine. Termine fort.",
+            5: "🌿 *Rappel sport* — Samedi : activité libre. Marche, vélo, natation — reste actif.",
+        },
+        "message": "💪 *Rappel sport* — Pense à bouger aujourd'hui.",
+    },
+    {
+        "id": "water",
+        "times": ["09:00", "11:00", "13:00", "15:00", "17:00", "19:00", "21:00"],
+        "skip_if": {"category": "water", "min_quantity": WATER_GOAL_ML},
+        "message": (
+            "💧 *Hydratation* — {water_ml} ml bu ({water_glasses}x250ml)\n"
+            "Encore {water_remaining} ml pour atteindre 2L.\n"
+            "Loggue avec /eau [quantité en ml]"
+        ),
+    },
+    {
+        "id": "lunch",
+        "times": ["12:30"],
+        "skip_if": {"category": "meal", "min_count": 1},
+        "message": (
+            "🍽️ *Repas du midi* — Priorise protéines + légumes.\n"
+            "Loggue ton repas : /repas [description]"
+        ),
+    },
+    {
+        "id": "walk_lunch",
+        "times": ["13:30"],
+        "skip_if_busy": True,
+        "message": (
+            "🚶 *Rappel marche* — Après le déjeuner\n\n"
+            "20-30 min de marche favorisent la digestion et la glycémie.\n"
+            "Profitez-en pour prendre l'air."
+        ),
+    },
+    {
+        "id": "dinner",
+        "times": ["19:30"],
+        "skip_if": {"category": "meal", "min_count": 2},
+        "message": (
+            "🌙 *Repas du soir* — Mange léger avant 20h si possible.\n"
+            "Loggue : /repas [description]"
+        ),
+    },
+    {
+        # Pas de rappel le dimanche soir (repos)
+        "id": "walk_dinner",
+        "times": ["20:30"],
+        "days": MON_SAT,
+        "skip_if_busy": True,
+        "message": (
+            "🚶 *Rappel marche* — Après le dîner\n\n"
+            "15-20 min de marche légère pour terminer la journée.\n"
+            "C'est l'une des habitudes les plus efficaces pour la recomposition."
+        ),
+    },
+    {
+        "id": "standing_desk",
+        "times": ["10:00", "11:30", "14:00", "15:30", "17:00"],
+        "days": MON_FRI,
+        "skip_if_busy": True,
+        "message_by_time": {
+            "10:00": "⬆️ *Bureau debout* — Levez-vous ! 90 min écoulées depuis 8h30.\nRestez debout 20-30 min avant de vous rasseoir.",
+            "11:30": "⬆️ *Bureau debout* — Changement de posture.\n20 min debout, puis reprise en position assise.",
+            "14:00": "⬆️ *Bureau debout* — Après-midi : levez-vous.\nLe pic de somnolence post-déjeuner passe mieux debout.",
+            "15:30": "⬆️ *Bureau debout* — Mi-après-midi.\nBougez un peu, hydratez-vous, puis reprenez.",
+            "17:00": "⬆️ *Bureau debout* — Avant-dernière heure.\nDernière posture debout avant 18h30.",
+        },
+        "message": "⬆️ *Bureau debout* — Changement de posture recommandé.",
+    },
+    {
+        "id": "supplements_evening",
+        "times": [settings.supplement_time_evening],
+        "message": SUPPLEMENT_MESSAGES["soir"],
+    },
+]
+
+# Les créneaux issus de la config (.env) peuvent être saisis sans zéro initial
+for _rule in REMINDER_RULES:
+    _rule["times"] = [_normalize_slot(t) for t in _rule["times"]]
+    if "message_by_time" in _rule:
+        _rule["message_by_time"] = {_normalize_slot(t): m for t, m in _rule["message_by_time"].items()}
+
 
 async def _send(text: str) -> None:
     from telegram import Bot
@@ -20,143 +162,136 @@ async def _send(text: str) -> None:
         )
 
 
-async def remind_sport() -> None:
-    """Rappel sport du matin — vérifie si déjà logué aujourd'hui."""
-    from src.wellness.tracker import get_today_logs
-    import pytz
-    from datetime import datetime
-    paris = pytz.timezone("Europe/Paris")
-    weekday = datetime.now(paris).weekday()  # 0=Lundi, 6=Dimanche
+def reminder_slot_times() -> List[Tuple[int, int]]:
+    """Créneaux (heure, minute) distincts couverts par l'ensemble des règles."""
+    slots = {_parse_slot(t) for rule in REMINDER_RULES for t in rule["times"]}
+    return sorted(slots)
 
-    # Pas de rappel le dimanche
-    if weekday == 6:
-        return
 
-    sport_logs = await get_today_logs("sport")
-    if sport_logs:
-        return  # Déjà logué, pas de rappel
-
-    day_plans = {
-        0: "🏃 *Rappel sport* — Lundi : course ou muscu. Lance-toi maintenant, tu le regretteras pas.",
-        1: "🏋️ *Rappel sport* — Mardi : séance muscu prévue. Prépare ta tenue.",
-        2: "🚴 *Rappel sport* — Mercredi : cardio ou mobilité. 30 min suffisent.",
-        3: "🏃 *Rappel sport* — Jeudi : course ou HIIT. Tu es à mi-semaine, tiens bon.",
-        4: "🏋️ *Rappel sport* — Vendredi : dernière séance de la semaine. Termine fort.",
-        5: "🌿 *Rappel sport* — Samedi : activité libre. Marche, vélo, natation — reste actif.",
-    }
-    msg = day_plans.get(weekday, "💪 *Rappel sport* — Pense à bouger aujourd'hui.")
-    await _send(msg)
-    logger.info("Rappel sport envoyé")
+def _current_slot(now: datetime) -> Optional[str]:
+    """Rattache l'heure courante au dernier créneau échu (dans la tolérance)."""
+    best: Optional[str] = None
+    for hour, minute in reminder_slot_times():
+        slot_dt = now.replace(hour=hour, minute=minute, second=0, microsecond=0)
+        if slot_dt <= now < slot_dt + SLOT_TOLERANCE:
+            best = f"{hour:02d}:{minute:02d}"
+    return best
 
 
-async def remind_water() -> None:
-    """Rappel hydratation toutes les 2h (9h-21h)."""
-    from src.wellness.tracker import get_today_logs
-    water_logs = await get_today_logs("water")
-    total_ml = int(sum(l.quantity or 0 for l in water_logs))
+def _due_rules(slot: str, weekday: int) -> List[Dict[str, Any]]:
+    due = []
+    for rule in REMINDER_RULES:
+        if slot not in rule["times"]:
+            continue
+        if "days" in rule and weekday not in rule["days"]:
+            continue
+        due.append(rule)
+    return due
 
-    if total_ml >= 2000:
-        return  # Objectif atteint, silence
-
-    glasses = round(total_ml / 250, 1)
-    remaining = max(0, 2000 - total_ml)
-
-    msg = (
-        f"💧 *Hydratation* — {total_ml} ml bu ({glasses}x250ml)\n"
-        f"Encore {remaining} ml pour atteindre 2L.\n"
-        f"Loggue avec /eau [quantité en ml]"
-    )
-    await _send(msg)
-    logger.info(f"Rappel eau envoyé (total={total_ml}ml)")
 
+async def _load_snapshot(now: datetime, with_calendar: bool) -> Dict[str, Any]:
+    """
+    Snapshot unique du jour : une requête agrégée sur les logs bien-être,
+    et l'état agenda uniquement si une règle due en dépend.
+    """
+    from sqlalchemy import func, select
+    from src.memory.database import WellnessLog, async_session
+
+    start_of_day = PARIS_TZ.localize(datetime(now.year, now.month, now.day))
+
+    async with async_session() as session:
+        result = await session.execute(
+            select(
+                WellnessLog.category,
+                func.count(WellnessLog.id),
+                func.coalesce(func.sum(WellnessLog.quantity), 0),
+            )
+            .where(WellnessLog.logged_at >= start_of_day.astimezone(timezone.utc))
+            .group_by(WellnessLog.category)
+        )
+        rows = result.all()
+
+    counts = {category: int(count) for category, count, _ in rows}
+    quantities = {category: float(total or 0) for category, _, total in rows}
+
+    busy = False
+    if with_calendar:
+        try:
+            from src.snapshots import get_snapshot
+            events = await get_snapshot("calendar")
+            busy = any(
+                not e.get("all_day") and e.get("end") and e["start"] <= now <= e["end"]
+                for e in events
+            )
+        except Exception as e:
+            logger.warning(f"Agenda indisponible pour les rappels : {e}")
+
+    water_ml = int(quantities.get("water", 0))
+    return {
+        "counts": counts,
+        "quantities": quantities,
+        "busy": busy,
+        "vars": {
+            "water_ml": water_ml,
+            "water_glasses": round(water_ml / 250, 1),
+            "water_remaining": max(0, WATER_GOAL_ML - water_ml),
+        },
+    }
 
-async def remind_lunch() -> None:
-    """Rappel repas du midi."""
-    from src.wellness.tracker import get_today_logs
-    meal_logs = await get_today_logs("meal")
-    if meal_logs:
-        return  # Déjà logué un repas, pas de rappel
 
-    await _send(
-        "🍽️ *Repas du midi* — Priorise protéines + légumes.\n"
-        "Loggue ton repas : /repas [description]"
+def _should_skip(rule: Dict[str, Any], snapshot: Dict[str, Any]) -> bool:
+    if rule.get("skip_if_busy") and snapshot["busy"]:
+        return True
+    condition = rule.get("skip_if")
+    if not condition:
+        return False
+    category = condition["category"]
+    if "min_count" in condition and snapshot["counts"].get(category, 0) >= condition["min_count"]:
+        return True
+    if "min_quantity" in condition and snapshot["quantities"].get(category, 0) >= condition["min_quantity"]:
+        return True
+    return False
+
+
+def _render(rule: Dict[str, Any], slot: str, weekday: int, snapshot: Dict[str, Any]) -> str:
+    text = (
+        rule.get("message_by_time", {}).get(slot)
+        or rule.get("message_by_weekday", {}).get(weekday)
+        or rule["message"]
     )
-    logger.info("Rappel déjeuner envoyé")
-
+    return text.format(**snapshot["vars"])
 
-async def remind_dinner() -> None:
-    """Rappel repas du soir."""
-    from src.wellness.tracker import get_today_logs
-    meal_logs = await get_today_logs("meal")
 
-    # Rappel soir seulement si moins de 2 repas loggés
-    if len(meal_logs) >= 2:
+async def run_reminder_tick() -> None:
+    """
+    Job scheduler unique — évalue les règles du créneau courant et envoie
+    au plus un message Telegram regroupant tous les rappels dus.
+    """
+    now = datetime.now(PARIS_TZ)
+    slot = _current_slot(now)
+    if not slot:
         return
 
-    await _send(
-        "🌙 *Repas du soir* — Mange léger avant 20h si possible.\n"
-        "Loggue : /repas [description]"
-    )
-    logger.info("Rappel dîner envoyé")
-
-
-async def remind_walk() -> None:
-    """Rappel marche — après déjeuner (13h30) et après dîner (20h30)."""
-    import pytz
-    from datetime import datetime
-
-    paris = pytz.timezone("Europe/Paris")
-    now = datetime.now(paris)
-    hour = now.hour
-
-    # Pas de rappel le dimanche après 20h (repos)
-    if now.weekday() == 6 and hour >= 20:
+    rules = _due_rules(slot, now.weekday())
+    if not rules:
         return
 
-    if 13 <= hour < 15:
-        msg = (
-            "🚶 *Rappel marche* — Après le déjeuner\n\n"
-            "20-30 min de marche favorisent la digestion et la glycémie.\n"
-            "Profitez-en pour prendre l'air."
-        )
-    else:
-        msg = (
-            "🚶 *Rappel marche* — Après le dîner\n\n"
-            "15-20 min de marche légère pour terminer la journée.\n"
-            "C'est l'une des habitudes les plus efficaces pour la recomposition."
-        )
-
-    await _send(msg)
-    logger.info(f"Rappel marche envoyé ({hour}h)")
+    snapshot = await _load_snapshot(now, with_calendar=any(r.get("skip_if_busy") for r in rules))
 
+    messages = []
+    fired = []
+    for rule in rules:
+        if _should_skip(rule, snapshot):
+            continue
+        messages.append(_render(rule, slot, now.weekday(), snapshot))
+        fired.append(rule["id"])
 
-async def remind_standing_desk() -> None:
-    """
-    Rappel bureau debout — toutes les 90 min pendant les blocs de travail.
-    Déclenché aux heures fixes : 10h00, 11h30, 14h00, 15h30, 17h00.
-    """
-    import pytz
-    from datetime import datetime
-
-    paris = pytz.timezone("Europe/Paris")
-    now = datetime.now(paris)
-
-    # Pas de rappel le week-end
-    if now.weekday() >= 5:
+    if not messages:
+        logger.debug(f"Créneau {slot} : aucun rappel à envoyer")
         return
 
-    hour = now.hour
-    messages = {
-        10: "⬆️ *Bureau debout* — Levez-vous ! 90 min écoulées depuis 8h30.\nRestez debout 20-30 min avant de vous rasseoir.",
-        11: "⬆️ *Bureau debout* — Changement de posture.\n20 min debout, puis reprise en position assise.",
-        14: "⬆️ *Bureau debout* — Après-midi : levez-vous.\nLe pic de somnolence post-déjeuner passe mieux debout.",
-        15: "⬆️ *Bureau debout* — Mi-après-midi.\nBougez un peu, hydratez-vous, puis reprenez.",
-        17: "⬆️ *Bureau debout* — Avant-dernière heure.\nDernière posture debout avant 18h30.",
-    }
-
-    msg = messages.get(hour, "⬆️ *Bureau debout* — Changement de posture recommandé.")
-    await _send(msg)
-    logger.info(f"Rappel bureau debout envoyé ({hour}h)")
+    await _send("\n\n".join(messages))
+    logger.info(f"Rappels envoyés ({slot}) : {', '.join(fired)}")
 
 
 async def send_weekly_wellness_report() -> None:
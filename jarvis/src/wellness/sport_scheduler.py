@@ -2,11 +2,13 @@
 Planification automatique des séances sport dans Google Calendar.
 Géolocalisation → sélection de la salle Fitness Park la plus proche.
 """
+import itertools
 import json
 import logging
 import math
-from datetime import datetime, timedelta
-from typing import Any, Dict, List, Optional
+import time as time_module
+from datetime import date, datetime, time, timedelta
+from typing import Any, Dict, List, Optional, Tuple
 
 import pytz
 
@@ -87,78 +89,145 @@ def format_fitness_parks_list(user_lat: Optional[float] = None, user_lon: Option
 # Planification automatique sport
 # ─────────────────────────────────────────────────────────────
 
-async def propose_weekly_sport_plan() -> None:
-    """
-    Génère et propose un planning sport pour la semaine à venir.
-    Appelé le vendredi soir ou à la demande via /planning.
-    6 séances : alternance muscu / boxe selon créneaux libres.
-    """
-    from src.calendar.google_cal import fetch_all_events
-    from src.llm.groq_client import groq_client
-    from src.memory.cache import set_cache
-    from telegram import Bot, InlineKeyboardButton, InlineKeyboardMarkup
+SESSION_DURATIONS = {"muscu": 75, "boxe": 60}  # minutes
+SESSIONS_PER_TYPE = 3
+# Fenêtres horaires par ordre de préférence (matin, midi, soir), lundi → samedi
+PREFERRED_WINDOWS = [((7, 0), (9, 0)), ((12, 0), (14, 0)), ((18, 0), (20, 0))]
+SLOT_STEP_MINUTES = 15
+WEEKDAY_LABELS = ["lundi", "mardi", "mercredi", "jeudi", "vendredi", "samedi", "dimanche"]
+TRAINING_DAYS = 6
 
-    now = datetime.now(PARIS_TZ)
 
-    # Récupérer les événements des 10 prochains jours
-    try:
-        events = await fetch_all_events(days_ahead=10)
-    except Exception:
-        events = []
+def _busy_intervals(events: List[Dict[str, Any]]) -> List[Tuple[datetime, datetime]]:
+    """Créneaux occupés (hors événements journée entière), triés."""
+    busy = [
+        (e["start"].astimezone(PARIS_TZ), e["end"].astimezone(PARIS_TZ))
+        for e in events
+        if not e.get("all_day") and e.get("start") and e.get("end")
+    ]
+    return sorted(busy)
 
-    # Résumé des créneaux occupés pour le LLM
-    busy_slots = []
-    for e in events:
-        if not e.get("all_day") and e.get("end"):
-            start_paris = e["start"].astimezone(PARIS_TZ)
-            end_paris = e["end"].astimezone(PARIS_TZ)
-            busy_slots.append(
-                f"{start_paris.strftime('%A %d/%m %Hh%M')} → {end_paris.strftime('%Hh%M')}"
-            )
-    busy_str = "\n".join(busy_slots[:20]) if busy_slots else "Agenda vide"
 
-    # Calculer les dates de la semaine prochaine
-    days_until_monday = (7 - now.weekday()) % 7 or 7
-    next_monday = now + timedelta(days=days_until_monday)
+def _best_slot(
+    day: date, duration_min: int, busy: List[Tuple[datetime, datetime]]
+) -> Optional[Tuple[float, datetime, datetime]]:
+    """
+    Premier créneau libre du jour, fenêtre par fenêtre dans l'ordre de préférence.
+    Retourne (coût, début, fin) — coût = rang de la fenêtre + décalage dans la fenêtre.
+    """
+    duration = timedelta(minutes=duration_min)
+    for rank, ((start_h, start_m), (end_h, end_m)) in enumerate(PREFERRED_WINDOWS):
+        window_start = PARIS_TZ.localize(datetime.combine(day, time(start_h, start_m)))
+        window_end = PARIS_TZ.localize(datetime.combine(day, time(end_h, end_m)))
+        start = window_start
+        while start + duration <= window_end:
+            end = start + duration
+            if not any(b_start < end and start < b_end for b_start, b_end in busy):
+                offset_hours = (start - window_start).total_seconds() / 3600
+                return rank + offset_hours / 10, start, end
+            start += timedelta(minutes=SLOT_STEP_MINUTES)
+    return None
+
+
+def solve_sport_week(week_start: date, busy: List[Tuple[datetime, datetime]]) -> List[Dict[str, Any]]:
+    """
+    Place 3 muscu + 3 boxe du lundi au samedi sur les créneaux libres.
+    Contraintes : une séance par jour au plus, types strictement alternés,
+    durées muscu 75 min / boxe 60 min, fenêtres 7h-9h, 12h-14h, 18h-20h.
+    Exploration exhaustive (3^6 combinaisons) : maximise le nombre de séances
+    placées puis minimise le coût de préférence horaire.
+    """
+    days = [week_start + timedelta(days=i) for i in range(TRAINING_DAYS)]
+    slots = {
+        (i, kind): _best_slot(day, duration, busy)
+        for i, day in enumerate(days)
+        for kind, duration in SESSION_DURATIONS.items()
+    }
+
+    best: Tuple[int, float, List[Tuple[int, str]]] = (0, 0.0, [])
+    for choice in itertools.product(("muscu", "boxe", None), repeat=TRAINING_DAYS):
+        placed = [(i, kind) for i, kind in enumerate(choice) if kind]
+        kinds = [kind for _, kind in placed]
+        if any(kinds.count(k) > SESSIONS_PER_TYPE for k in SESSION_DURATIONS):
+            continue
+        if any(a == b for a, b in zip(kinds, kinds[1:])):
+            continue
+        if any(slots[p] is None for p in placed):
+            continue
+        cost = sum(slots[p][0] for p in placed)
+        if len(placed) > best[0] or (len(placed) == best[0] and cost < best[1]):
+            best = (len(placed), cost, placed)
 
+    sessions = []
+    for i, kind in best[2]:
+        _, start, end = slots[(i, kind)]
+        sessions.append({
+            "day": WEEKDAY_LABELS[days[i].weekday()],
+            "date": days[i].isoformat(),
+            "type": kind,
+            "start": start.strftime("%H:%M"),
+            "end": end.strftime("%H:%M"),
+            "location": "Fitness Park",
+        })
+    return sessions
+
+
+async def _phrase_sport_plan(sessions: List[Dict[str, Any]], bypass_cache: bool) -> str:
+    """Phrase d'accompagnement du planning — optionnelle, vide si le LLM échoue."""
+    from src.llm.gateway import complete
+
+    summary = "\n".join(f"{s['day']} {s['start']}-{s['end']} {s['type']}" for s in sessions)
     prompt = [{
         "role": "user",
-        "content": f"""Propose un planning sport pour la semaine prochaine (du lundi au samedi).
-
-Profil Nassim : recomposition corporelle (116 kg, 170 cm), musculation + boxe, 6 séances/semaine.
-Horaires préférés (par ordre de priorité) : 7h00-9h00, 12h00-14h00, 18h00-20h00, lundi au samedi.
-Lundi prochain : {next_monday.strftime('%Y-%m-%d')}
-Créneaux occupés :\n{busy_str}
-
-Génère exactement 6 séances en JSON valide :
-[
-  {{"day": "lundi", "date": "YYYY-MM-DD", "type": "muscu", "start": "07:00", "end": "08:15", "location": "Fitness Park"}},
-  {{"day": "mardi", "date": "YYYY-MM-DD", "type": "boxe", "start": "18:00", "end": "19:00", "location": "Fitness Park"}},
-  ...
-]
+        "content": f"""Voici le planning sport de la semaine prochaine de Nassim (déjà calculé, ne le modifie pas) :
+{summary}
 
-Règles :
-- Alterne muscu et boxe (3 muscu + 3 boxe)
-- Évite les créneaux occupés
-- Muscu : 75 min, Boxe : 60 min
-- Répartis lun-sam, préfère matin ou soir
-- UNIQUEMENT le JSON, aucun texte autour""",
+Écris UNE phrase courte (max 25 mots) qui résume le rythme de la semaine et donne un conseil de récupération.
+Pas de liste, pas de Markdown, uniquement la phrase.""",
     }]
+    try:
+        return (await complete(prompt, site="sport_plan", bypass_cache=bypass_cache)).strip()
+    except Exception as e:
+        logger.warning(f"Phrase planning sport indisponible : {e}")
+        return ""
 
-    sessions = []
+
+async def propose_weekly_sport_plan(bypass_cache: bool = False) -> None:
+    """
+    Calcule et propose un planning sport pour la semaine à venir.
+    Appelé le vendredi soir ou à la demande via /planning.
+    6 séances : alternance muscu / boxe sur les créneaux libres de l'agenda,
+    placées localement (solve_sport_week) ; le LLM ne rédige que la phrase
+    d'accompagnement. bypass_cache=True régénère cette phrase (bouton « Régénérer »).
+    """
+    from src.calendar.google_cal import fetch_all_events
+    from src.memory.cache import set_cache
+    from telegram import Bot, InlineKeyboardButton, InlineKeyboardMarkup
+
+    now = datetime.now(PARIS_TZ)
+    days_until_monday = (7 - now.weekday()) % 7 or 7
+    next_monday = (now + timedelta(days=days_until_monday)).date()
+
+    # Événements jusqu'à la fin de la semaine planifiée (dernier jour d'entraînement inclus)
+    days_ahead = (next_monday + timedelta(days=TRAINING_DAYS) - now.date()).days
+    calendar_available = True
     try:
-        raw = await groq_client.chat(prompt)
-        raw = raw.strip()
-        if raw.startswith("```"):
-            raw = raw.split("```")[1]
-            if raw.startswith("json"):
-                raw = raw[4:]
-        sessions = json.loads(raw.strip())
+        events = await fetch_all_events(days_ahead=days_ahead)
     except Exception as e:
-        logger.error(f"Erreur génération planning sport : {e}")
-        return
+        # Sans agenda, les créneaux ignorent les événements : on le signale dans la proposition
+        logger.error(f"Agenda indisponible pour le planning sport : {e}")
+        events = []
+        calendar_available = False
+
+    started = time_module.monotonic()
+    sessions = solve_sport_week(next_monday, _busy_intervals(events))
+    logger.info(
+        f"Planning sport calculé en {(time_module.monotonic() - started) * 1000:.1f} ms : "
+        f"{len(sessions)} séance(s) placée(s)"
+    )
 
     if not sessions:
+        logger.warning("Aucun créneau sport libre la semaine prochaine")
         return
 
     # Sauvegarder en cache 24h
@@ -173,6 +242,16 @@ Règles :
             f"{icon} *{s['day'].capitalize()}* {s['date']} — {s['type'].capitalize()}\n"
             f"   ⏰ {s['start']} → {s['end']} | 📍 {s.get('location', 'Fitness Park')}"
         )
+    missing = 2 * SESSIONS_PER_TYPE - len(sessions)
+    if missing:
+        lines.append(f"\n⚠️ {missing} séance(s) non placée(s) — agenda trop chargé.")
+    if not calendar_available:
+        lines.append(
+            "\n⚠️ Agenda inaccessible : créneaux calculés sans vos événements, vérifiez-les avant de valider."
+        )
+    phrase = await _phrase_sport_plan(sessions, bypass_cache)
+    if phrase:
+        lines.append(f"\n_{phrase}_")
     lines.append("\nValider et bloquer ces créneaux dans l'agenda ?")
 
     keyboard = InlineKeyboardMarkup([[
@@ -1,6 +1,7 @@
 """
 Rappels compléments alimentaires — matin, soir, post-sport.
-Déclenchés par le scheduler ou manuellement après une séance.
+Matin et soir sont des règles du moteur de rappels (src.wellness.reminders) ;
+post-sport est déclenché manuellement après une séance.
 """
 import logging
 from datetime import datetime
@@ -56,16 +57,6 @@ async def send_supplement_reminder(moment: str) -> None:
         logger.error(f"Erreur rappel compléments {moment} : {e}")
 
 
-async def remind_supplements_morning() -> None:
-    """Job scheduler — prise matinale."""
-    await send_supplement_reminder("matin")
-
-
-async def remind_supplements_evening() -> None:
-    """Job scheduler — prise du soir."""
-    await send_supplement_reminder("soir")
-
-
 async def remind_supplements_post_sport() -> None:
     """
     Rappel post-sport déclenché après détection d'une séance dans l'agenda